@@ -0,0 +1,231 @@
+"""Пакетное формирование отчетов в нескольких процессах.
+
+Запуск: python batch_reports.py jobs.json [--workers 4] [--output-dir reports]
+
+Файл заданий — JSON (или YAML, если установлен PyYAML): список отчетов или
+объект с общими настройками:
+
+    {
+        "output_dir": "reports",
+        "defaults": {"from": "2024-01-01", "to": "2024-12-31", "format": "pdf"},
+        "reports": [
+            {"type": "category", "category": "*"},
+            {"type": "user", "user": "*", "periods": [["2024-01-01", "2024-06-30"],
+                                                      ["2024-07-01", "2024-12-31"]]},
+            {"type": "statistics", "format": "xlsx", "output": "статистика.xlsx"}
+        ]
+    }
+
+Поля отчета: type (all, category, user, statistics), from, to, category, user,
+sort, format (xlsx, pdf, csv) и output. "*" в category или user означает
+отчет на каждую категорию или каждого пользователя, periods — отчет на каждый период.
+Каждый процесс открывает свое подключение к базе только для чтения и
+формирует отчеты независимо от остальных.
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import db_utils
+import reporting
+
+# Задание: параметры отчета, файл и формат выгрузки
+Job = namedtuple('Job', 'spec output fmt')
+
+# Итог задания: файл, строк, время в секундах и текст ошибки (None при успехе)
+JobResult = namedtuple('JobResult', 'output rows elapsed error')
+
+# Итог пакета: итоги заданий в порядке заданий, успешных, с ошибками, строк,
+# время в секундах и скорость
+BatchResult = namedtuple('BatchResult', 'results done failed rows elapsed reports_per_sec')
+
+ALL = '*'
+
+
+def load_job_file(path):
+    """Читает файл заданий: (список отчетов, общие настройки, каталог выгрузки)"""
+    with open(path, encoding='utf-8') as f:
+        if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError('Для файлов YAML нужен пакет PyYAML (pip install pyyaml)')
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    if isinstance(data, list):
+        return data, {}, None
+    if not isinstance(data, dict) or not isinstance(data.get('reports'), list):
+        raise ValueError('Файл заданий должен содержать список отчетов или объект с ключом reports')
+    return data['reports'], data.get('defaults') or {}, data.get('output_dir')
+
+
+def _date(value, field):
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f'{field}: дата должна быть в формате ГГГГ-ММ-ДД: {value}')
+
+
+def _job_filename(spec, fmt):
+    """Имя файла по умолчанию: тип, период и выбранные категория и пользователь"""
+    name = reporting.default_filename(spec)
+    for value in (spec.category, spec.user):
+        if value and value != 'Все':
+            name += f'_{value}'
+    # имена категорий и пользователей могут содержать символы, недопустимые в именах файлов
+    name = ''.join('_' if ch in '\\/:*?"<>|' else ch for ch in name)
+    return name + reporting.FORMATS[fmt]
+
+
+def expand_jobs(entries, defaults=None, output_dir=None):
+    """Превращает записи файла заданий в список Job.
+
+    "*" в category и user раскрывается в имена из базы, periods — в отдельные
+    отчеты на каждый период. ValueError, если запись неверна или два отчета
+    пишутся в один файл.
+    """
+    names = {}
+
+    def all_names(field):
+        if field not in names:
+            rows = db_utils.get_categories() if field == 'category' else db_utils.get_users()
+            names[field] = [row[1] for row in rows]
+        return names[field]
+
+    jobs = []
+    for number, entry in enumerate(entries, 1):
+        where = f'отчет {number}'
+        if not isinstance(entry, dict):
+            raise ValueError(f'{where}: ожидается объект с параметрами отчета')
+        entry = dict(defaults or {}, **entry)
+        report_type = entry.get('type', 'all')
+        if report_type not in reporting.REPORT_TYPES:
+            raise ValueError(f'{where}: неизвестный тип отчета {report_type}')
+        sort = entry.get('sort')
+        if sort and sort not in reporting.SORTS:
+            raise ValueError(f'{where}: неизвестная сортировка {sort}')
+        periods = entry.get('periods') or [(entry.get('from'), entry.get('to'))]
+        categories = all_names('category') if entry.get('category') == ALL else [entry.get('category')]
+        users = all_names('user') if entry.get('user') == ALL else [entry.get('user')]
+        expanded = len(periods) * len(categories) * len(users) > 1
+        if expanded and entry.get('output'):
+            raise ValueError(f'{where}: output нельзя задать для нескольких отчетов')
+
+        for date_from, date_to in periods:
+            date_from, date_to = _date(date_from, where), _date(date_to, where)
+            if bool(date_from) != bool(date_to):
+                raise ValueError(f'{where}: период задается парой from и to')
+            for category in categories:
+                for user in users:
+                    spec = reporting.ReportSpec(reporting.REPORT_TYPES[report_type], date_from, date_to,
+                                                category, user, reporting.SORTS.get(sort))
+                    output = entry.get('output')
+                    fmt = reporting.output_format(output, entry.get('format') or ('pdf' if not output else None))
+                    output = output or _job_filename(spec, fmt)
+                    if output_dir:
+                        output = os.path.join(output_dir, output)
+                    jobs.append(Job(spec, output, fmt))
+
+    outputs = [os.path.normcase(os.path.abspath(job.output)) for job in jobs]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError('Несколько отчетов пишутся в один файл, задайте output')
+    return jobs
+
+
+def render_job(job):
+    """Формирует один отчет; ошибки возвращаются в JobResult, а не выбрасываются"""
+    start = time.perf_counter()
+    try:
+        directory = os.path.dirname(job.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        result = reporting.export_report(job.spec, job.output, job.fmt)
+        rows = result.rows if job.fmt == 'pdf' else result
+        return JobResult(job.output, rows, time.perf_counter() - start, None)
+    except Exception as e:
+        return JobResult(job.output, 0, time.perf_counter() - start, f'{type(e).__name__}: {e}')
+
+
+def _init_worker(db_path):
+    """Инициализация процесса: свое подключение только для чтения к той же базе"""
+    db_utils.DB_PATH = db_path
+    db_utils.use_read_only_backend()
+
+
+def run_batch(jobs, workers=None, progress=None):
+    """Выполняет задания в workers процессах (1 — последовательно в текущем процессе).
+
+    progress(result) вызывается по мере готовности отчетов. Возвращает BatchResult.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    results = [None] * len(jobs)
+    if workers == 1:
+        for index, job in enumerate(jobs):
+            results[index] = render_job(job)
+            if progress:
+                progress(results[index])
+    else:
+        # spawn: процессы не наследуют открытые подключения SQLite (и так же работают в Windows)
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)) or 1, mp_context=context,
+                                 initializer=_init_worker, initargs=(db_utils.DB_PATH,)) as pool:
+            futures = {pool.submit(render_job, job): index for index, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    # процесс завершился аварийно
+                    results[index] = JobResult(jobs[index].output, 0, 0.0, f'{type(e).__name__}: {e}')
+                if progress:
+                    progress(results[index])
+
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for result in results if result.error)
+    return BatchResult(results, len(results) - failed, failed, sum(result.rows for result in results),
+                       elapsed, len(results) / elapsed if elapsed else 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Пакетное формирование отчетов')
+    parser.add_argument('path', help='файл заданий JSON или YAML')
+    parser.add_argument('--workers', type=int, default=None, help='число процессов (по умолчанию — число ядер)')
+    parser.add_argument('--output-dir', help='каталог для отчетов (вместо output_dir из файла)')
+    args = parser.parse_args()
+
+    db_utils.init_db()
+    try:
+        entries, defaults, output_dir = load_job_file(args.path)
+        jobs = expand_jobs(entries, defaults, args.output_dir or output_dir)
+    except (OSError, ValueError) as e:
+        print(f'Ошибка в файле заданий: {e}', file=sys.stderr)
+        return 2
+    # подключения этого процесса больше не нужны: отчеты читают базу в своих процессах
+    db_utils.close_all_connections()
+
+    def report(result):
+        if result.error:
+            print(f'ОШИБКА {result.output}: {result.error}')
+        else:
+            print(f'{result.output}: {result.rows} строк, {result.elapsed:.2f} с')
+
+    batch = run_batch(jobs, args.workers, progress=report)
+    print(f'Готово отчетов: {batch.done}, ошибок: {batch.failed}, строк: {batch.rows}, '
+          f'{batch.elapsed:.2f} с ({batch.reports_per_sec:.1f} отчетов/с)')
+    return 1 if batch.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
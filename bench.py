@@ -0,0 +1,1024 @@
+"""Бенчмарки слоя работы с базой данных.
+
+Запуск: python bench.py <имя> [параметры], где имя — один из ключей BENCHMARKS:
+connections | query-plans | import | pages | edits | export-excel | export-pdf |
+search | reports | statistics | startup | fonts | batch | report-cache | theme |
+passwords | register | mysql | check (список выводит python bench.py --help).
+Бенчмарк с проверкой завершается с кодом 1, если проверка не прошла; check
+запускает проверки из CHECKS (индексы в планах запросов, диалект MySQL) для CI.
+Каждый бенчмарк работает на временной копии базы и не трогает eventdesign.db.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from itertools import accumulate, islice
+
+import db_utils
+import exporters
+
+
+@contextmanager
+def temp_database():
+    """Временная пустая база данных вместо DB_PATH"""
+    tmp_dir = tempfile.mkdtemp(prefix='eventdesign-bench-')
+    old_path = db_utils.DB_PATH
+    db_utils.DB_PATH = os.path.join(tmp_dir, 'bench.db')
+    try:
+        db_utils.init_db()
+        yield db_utils.DB_PATH
+    finally:
+        db_utils.close_all_connections()
+        db_utils.DB_PATH = old_path
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def rate(func, calls):
+    """Выполняет func заданное число раз и возвращает вызовов в секунду"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return calls / (time.perf_counter() - start)
+
+
+def bench_connections(args):
+    """Открытие подключения на каждый вызов против закэшированного подключения потока"""
+    with temp_database():
+        db_utils.add_category('Концерты', '')
+        for i in range(20):
+            db_utils.add_event(f'Событие {i}', 1, '2024-01-01', 'Москва')
+
+        def per_call():
+            # Прежняя схема: подключение открывается и закрывается на каждый запрос
+            conn = db_utils.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('SELECT category_id, category_name, description FROM Categories')
+            cursor.fetchall()
+            cursor.close()
+            conn.close()
+
+        def pooled():
+            # Подключение потока без кэша категорий
+            with db_utils.db_cursor() as cursor:
+                cursor.execute('SELECT category_id, category_name, description FROM Categories')
+                cursor.fetchall()
+
+        before = rate(per_call, args.calls)
+        after = rate(pooled, args.calls)
+        print(f'Запрос категорий: {before:,.0f} вызовов/с до, {after:,.0f} вызовов/с после '
+              f'(x{after / before:.1f})')
+
+        cached = rate(db_utils.get_categories, args.calls)
+        db_utils.add_category('Выставки', '')
+        db_utils.get_category_map()
+        stats = db_utils.category_cache_stats()
+        print(f'get_categories из кэша: {cached:,.0f} вызовов/с (x{cached / after:.1f}); '
+              f'попаданий {stats.hits}, промахов {stats.misses}, поколение {stats.generation}')
+        assert 'Выставки' in db_utils.get_category_map(), 'кэш не сброшен после add_category'
+
+
+def fill_events(events, categories=20, users=200, favorites_per_event=1.5):
+    """Заполняет базу синтетическими категориями, пользователями, событиями и избранным"""
+    with db_utils.transaction() as cursor:
+        cursor.executemany(
+            'INSERT INTO Categories (category_name, description) VALUES (?, ?)',
+            [(f'Категория {i}', '') for i in range(categories)])
+        cursor.executemany(
+            'INSERT INTO Users (user_name, login, password, email) VALUES (?, ?, ?, ?)',
+            [(f'Пользователь {i}', f'user{i}', '', f'user{i}@example.com') for i in range(users)])
+        cursor.executemany(
+            'INSERT INTO Events (event_name, category, event_date, location, description, note) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            ((f'Событие {i}', i % categories + 1,
+              f'{2015 + i % 10}-{1 + i % 12:02d}-{1 + i % 28:02d}',
+              f'Место {i % 500}', f'Описание события {i}', '') for i in range(events)))
+        cursor.executemany(
+            'INSERT OR IGNORE INTO Favorites (user_id, event_id) VALUES (?, ?)',
+            ((i % users + 1, i * 7 % events + 1) for i in range(int(events * favorites_per_event))))
+    db_utils.analyze()
+
+
+def bench_query_plans(args):
+    """Проверяет через EXPLAIN QUERY PLAN, что запросы отчетов используют индексы"""
+    checks = [
+        ('период', dict(report_type=db_utils.REPORT_ALL, date_from='2020-01-01', date_to='2020-01-31'),
+         'idx_events_date'),
+        ('категория', dict(report_type=db_utils.REPORT_BY_CATEGORY, category='Категория 3'),
+         'idx_categories_name'),
+        ('категория', dict(report_type=db_utils.REPORT_BY_CATEGORY, category='Категория 3'),
+         'idx_events_category'),
+        ('пользователь', dict(report_type=db_utils.REPORT_BY_USER, user='Пользователь 5'),
+         'idx_users_name'),
+        # имена пользователей читаются из сводки EventStats по ее первичному ключу
+        ('избранное', dict(report_type=db_utils.REPORT_ALL), 'SEARCH s USING INTEGER PRIMARY KEY'),
+    ]
+    # Favorites по event_id читают триггеры сводок и счетчика избранного
+    favorites_sql = '''
+        SELECT DISTINCT u.user_name FROM Favorites f JOIN Users u ON f.user_id = u.user_id
+        WHERE f.event_id = ?'''
+    failed = 0
+    with temp_database():
+        fill_events(args.events)
+        queries = [(label, db_utils.build_report_query(**params), index) for label, params, index in checks]
+        queries.append(('избранное события', (favorites_sql, (1,)), 'idx_favorites_event'))
+        for label, (sql, sql_params), index in queries:
+            plan = db_utils.explain_query_plan(sql, sql_params)
+            used = any(index in step for step in plan)
+            failed += not used
+            print(f'{"OK  " if used else "FAIL"} {label}: {index}')
+            if not used:
+                print('     ' + '\n     '.join(plan))
+    if failed:
+        raise SystemExit(f'{failed} запрос(ов) не используют ожидаемые индексы')
+
+
+def bench_import(args):
+    """Построчное добавление через add_event против bulk_add_events"""
+    def rows(n):
+        return ({'name': f'Событие {i}', 'category': 'Концерты', 'date': '2024-05-01',
+                 'location': 'Москва', 'description': f'Описание {i}'} for i in range(n))
+
+    with temp_database():
+        db_utils.add_category('Концерты', '')
+        start = time.perf_counter()
+        for row in rows(args.events // 10):
+            db_utils.add_event(row['name'], 1, row['date'], row['location'], row['description'])
+        before = args.events // 10 / (time.perf_counter() - start)
+
+        result = db_utils.bulk_add_events(rows(args.events))
+        print(f'add_event: {before:,.0f} строк/с, bulk_add_events: {result.rows_per_sec:,.0f} строк/с '
+              f'({result.inserted} строк, ошибок: {len(result.errors)})')
+
+
+def elapsed_ms(func, repeat=20):
+    """Среднее время вызова func в миллисекундах"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_pages(args):
+    """Загрузка всей таблицы событий против окна при постраничной навигации"""
+    for size in (args.events // 10, args.events):
+        with temp_database():
+            fill_events(size)
+            middle = db_utils.get_events_page(offset=size // 2, limit=1)[0]
+            key = db_utils.event_page_key(middle)
+            full = elapsed_ms(db_utils.get_events, repeat=3)
+            forward = elapsed_ms(lambda: db_utils.get_events_page(after=key, limit=50))
+            backward = elapsed_ms(lambda: db_utils.get_events_page(before=key, limit=50))
+            jump = elapsed_ms(lambda: db_utils.get_events_page(offset=size // 2, limit=110))
+            # фильтр по категории: вся выборка против перехода в середину категории
+            criteria = db_utils.EventFilter(category_id=3)
+            category_full = elapsed_ms(lambda: db_utils.get_events(criteria), repeat=3)
+            category_jump = elapsed_ms(lambda: db_utils.get_events_page(
+                offset=db_utils.count_events(criteria) // 2, limit=110, criteria=criteria))
+            print(f'{size:>9,} событий: вся таблица {full:8.2f} мс, страница вперед {forward:.2f} мс, '
+                  f'назад {backward:.2f} мс, переход ползунком {jump:.2f} мс; '
+                  f'категория целиком {category_full:.2f} мс, переход в категории {category_jump:.2f} мс')
+
+
+def bench_edits(args):
+    """Редактирование с полной перезагрузкой таблицы против точечного изменения строки"""
+    for size in (args.events // 10, args.events):
+        with temp_database():
+            fill_events(size)
+            changes = []
+            db_utils.subscribe(changes.append)
+            event_id = size // 2
+
+            def edit():
+                db_utils.update_event(event_id, f'Событие {event_id}', 2, '2020-06-15', 'Место 1')
+
+            def edit_and_reload():
+                edit()
+                db_utils.get_events()
+
+            before = elapsed_ms(edit_and_reload, repeat=3)
+            after = elapsed_ms(edit)
+            db_utils.unsubscribe(changes.append)
+            print(f'{size:>9,} событий: с перезагрузкой {before:8.2f} мс, '
+                  f'с изменением строки {after:.2f} мс')
+
+
+def measure(func):
+    """Время выполнения func в секундах и пик выделенной памяти в МБ.
+
+    Память считается отдельным запуском: tracemalloc сильно замедляет выполнение.
+    """
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        func()
+        return elapsed, tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def bench_export_excel(args):
+    """Экспорт отчета через список строк и DataFrame против потоковой записи write-only"""
+    with temp_database() as path:
+        fill_events(args.rows)
+        columns = exporters.report_columns(db_utils.REPORT_ALL)
+        filename = os.path.join(os.path.dirname(path), 'report.xlsx')
+
+        def materialized():
+            # Прежняя схема: весь отчет в памяти, копия строк и DataFrame pandas
+            import pandas as pd
+            rows = db_utils.get_report(db_utils.REPORT_ALL)
+            processed = [exporters.format_report_row(row) for row in rows]
+            pd.DataFrame(processed, columns=columns).to_excel(filename, index=False)
+
+        def streaming():
+            exporters.export_excel(filename, db_utils.iter_report(db_utils.REPORT_ALL), columns)
+
+        try:
+            before = measure(materialized)
+        except ImportError:
+            before = None
+        after = measure(streaming)
+        if before:
+            print(f'DataFrame: {before[0]:.2f} с, пик памяти {before[1]:.1f} МБ')
+        else:
+            print('DataFrame: pandas не установлен')
+        print(f'потоковая запись: {after[0]:.2f} с ({args.rows / after[0]:,.0f} строк/с), '
+              f'пик памяти {after[1]:.1f} МБ')
+
+
+def legacy_pdf(filename, rows, columns, title):
+    """Прежняя схема PDF: одна таблица на весь отчет и команда BACKGROUND на каждую строку"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+    pages = 0
+
+    def on_page(canvas, doc):
+        nonlocal pages
+        pages += 1
+
+    doc = SimpleDocTemplate(filename, pagesize=letter)
+    data = [columns] + [[str(value) for value in exporters.format_report_row(row)] for row in rows]
+    table = Table(data, colWidths=[1*cm, 3*cm, 3*cm, 3*cm, 2*cm, 4*cm, 2*cm, 3*cm])
+    style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.blue),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ])
+    for i in range(1, len(data)):
+        style.add('BACKGROUND', (0, i), (-1, i), colors.lightgrey if i % 2 == 0 else colors.white)
+    table.setStyle(style)
+    doc.build([Paragraph(title, getSampleStyleSheet()['Heading1']), table],
+              onFirstPage=on_page, onLaterPages=on_page)
+    return pages
+
+
+def bench_export_pdf(args):
+    """Одна таблица на весь отчет против таблиц по частям; падает, если части медленнее"""
+    with temp_database() as path:
+        fill_events(args.rows)
+        columns = exporters.report_columns(db_utils.REPORT_ALL)
+        filename = os.path.join(os.path.dirname(path), 'report.pdf')
+        # прежняя схема верстает всю таблицу разом, поэтому сравнение идет на меньшем отчете
+        small = args.rows // 10
+        results = {}
+
+        def legacy():
+            rows = db_utils.get_report(db_utils.REPORT_ALL)[:small]
+            results['legacy'] = legacy_pdf(filename, rows, columns, 'Отчет')
+
+        def chunked():
+            results['chunked'] = exporters.export_pdf(
+                filename, islice(db_utils.iter_report(db_utils.REPORT_ALL), small), columns, 'Отчет')
+
+        def full():
+            results['full'] = exporters.export_pdf(
+                filename, db_utils.iter_report(db_utils.REPORT_ALL), columns, 'Отчет')
+
+        before = measure(legacy)
+        after = measure(chunked)
+        total = measure(full)
+        before_rate = results['legacy'] / before[0]
+        after_rate = results['chunked'].pages / after[0]
+        print(f'{small:>9,} строк: одна таблица {before[0]:.2f} с ({before_rate:.1f} стр/с), '
+              f'пик памяти {before[1]:.1f} МБ')
+        print(f'{small:>9,} строк: по частям {after[0]:.2f} с ({after_rate:.1f} стр/с), '
+              f'пик памяти {after[1]:.1f} МБ')
+        print(f'{args.rows:>9,} строк: по частям {total[0]:.2f} с, {results["full"].pages} стр. '
+              f'({results["full"].pages / total[0]:.1f} стр/с), пик памяти {total[1]:.1f} МБ')
+    if after_rate < before_rate:
+        raise SystemExit('Экспорт PDF по частям медленнее прежней схемы')
+
+
+def search_vocabulary(size, seed=1):
+    """Синтетические слова из русских слогов"""
+    rnd = random.Random(seed)
+    syllables = ['ка', 'ра', 'но', 'ви', 'ло', 'ме', 'ту', 'са', 'ди', 'по', 'ре', 'ны', 'ко', 'ля', 'зо', 'ши']
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rnd.choice(syllables) for _ in range(rnd.randint(2, 4))))
+    return sorted(words)
+
+
+def fill_search_events(events, vocabulary=5000, seed=1):
+    """События со словами, частота которых убывает по закону Ципфа, как в живом тексте"""
+    rnd = random.Random(seed)
+    words = search_vocabulary(vocabulary, seed)
+    cum_weights = list(accumulate(1 / (i + 1) for i in range(len(words))))
+
+    def text(n):
+        return ' '.join(rnd.choices(words, cum_weights=cum_weights, k=n))
+
+    with db_utils.transaction() as cursor:
+        cursor.executemany(
+            'INSERT INTO Categories (category_name, description) VALUES (?, ?)',
+            [(f'Категория {i}', '') for i in range(20)])
+        cursor.executemany(
+            'INSERT INTO Events (event_name, category, event_date, location, description, note) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            ((text(3).capitalize(), i % 20 + 1, f'{2015 + i % 10}-{1 + i % 12:02d}-{1 + i % 28:02d}',
+              f'Место {text(1)}', text(8), '') for i in range(events)))
+    db_utils.analyze()
+    return words
+
+
+def bench_search(args):
+    """Полнотекстовый поиск: время подсчета совпадений и страниц результатов (цель — до 50 мс)"""
+    with temp_database():
+        start = time.perf_counter()
+        words = fill_search_events(args.events)
+        print(f'{args.events:,} событий заполнено за {time.perf_counter() - start:.1f} с')
+        # слова разной частоты: самое частое, из середины словаря, редкое; префиксы и пары слов
+        queries = [words[0], words[len(words) // 10], words[len(words) // 2], words[-1],
+                   words[len(words) // 2][:3], words[0][:2], f'{words[3]} {words[len(words) // 4]}',
+                   f'{words[1]} {words[2][:3]}']
+        slow = 0
+        for query in queries:
+            count_ms = elapsed_ms(lambda: db_utils.count_search_events(query), repeat=5)
+            total = db_utils.count_search_events(query)
+            first = db_utils.search_events(query, limit=60)
+            page_ms = elapsed_ms(lambda: db_utils.search_events(query, limit=60), repeat=5)
+            next_ms = elapsed_ms(lambda: db_utils.search_events(
+                query, after=db_utils.search_page_key(first[-1]), limit=60), repeat=5) if first else 0.0
+            jump_ms = elapsed_ms(lambda: db_utils.search_events(query, offset=total // 2, limit=60), repeat=5)
+            worst = max(count_ms, page_ms, next_ms, jump_ms)
+            slow += worst > 50
+            # подсчет не ограничен SEARCH_LIMIT: последнее совпадение тоже доступно
+            if total and len(db_utils.search_events(query, offset=total - 1, limit=60)) != 1:
+                raise SystemExit(f'{query!r}: число совпадений {total} не сходится с результатами')
+            print(f'{"OK  " if worst <= 50 else "SLOW"} {query!r:<20} {total:>9,} совпадений: '
+                  f'подсчет {count_ms:6.1f} мс, первая страница {page_ms:6.1f} мс, '
+                  f'следующая {next_ms:6.1f} мс, середина {jump_ms:6.1f} мс')
+    if slow:
+        raise SystemExit(f'{slow} запрос(ов) медленнее 50 мс')
+
+
+def legacy_report_query(category=None):
+    """Прежний SQL отчета: имена пользователей агрегируются по JOIN при каждом запросе"""
+    user_names = db_utils.get_backend().string_agg('u.user_name', '''
+        FROM Favorites f
+        JOIN Users u ON f.user_id = u.user_id
+        WHERE f.event_id = e.event_id
+    ''')
+    sql = f'''
+        SELECT e.event_id, e.event_name, c.category_name, e.location, e.event_date,
+               e.description, e.favorite_count, IFNULL({user_names}, '') AS user_names
+        FROM Events e
+        LEFT JOIN Categories c ON e.category = c.category_id
+    '''
+    if category:
+        return sql + ' WHERE c.category_name = ?', [category]
+    return sql, []
+
+
+def fetch_all(sql, params=()):
+    with db_utils.db_cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def report_rows(sql, params):
+    """Строки отчета с именами пользователей в виде множества (порядок GROUP_CONCAT не задан)"""
+    with db_utils.db_cursor() as cursor:
+        cursor.execute(sql, params)
+        return sorted(row[:7] + (frozenset(filter(None, row[7].split(', '))),) for row in cursor)
+
+
+# Сводки, которые поддерживают триггеры, и их пересчет по исходным таблицам
+SUMMARY_CHECKS = [
+    ('EventStats',
+     'SELECT event_id FROM EventStats',
+     'SELECT DISTINCT event_id FROM Favorites'),
+    ('Events.favorite_count',
+     'SELECT event_id, favorite_count FROM Events WHERE favorite_count != 0',
+     'SELECT event_id, COUNT(*) FROM Favorites GROUP BY event_id'),
+    ('CategoryDayStats',
+     'SELECT category_id, event_date, event_count FROM CategoryDayStats',
+     """SELECT IFNULL(category, 0), IFNULL(event_date, ''), COUNT(*) FROM Events
+        GROUP BY IFNULL(category, 0), IFNULL(event_date, '')"""),
+    ('UserCategoryStats',
+     'SELECT user_id, category_id, favorite_count FROM UserCategoryStats WHERE favorite_count != 0',
+     """SELECT f.user_id, IFNULL(e.category, 0), COUNT(*) FROM Favorites f
+        JOIN Events e ON f.event_id = e.event_id GROUP BY f.user_id, IFNULL(e.category, 0)"""),
+    ('LocationStats',
+     'SELECT location, category_id, event_count FROM LocationStats WHERE event_count != 0',
+     """SELECT IFNULL(location, ''), IFNULL(category, 0), COUNT(*) FROM Events
+        GROUP BY IFNULL(location, ''), IFNULL(category, 0)"""),
+]
+
+
+def check_report_stats():
+    """Сверяет сводки с пересчетом по исходным таблицам; возвращает расходящиеся строки"""
+    stale = []
+    with db_utils.db_cursor() as cursor:
+        for table, summary, recomputed in SUMMARY_CHECKS:
+            for first, second in ((summary, recomputed), (recomputed, summary)):
+                cursor.execute(f'{first} EXCEPT {second}')
+                stale += [(table,) + tuple(row) for row in cursor.fetchall()]
+    return stale
+
+
+def bench_reports(args):
+    """Отчет с агрегацией имен по JOIN против чтения сводки EventStats; проверка триггеров сводок"""
+    with temp_database():
+        fill_events(args.events)
+        for label, category in (('все события', None), ('категория', 'Категория 3')):
+            legacy_sql, legacy_params = legacy_report_query(category)
+            report_type = db_utils.REPORT_BY_CATEGORY if category else db_utils.REPORT_ALL
+            before = elapsed_ms(lambda: fetch_all(legacy_sql, legacy_params), repeat=3)
+            after = elapsed_ms(lambda: db_utils.get_report(report_type, category=category), repeat=3)
+            sql, params = db_utils.build_report_query(report_type, category=category)
+            same = report_rows(sql, params) == report_rows(legacy_sql, legacy_params)
+            print(f'{"OK  " if same else "FAIL"} {label}: агрегация по JOIN {before:8.2f} мс, '
+                  f'сводка {after:8.2f} мс (x{before / after:.1f})')
+            if not same:
+                raise SystemExit('строки отчета по сводке расходятся с прежним запросом')
+
+        # изменения, которые должны поддерживать сводки в актуальном состоянии
+        rng = random.Random(1)
+        for _ in range(200):
+            event_id = rng.randint(1, args.events)
+            user_id = rng.randint(1, 200)
+            action = rng.randrange(5)
+            if action == 0:
+                db_utils.add_favorite(user_id, event_id)
+            elif action == 1:
+                db_utils.remove_favorite(user_id, event_id)
+            elif action == 2:
+                db_utils.update_event(event_id, f'Событие {event_id}', rng.randint(1, 20),
+                                      f'2021-0{rng.randint(1, 9)}-01', 'Место 1')
+            elif action == 3:
+                db_utils.delete_event(event_id)
+            else:
+                db_utils.add_event('Новое событие', rng.randint(1, 20), '2022-02-02', 'Место 2')
+        db_utils.delete_category(5)
+        stale = check_report_stats()
+        legacy_sql, legacy_params = legacy_report_query()
+        sql, params = db_utils.build_report_query(db_utils.REPORT_ALL)
+        same = report_rows(sql, params) == report_rows(legacy_sql, legacy_params)
+        print(f'{"OK  " if not stale and same else "FAIL"} сводки после 200 изменений: '
+              f'расхождений {len(stale)}, отчет {"совпадает" if same else "расходится"}')
+        if stale or not same:
+            raise SystemExit('сводки отчетов не совпадают с исходными таблицами')
+
+
+def bench_report_cache(args):
+    """Повторный отчет и смена сортировки: запрос к базе против кэша отчетов"""
+    with temp_database():
+        fill_events(args.events)
+        params = (db_utils.REPORT_ALL, '2016-01-01', '2020-12-31', 'Все', 'Все')
+        for sort_option, (key, _) in db_utils.REPORT_SORT_KEYS.items():
+            expected = [key(row) for row in db_utils.get_report(*params, sort_option)]
+            got = [key(row) for row in db_utils.cached_report(*params, sort_option)]
+            print(f'{"OK  " if got == expected else "FAIL"} сортировка в памяти: {sort_option}')
+            if got != expected:
+                raise SystemExit('порядок строк из кэша расходится с ORDER BY')
+
+        sorts = list(db_utils.REPORT_SORTS)
+        query = elapsed_ms(lambda: db_utils.get_report(*params, sorts[0]), repeat=5)
+        cached = elapsed_ms(lambda: db_utils.cached_report(*params, sorts[0]), repeat=5)
+        resort = elapsed_ms(lambda: [db_utils.cached_report(*params, sort) for sort in sorts], repeat=5) / len(sorts)
+        rows = len(db_utils.cached_report(*params))
+        print(f'     {rows:,} строк: запрос {query:.2f} мс, из кэша {cached:.2f} мс, '
+              f'смена сортировки {resort:.2f} мс')
+
+        before = db_utils.report_cache_stats()
+        db_utils.add_event('Новое событие', 1, '2018-05-05', 'Место 1')
+        fresh = len(db_utils.cached_report(*params)) == rows + 1
+        after = db_utils.report_cache_stats()
+        ok = fresh and after.misses == before.misses + 1 and after.generation > before.generation
+        print(f'{"OK  " if ok else "FAIL"} после добавления события отчет перечитан из базы ({after})')
+        if not ok:
+            raise SystemExit('кэш отчетов не сброшен после изменения данных')
+
+
+def python_statistics(date_from, date_to):
+    """Прежний подход: все строки отчета передаются в Python и считаются там"""
+    from collections import Counter
+    stats = {section: Counter() for section in
+             ('Событий по категориям', 'Событий по месяцам', 'Событий по неделям',
+              'Избранное по пользователям', 'Популярные места')}
+    for row in db_utils.iter_report(db_utils.REPORT_ALL, date_from, date_to):
+        stats['Событий по категориям'][row[2] or 'Без категории'] += 1
+        if row[4]:
+            stats['Событий по месяцам'][row[4][:7]] += 1
+            # неделя ISO 8601 — одинаковая в SQLite и MySQL
+            year, week, _ = datetime.date.fromisoformat(row[4]).isocalendar()
+            stats['Событий по неделям'][f'{year:04d}-W{week:02d}'] += 1
+        if row[3]:
+            stats['Популярные места'][row[3]] += 1
+        for name in filter(None, row[7].split(', ')):
+            stats['Избранное по пользователям'][name] += 1
+    return stats
+
+
+def same_statistics(rows, expected):
+    """Разделы по категориям, месяцам и неделям совпадают целиком, рейтинги — по значениям"""
+    for section, counts in expected.items():
+        got = {row.label: row.value for row in rows if row.section == section}
+        if section in ('Избранное по пользователям', 'Популярные места'):
+            top = sorted(counts.values(), reverse=True)[:db_utils.STATS_TOP]
+            if sorted(got.values(), reverse=True) != top or any(counts[k] != v for k, v in got.items()):
+                return False
+        elif got != dict(counts):
+            return False
+    return True
+
+
+def bench_statistics(args):
+    """Статистический отчет GROUP BY в базе против подсчета в Python по всем строкам отчета"""
+    with temp_database():
+        start = time.perf_counter()
+        fill_events(args.events)
+        print(f'{args.events:,} событий заполнено за {time.perf_counter() - start:.1f} с')
+        # весь период, почти весь, половина (худший случай для рейтингов), год и месяц
+        periods = [('весь период', '2000-01-01', '2099-12-31'), ('8 лет из 10', '2016-01-01', '2023-12-31'),
+                   ('половина', '2015-01-01', '2019-12-31'), ('год', '2020-01-01', '2020-12-31'),
+                   ('месяц', '2020-02-01', '2020-02-29')]
+        for label, date_from, date_to in periods:
+            before = elapsed_ms(lambda: python_statistics(date_from, date_to), repeat=1)
+            after = elapsed_ms(lambda: db_utils.get_statistics(date_from, date_to), repeat=3)
+            rows = db_utils.get_statistics(date_from, date_to)
+            if not same_statistics(rows, python_statistics(date_from, date_to)):
+                raise SystemExit(f'{label}: статистика расходится с подсчетом по строкам отчета')
+            print(f'{label:>12}: в Python {before:9.1f} мс, GROUP BY {after:7.1f} мс '
+                  f'(x{before / after:.0f}), строк статистики {len(rows)}')
+        category = elapsed_ms(lambda: db_utils.get_statistics('2000-01-01', '2099-12-31', 'Категория 3'), repeat=3)
+        print(f'   категория за весь период: GROUP BY {category:.1f} мс')
+
+
+# Бюджет времени импорта main (все, что выполняется до создания окна), мс
+STARTUP_BUDGET_MS = 100
+
+# Модули, которые нужны только отчетам и не должны загружаться при запуске
+LAZY_MODULES = ('pandas', 'reportlab', 'openpyxl', 'tkcalendar', 'passwords')
+
+
+def import_times(module, runs=5):
+    """Время импорта module в отдельном процессе по python -X importtime.
+
+    Возвращает медиану полного времени в мс и самые тяжелые прямые импорты
+    последнего запуска [(мс, имя)].
+    """
+    totals = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True)
+        direct = []
+        # строки вида "import time: собственное | накопленное | имя" (время в мкс)
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if not cumulative.strip().isdigit():
+                continue
+            if name.strip() == module:
+                totals.append(int(cumulative) / 1000)
+            elif name.startswith('   ') and not name.startswith('    '):
+                direct.append((int(cumulative) / 1000, name.strip()))
+    heaviest = sorted(direct, reverse=True)[:5]
+    return statistics.median(totals), heaviest
+
+
+def bench_startup(args):
+    """Время запуска: импорт main до показа первого экрана, с бюджетом STARTUP_BUDGET_MS"""
+    total, heaviest = import_times('main')
+    loaded = subprocess.run(
+        [sys.executable, '-c', f'import sys, main; print(*[m for m in {LAZY_MODULES!r} if m in sys.modules])'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+    # последняя строка вывода: модули могут что-то печатать при импорте
+    loaded = loaded.stdout.splitlines()[-1].split() if loaded.stdout.strip() else []
+    ok = total <= STARTUP_BUDGET_MS and not loaded
+    print(f'{"OK  " if ok else "FAIL"} import main: {total:.1f} мс (бюджет {STARTUP_BUDGET_MS} мс)')
+    for ms, name in heaviest:
+        print(f'     {ms:7.1f} мс  {name}')
+    if loaded:
+        print(f'     при запуске загружены модули отчетов: {", ".join(loaded)}')
+    if not ok:
+        raise SystemExit('запуск не укладывается в бюджет')
+
+
+def sample_pdf(font_pair):
+    """Байты PDF с кириллицей, набранного шрифтами font_pair (без даты и случайного ID)"""
+    from reportlab.pdfgen import canvas
+
+    out = io.BytesIO()
+    pdf = canvas.Canvas(out, invariant=1)
+    for font in font_pair:
+        pdf.setFont(font.fontName, 12)
+        pdf.drawString(72, 720, 'Отчет по событиям: Жжж, 100% Ёё')
+        pdf.showPage()
+    pdf.save()
+    return out.getvalue()
+
+
+def bench_fonts(args):
+    """Поиск и загрузка шрифтов PDF: без кэша, с пустым кэшем на диске и из кэша.
+
+    Проверяет, что шрифты по путям из кэша дают тот же PDF, что и без кэша, и что
+    кандидат без кириллицы пропускается в пользу следующего, а отметка об этом
+    сохраняется в кэше.
+    """
+    import reportlab
+    from reportlab.pdfbase import pdfmetrics
+    import fonts
+
+    found = fonts.load_fonts(use_cache=False)
+    if found is None:
+        raise SystemExit('шрифт с кириллицей не найден в ' + ', '.join(fonts.font_dirs()))
+    regular_path = found[0].face.filename
+    print(f'шрифт: {regular_path}')
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = os.path.join(tmp, fonts.CACHE_FILE)
+        uncached = elapsed_ms(lambda: fonts.load_fonts(use_cache=False), repeat=5)
+        cold = elapsed_ms(lambda: fonts.load_fonts(cache_file=cache_file), repeat=1)
+        cached = elapsed_ms(lambda: fonts.load_fonts(cache_file=cache_file), repeat=5)
+        print(f'без кэша:      {uncached:7.1f} мс')
+        print(f'заполнение:    {cold:7.1f} мс')
+        print(f'из кэша:       {cached:7.1f} мс')
+
+        for font in found:
+            pdfmetrics.registerFont(font)
+        expected = sample_pdf(found)
+        from_cache = fonts.load_fonts(cache_file=cache_file)
+        for font in from_cache:
+            pdfmetrics.registerFont(font)
+        same = sample_pdf(from_cache) == expected
+        print(f'{"OK  " if same else "FAIL"} PDF из кэша совпадает с PDF без кэша')
+
+        # Vera.ttf из reportlab без кириллицы под именем первого кандидата
+        fonts_dir = os.path.join(tmp, 'fonts')
+        os.mkdir(fonts_dir)
+        shutil.copy(os.path.join(os.path.dirname(reportlab.__file__), 'fonts', 'Vera.ttf'),
+                    os.path.join(fonts_dir, fonts.FONT_CANDIDATES[0][0]))
+        shutil.copy(regular_path, fonts_dir)
+        fallback_cache = os.path.join(tmp, 'fallback.json')
+        fallback = fonts.load_fonts([fonts_dir], cache_file=fallback_cache)
+        with open(fallback_cache, encoding='utf-8') as f:
+            verdicts = {os.path.basename(path): entry[1] for path, entry in json.load(f)['cyrillic'].items()}
+        skipped = (fallback is not None
+                   and os.path.basename(fallback[0].face.filename) == os.path.basename(regular_path)
+                   and verdicts.get(fonts.FONT_CANDIDATES[0][0]) is False)
+        print(f'{"OK  " if skipped else "FAIL"} кандидат без кириллицы пропущен')
+    if not (same and skipped):
+        raise SystemExit('проверка шрифтов не прошла')
+
+
+def bench_batch(args):
+    """Пакет PDF-отчетов по категориям: последовательно и в пуле процессов"""
+    import batch_reports
+
+    workers = max(2, os.cpu_count() or 1)
+    with temp_database() as path:
+        fill_events(args.events)
+        for count in (1, workers):
+            with tempfile.TemporaryDirectory() as out_dir:
+                jobs = batch_reports.expand_jobs(
+                    [{'type': 'category', 'category': '*', 'format': 'pdf'}], output_dir=out_dir)
+                batch = batch_reports.run_batch(jobs, count)
+            errors = [result.error for result in batch.results if result.error]
+            print(f'{count:2} процесс(ов): {len(jobs)} отчетов, {batch.rows:,} строк за {batch.elapsed:.2f} с '
+                  f'({batch.reports_per_sec:.1f} отчетов/с), ошибок: {batch.failed}')
+            if errors:
+                raise SystemExit(errors[0])
+    print(f'ядер: {os.cpu_count()}')
+
+
+def bench_theme(args):
+    """Переключение темы для экранов из множества виджетов (нужен дисплей)"""
+    import tkinter as tk
+    from tkinter import TclError, ttk
+
+    from themes import ThemeEngine
+
+    try:
+        root = tk.Tk()
+    except TclError as e:
+        raise SystemExit(f'нет дисплея для Tk: {e}')
+    try:
+        themes = ThemeEngine(root)
+        p = themes.palette
+        widgets = 0
+        for _ in range(10):
+            frame = tk.Frame(root, bg=p.bg)
+            for i in range(40):
+                row = tk.Frame(frame, bg=p.bg)
+                tk.Label(row, text=f'Поле {i}', bg=p.bg, fg=p.fg).pack(side='left')
+                ttk.Entry(row, style='TEntry').pack(side='left')
+                ttk.Button(row, text='Кнопка', style='Rounded.TButton').pack(side='left')
+                ttk.Combobox(row, style='CustomCombobox.TCombobox').pack(side='left')
+                widgets += 5
+            ttk.Treeview(frame).pack()
+            themes.register(frame)
+        root.update()
+        switches = [themes.set_theme(theme) for theme in ('light', 'dark') * 10]
+        print(f'{widgets + 10:,} виджетов: переключение темы {statistics.mean(switches):.2f} мс '
+              f'(макс. {max(switches):.2f} мс)')
+    finally:
+        root.destroy()
+
+
+PASSWORD_SETTINGS = [
+    ('scrypt', {'n': 2 ** 12, 'r': 8, 'p': 1}, None),
+    ('scrypt', {'n': 2 ** 14, 'r': 8, 'p': 1}, None),
+    ('scrypt', {'n': 2 ** 15, 'r': 8, 'p': 1}, None),
+    ('pbkdf2_sha256', None, 100000),
+    ('pbkdf2_sha256', None, 600000),
+]
+
+
+def bench_passwords(args):
+    """Входов в секунду при одновременных входах для разных параметров хеширования"""
+    import hashlib
+    from concurrent.futures import ThreadPoolExecutor
+
+    import db_config
+    import passwords
+
+    saved = (db_config.PASSWORD_SCHEME, db_config.SCRYPT_PARAMS, db_config.PBKDF2_ITERATIONS)
+    users, logins, clients = 10, 40, 8
+    try:
+        print(f'потоков хеширования: {db_config.PASSWORD_HASH_WORKERS}, клиентов: {clients}')
+        for scheme, scrypt_params, iterations in PASSWORD_SETTINGS:
+            db_config.PASSWORD_SCHEME = scheme
+            db_config.SCRYPT_PARAMS = scrypt_params or saved[1]
+            db_config.PBKDF2_ITERATIONS = iterations or saved[2]
+            with temp_database():
+                for i in range(users):
+                    db_utils.register_user(f'Пользователь {i}', f'user{i}', f'password{i}', f'user{i}@example.com')
+
+                def login(i):
+                    start = time.perf_counter()
+                    user = db_utils.authenticate_user(f'user{i % users}', f'password{i % users}')
+                    assert user is not None
+                    return (time.perf_counter() - start) * 1000
+
+                for label, ttl in (('без кэша', 0), ('кэш проверок', passwords.VERIFY_CACHE_TTL)):
+                    # нулевой срок жизни: каждая проверка пересчитывает хеш
+                    saved_ttl, passwords.VERIFY_CACHE_TTL = passwords.VERIFY_CACHE_TTL, ttl
+                    try:
+                        start = time.perf_counter()
+                        with ThreadPoolExecutor(clients) as pool:
+                            latencies = sorted(pool.map(login, range(logins)))
+                        elapsed = time.perf_counter() - start
+                    finally:
+                        passwords.VERIFY_CACHE_TTL = saved_ttl
+                    p95 = latencies[int(len(latencies) * 0.95) - 1]
+                    print(f'{scheme:>14} {str(scrypt_params or iterations):>32} {label:>13}: '
+                          f'{logins / elapsed:8.1f} входов/с, p95 {p95:7.1f} мс')
+
+        # старый хеш SHA-256 пересчитывается при входе
+        db_config.PASSWORD_SCHEME, db_config.SCRYPT_PARAMS, db_config.PBKDF2_ITERATIONS = saved
+        with temp_database():
+            with db_utils.transaction() as cursor:
+                cursor.execute('INSERT INTO Users (user_name, login, password, email) VALUES (?, ?, ?, ?)',
+                               ('Старый', 'legacy', hashlib.sha256(b'secret1').hexdigest(), 'old@example.com'))
+            ok = db_utils.authenticate_user('legacy', 'secret1') is not None
+            with db_utils.db_cursor() as cursor:
+                cursor.execute("SELECT password FROM Users WHERE login = 'legacy'")
+                stored = cursor.fetchone()[0]
+            passwords._verified.clear()
+            ok = ok and not passwords.needs_rehash(stored) and db_utils.authenticate_user('legacy', 'secret1')
+            ok = ok and db_utils.authenticate_user('legacy', 'wrong') is None
+            print(f'{"OK  " if ok else "FAIL"} старый хеш SHA-256 пересчитан при входе: {stored.split("$")[0]}')
+            if not ok:
+                raise SystemExit('старый хеш не пересчитан')
+    finally:
+        db_config.PASSWORD_SCHEME, db_config.SCRYPT_PARAMS, db_config.PBKDF2_ITERATIONS = saved
+
+
+def bench_register(args):
+    """Регистрация одним INSERT: одновременные регистрации одного логина и скорость регистрации"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    import db_config
+    import passwords
+
+    saved = (db_config.PASSWORD_SCHEME, db_config.PBKDF2_ITERATIONS)
+    # дешевый хеш, чтобы измерять работу с базой, а не стоимость хеширования
+    db_config.PASSWORD_SCHEME, db_config.PBKDF2_ITERATIONS = passwords.PBKDF2, 1000
+    clients, count = 8, 200
+    try:
+        with temp_database():
+            def register(i):
+                return db_utils.register_user(f'Гонка {i}', 'same', 'secret', f'race{i}@example.com')
+
+            with ThreadPoolExecutor(clients) as pool:
+                results = list(pool.map(register, range(clients * 4)))
+            winners = [value for ok, value in results if ok]
+            with db_utils.db_cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM Users WHERE login = 'same'")
+                stored = cursor.fetchone()[0]
+            ok = len(winners) == 1 and stored == 1 and db_utils.authenticate_user('same', 'secret') == winners[0]
+            print(f'{"OK  " if ok else "FAIL"} {len(results)} одновременных регистраций одного логина: '
+                  f'успешных {len(winners)}, в базе {stored}')
+            if not ok:
+                raise SystemExit('повторный логин зарегистрирован')
+
+            start = time.perf_counter()
+            for i in range(count):
+                ok, user = db_utils.register_user(f'Пользователь {i}', f'user{i}', 'secret', f'user{i}@example.com')
+                assert ok and user[1] == f'Пользователь {i}'
+            elapsed = time.perf_counter() - start
+            print(f'регистрация: {count / elapsed:8.1f} пользователей/с ({elapsed / count * 1000:.2f} мс)')
+    finally:
+        db_config.PASSWORD_SCHEME, db_config.PBKDF2_ITERATIONS = saved
+
+
+@contextmanager
+def fake_mysql_database():
+    """Временная база за MySQLBackend с поддельным драйвером fake_mysql: SQL идет в диалекте MySQL"""
+    import fake_mysql
+    from db_backend import MySQLBackend
+
+    tmp_dir = tempfile.mkdtemp(prefix='eventdesign-bench-')
+    config = {'database': os.path.join(tmp_dir, 'mysql.db')}
+    try:
+        db_utils.set_backend(MySQLBackend(config, driver=fake_mysql))
+        db_utils.init_db()
+        yield config
+    finally:
+        # следующее обращение к базе снова создаст бэкенд из настроек
+        db_utils.set_backend(None)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def dialect_scenario():
+    """Одни и те же изменения и запросы через активный бэкенд; результаты по названиям проверок"""
+    results = {}
+    for name in ('Концерты', 'Выставки', 'Лекции'):
+        db_utils.add_category(name, '')
+    categories = db_utils.get_category_map()
+    users = [db_utils.register_user(f'Пользователь {i}', f'user{i}', 'secret', f'user{i}@example.com')[1][0]
+             for i in range(3)]
+    results['повторный логин'] = db_utils.register_user('Двойник', 'user0', 'secret', 'double@example.com')
+    results['вход'] = db_utils.authenticate_user('user1', 'secret')
+
+    # даты через Новый год: недели ISO на границе лет
+    start = datetime.date(2020, 12, 20)
+    events = []
+    for i in range(40):
+        ok, event_id = db_utils.add_event(
+            f'Событие {i} {"джаз" if i % 3 == 0 else "рок"}', categories[('Концерты', 'Выставки', 'Лекции')[i % 3]],
+            str(start + datetime.timedelta(days=i * 2)), f'Место {i % 4}', f'Описание 100% события {i}')
+        events.append(event_id)
+    events.append(db_utils.add_event('Событие без даты', categories['Лекции'], None, 'Место 1')[1])
+    for i, event_id in enumerate(events):
+        if i % 2 == 0:
+            db_utils.add_favorite(users[i % 3], event_id)
+        if i % 4 == 0:
+            db_utils.add_favorite(users[(i + 1) % 3], event_id)
+    db_utils.add_favorite(users[0], events[0])  # повтор игнорируется
+    db_utils.remove_favorite(users[1], events[4])
+    db_utils.add_favorite_event(users[2], 'Событие из избранного', categories['Выставки'], '2021-01-03', 'Место 2')
+    db_utils.update_event(events[1], 'Событие 1 джаз', categories['Лекции'], '2021-01-04', 'Место 3')
+    db_utils.delete_event(events[2])
+
+    results['события'] = db_utils.get_events(sort='date')
+    first = db_utils.get_events_page(limit=10)
+    results['страницы'] = [first, db_utils.get_events_page(after=db_utils.event_page_key(first[-1]), limit=10),
+                           db_utils.get_events_page(offset=25, limit=10)]
+    results['фильтр'] = db_utils.get_events(db_utils.EventFilter(category_id=categories['Концерты'], favorite=True,
+                                                                 date_from='2021-01-01'), sort='name')
+    results['избранное'] = db_utils.get_favorites(users[0])
+    results['поиск'] = sorted(row[:7] for row in db_utils.search_events('джаз', limit=100))
+    results['поиск по префиксу'] = (db_utils.count_search_events('со'),
+                                    sorted(row[:7] for row in db_utils.search_events('событ рок', limit=100)))
+    for report_type in (db_utils.REPORT_ALL, db_utils.REPORT_BY_CATEGORY, db_utils.REPORT_BY_USER):
+        sql, params = db_utils.build_report_query(report_type, '2020-12-25', '2021-02-01', 'Концерты',
+                                                  'Пользователь 1', 'Название (А-Я)')
+        results[f'отчет {report_type}'] = report_rows(sql, params)
+    results['отчет потоком'] = sorted(db_utils.iter_report(db_utils.REPORT_ALL, batch_size=7))
+    # порядок ORDER BY (экспорт) и сортировки в памяти (экран отчетов)
+    unsorted = db_utils.get_report(db_utils.REPORT_ALL)
+    results['сортировка отчета'] = {
+        sort: ([row[0] for row in db_utils.get_report(db_utils.REPORT_ALL, sort_option=sort)],
+               [row[0] for row in db_utils.sort_report_rows(unsorted, sort)])
+        for sort in db_utils.REPORT_SORTS}
+    results['статистика'] = db_utils.get_statistics()
+    results['статистика за период'] = db_utils.get_statistics('2020-12-28', '2021-01-10', 'Концерты')
+    # сводки, которые поддерживают триггеры (у MySQL — свои тексты триггеров)
+    results['сводки'] = check_report_stats()
+    db_utils.analyze()
+    db_utils.explain_query_plan('SELECT * FROM Events WHERE event_date = ?', ('2021-01-01',))
+    return results
+
+
+def bench_mysql(args):
+    """Диалект MySQL без сервера: те же операции через SQLiteBackend и через MySQLBackend с fake_mysql"""
+    import db_config
+    import fake_mysql
+    from db_backend import MySQLBackend
+
+    saved = (db_config.PASSWORD_SCHEME, db_config.PBKDF2_ITERATIONS)
+    db_config.PASSWORD_SCHEME, db_config.PBKDF2_ITERATIONS = 'pbkdf2_sha256', 1000
+    try:
+        with temp_database():
+            expected = dialect_scenario()
+        with fake_mysql_database() as config:
+            got = dialect_scenario()
+            # подключение только для чтения: чтение работает, запись отклоняется
+            db_utils.set_backend(MySQLBackend(config, driver=fake_mysql, read_only=True))
+            read_only = (db_utils.get_events(sort='date') == expected['события']
+                         and not db_utils.add_category('Запись', '')[0])
+    finally:
+        db_config.PASSWORD_SCHEME, db_config.PBKDF2_ITERATIONS = saved
+
+    failed = [name for name in expected if got[name] != expected[name] or name == 'сводки' and got[name]]
+    for name in expected:
+        print(f'{"FAIL" if name in failed else "OK  "} {name}')
+    print(f'{"OK  " if read_only else "FAIL"} сессия только для чтения')
+    if failed or not read_only:
+        raise SystemExit('бэкенды SQLite и MySQL расходятся')
+
+
+# Бенчмарки, которые только проверяют и быстро завершаются; их запускает `check`
+CHECKS = ['query-plans', 'mysql']
+
+
+def bench_check(args):
+    """Все проверки из CHECKS подряд; код выхода 1, если хотя бы одна не прошла"""
+    failed = []
+    for name in CHECKS:
+        print(f'== {name}')
+        try:
+            BENCHMARKS[name](args)
+        except SystemExit as e:
+            if e.code:
+                print(e.code if isinstance(e.code, str) else f'код выхода {e.code}')
+                failed.append(name)
+    if failed:
+        raise SystemExit('не прошли проверки: ' + ', '.join(failed))
+
+
+BENCHMARKS = {
+    'connections': bench_connections,
+    'query-plans': bench_query_plans,
+    'import': bench_import,
+    'pages': bench_pages,
+    'edits': bench_edits,
+    'export-excel': bench_export_excel,
+    'export-pdf': bench_export_pdf,
+    'search': bench_search,
+    'reports': bench_reports,
+    'statistics': bench_statistics,
+    'startup': bench_startup,
+    'fonts': bench_fonts,
+    'batch': bench_batch,
+    'report-cache': bench_report_cache,
+    'theme': bench_theme,
+    'passwords': bench_passwords,
+    'register': bench_register,
+    'mysql': bench_mysql,
+    'check': bench_check,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки EventDesign')
+    parser.add_argument('name', choices=sorted(BENCHMARKS))
+    parser.add_argument('--calls', type=int, default=5000, help='число вызовов')
+    parser.add_argument('--events', type=int, default=20000, help='число синтетических событий')
+    parser.add_argument('--rows', type=int, default=100000, help='число строк в отчете для экспорта')
+    args = parser.parse_args()
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == '__main__':
+    main()
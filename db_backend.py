@@ -0,0 +1,247 @@
+"""Бэкенды хранения данных: SQLite (встроенная база) и MySQL (общий сервер).
+
+Запросы в db_utils пишутся в стиле SQLite с плейсхолдерами `?`.
+Бэкенд отвечает за подключения и за различия диалектов: стиль плейсхолдеров,
+получение id вставленной строки, агрегацию строк и синтаксис DDL.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class Backend:
+    """Общий интерфейс бэкендов"""
+
+    name = None
+
+    def last_insert_id(self, cursor):
+        """Id строки, вставленной последним INSERT на этом курсоре"""
+        return cursor.lastrowid
+
+
+class SQLiteBackend(Backend):
+    """Встроенная база SQLite: у каждого потока своё долгоживущее подключение"""
+
+    name = 'sqlite'
+    insert_ignore = 'INSERT OR IGNORE'
+    primary_key = 'INTEGER PRIMARY KEY AUTOINCREMENT'
+    explain_prefix = 'EXPLAIN QUERY PLAN '
+    transactional_ddl = True
+    integrity_error = sqlite3.IntegrityError
+
+    # Настройки SQLite, применяемые к каждому новому подключению
+    PRAGMAS = (
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('foreign_keys', 'ON'),
+        ('temp_store', 'MEMORY'),
+        ('cache_size', -8000),
+        ('busy_timeout', 5000),
+    )
+
+    def __init__(self, path, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        self._local = threading.local()
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Новое подключение с настроенными PRAGMA.
+
+        read_only=True открывает файл в режиме mode=ro: запись в базу невозможна,
+        а режим журнала остается тем, который выбрал пишущий процесс.
+        """
+        if self.read_only:
+            conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+        for name, value in self.PRAGMAS:
+            if not (self.read_only and name == 'journal_mode'):
+                conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Закэшированное подключение текущего потока"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.add(conn)
+        yield conn
+
+    def cursor(self, conn, stream=False):
+        # курсор SQLite и так читает строки по мере выборки
+        return conn.cursor()
+
+    def close(self):
+        """Закрывает подключение текущего потока"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+            self._local.conn = None
+
+    def close_all(self):
+        """Закрывает все открытые подключения"""
+        with self._lock:
+            conns = list(self._connections)
+            self._connections.clear()
+        for conn in conns:
+            conn.close()
+        self._local.conn = None
+
+    def string_agg(self, column, from_sql, separator=', '):
+        """Подзапрос, склеивающий различные значения column через separator"""
+        return (f"(SELECT GROUP_CONCAT(agg_value, '{separator}') "
+                f"FROM (SELECT DISTINCT {column} AS agg_value {from_sql}))")
+
+    def analyze_sql(self):
+        return 'PRAGMA optimize'
+
+    def binary_sort(self, column):
+        """Выражение для ORDER BY, сравнивающее строки по кодам символов (в SQLite так по умолчанию)"""
+        return column
+
+    def week_sql(self, column):
+        """Выражение 'ГГГГ-Wнн' — неделя ISO 8601 даты column, как DATE_FORMAT '%x-W%v' в MySQL.
+
+        Неделя начинается в понедельник и относится к году своего четверга:
+        30.12.2024 — это '2025-W01', а 01.01.2021 — '2020-W53'.
+        """
+        thursday = f"date({column}, '-3 days', 'weekday 4')"
+        return (f"strftime('%Y', {thursday}) || '-W' || "
+                f"printf('%02d', (strftime('%j', {thursday}) - 1) / 7 + 1)")
+
+    def fulltext_query(self, words):
+        """Запрос FTS5: все слова обязательны, последнее (набирается сейчас) ищется как префикс.
+
+        Префикс из одной буквы совпадает почти со всем, поэтому ищется как слово.
+        """
+        last = f'"{words[-1]}"*' if len(words[-1]) > 1 else f'"{words[-1]}"'
+        return ' '.join([f'"{word}"' for word in words[:-1]] + [last])
+
+    def search_events_sql(self, query, ranked=True):
+        """Подзапрос (event_id, search_rank) полнотекстового поиска событий и его параметры.
+
+        Меньший ранг — лучшее совпадение. ranked=False возвращает нулевой ранг:
+        без подсчета bm25 совпадения читаются в порядке id.
+        """
+        rank = 'rank' if ranked else '0'
+        return (f'SELECT rowid AS event_id, {rank} AS search_rank FROM EventsSearch WHERE EventsSearch MATCH ?',
+                [query])
+
+
+class MySQLBackend(Backend):
+    """Сервер MySQL: подключения берутся из пула mysql-connector.
+
+    driver — модуль с интерфейсом mysql.connector (по умолчанию сам mysql.connector);
+    fake_mysql позволяет проверить диалект MySQL без сервера (python bench.py mysql).
+    """
+
+    name = 'mysql'
+    insert_ignore = 'INSERT IGNORE'
+    primary_key = 'INT AUTO_INCREMENT PRIMARY KEY'
+    explain_prefix = 'EXPLAIN '
+    transactional_ddl = False
+
+    def __init__(self, config, pool_size=5, driver=None, read_only=False):
+        if driver is None:
+            import mysql.connector as driver
+            import mysql.connector.pooling
+        self.driver = driver
+        self.read_only = read_only
+        self.integrity_error = driver.IntegrityError
+        self.pool = driver.pooling.MySQLConnectionPool(
+            pool_name='eventdesign', pool_size=pool_size, **config)
+
+    def connect(self):
+        return self.pool.get_connection()
+
+    @contextmanager
+    def connection(self):
+        """Подключение из пула; при выходе возвращается в пул"""
+        conn = self.pool.get_connection()
+        try:
+            if self.read_only:
+                # сессия сбрасывается при возврате подключения в пул
+                cursor = conn.cursor()
+                cursor.execute('SET SESSION TRANSACTION READ ONLY')
+                cursor.close()
+            yield conn
+        finally:
+            conn.close()
+
+    def cursor(self, conn, stream=False):
+        """Буферизованный курсор; stream=True — небуферизованный, строки читаются с сервера по мере выборки"""
+        return _MySQLCursor(conn.cursor(buffered=not stream))
+
+    def close(self):
+        pass
+
+    def close_all(self):
+        pass
+
+    def string_agg(self, column, from_sql, separator=', '):
+        return f"(SELECT GROUP_CONCAT(DISTINCT {column} SEPARATOR '{separator}') {from_sql})"
+
+    def analyze_sql(self):
+        return 'ANALYZE TABLE Users, Categories, Events, Favorites'
+
+    def binary_sort(self, column):
+        # сопоставление по умолчанию не различает регистр и диакритику, а отчеты
+        # на экране сортируются в Python по кодам символов — как utf8mb4_bin
+        return f'CONVERT({column} USING utf8mb4) COLLATE utf8mb4_bin'
+
+    def week_sql(self, column):
+        # %x и %v — год и номер недели ISO 8601, как у SQLiteBackend.week_sql
+        return f"DATE_FORMAT({column}, '%x-W%v')"
+
+    def fulltext_query(self, words):
+        """Запрос BOOLEAN MODE: все слова обязательны, последнее ищется как префикс"""
+        last = f'+{words[-1]}*' if len(words[-1]) > 1 else f'+{words[-1]}'
+        return ' '.join([f'+{word}' for word in words[:-1]] + [last])
+
+    def search_events_sql(self, query, ranked=True):
+        match = 'MATCH(event_name, location, description, note) AGAINST (? IN BOOLEAN MODE)'
+        if not ranked:
+            return f'SELECT event_id, 0 AS search_rank FROM Events WHERE {match}', [query]
+        return f'SELECT event_id, -{match} AS search_rank FROM Events WHERE {match}', [query, query]
+
+
+def to_mysql(sql):
+    """Переводит плейсхолдеры `?` в `%s` и экранирует литеральные `%`"""
+    return sql.replace('%', '%%').replace('?', '%s')
+
+
+class _MySQLCursor:
+    """Курсор MySQL, принимающий запросы с плейсхолдерами `?`"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        if params:
+            return self._cursor.execute(to_mysql(sql), tuple(params))
+        return self._cursor.execute(sql)
+
+    def executemany(self, sql, seq_of_params):
+        return self._cursor.executemany(to_mysql(sql), [tuple(p) for p in seq_of_params])
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+def create_backend(name, path=None, config=None, pool_size=5, read_only=False):
+    """Создаёт бэкенд по имени из настроек ('sqlite' или 'mysql')"""
+    if name == 'sqlite':
+        return SQLiteBackend(path, read_only)
+    if name == 'mysql':
+        return MySQLBackend(config, pool_size, read_only=read_only)
+    raise ValueError(f'Неизвестный бэкенд базы данных: {name}')
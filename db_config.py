@@ -4,4 +4,20 @@ DB_CONFIG = {
     'password': '2277',
     'database': 'eventdesign',
     'port': 3306
-} 
\ No newline at end of file
+}
+
+# Бэкенд хранения: 'sqlite' (файл eventdesign.db) или 'mysql' (сервер из DB_CONFIG).
+# Можно переопределить переменной окружения EVENTDESIGN_DB_BACKEND.
+DB_BACKEND = 'sqlite'
+
+# Размер пула подключений MySQL
+DB_POOL_SIZE = 5
+
+# Хеширование паролей: 'scrypt' или 'pbkdf2_sha256' и параметры стоимости.
+# Хеши, записанные с другой схемой или параметрами, пересчитываются при следующем входе.
+PASSWORD_SCHEME = 'scrypt'
+SCRYPT_PARAMS = {'n': 2 ** 14, 'r': 8, 'p': 1}
+PBKDF2_ITERATIONS = 600000
+
+# Число потоков, одновременно считающих хеши паролей; остальные входы ждут в очереди
+PASSWORD_HASH_WORKERS = 2
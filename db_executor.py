@@ -0,0 +1,106 @@
+"""Фоновое выполнение запросов к базе данных для интерфейса Tk.
+
+Записи выполняются одним потоком-писателем (SQLite допускает одного писателя
+одновременно), чтения — пулом потоков-читателей. Результаты возвращаются
+в главный поток Tk через очередь, которую опрашивает after(), поэтому
+обработчики могут свободно работать с виджетами.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DBTask:
+    """Задача в фоне: обертка над Future с отменой"""
+
+    def __init__(self, future):
+        self.future = future
+        self.cancelled = False
+
+    def cancel(self):
+        """Отменяет задачу: если она уже выполняется, ее результат будет проигнорирован"""
+        self.cancelled = True
+        self.future.cancel()
+
+    @property
+    def done(self):
+        return self.cancelled or self.future.done()
+
+
+class DBExecutor:
+    """Пул потоков для вызовов db_utils с доставкой результатов в главный поток Tk"""
+
+    POLL_MS = 30
+
+    def __init__(self, root, readers=3):
+        self.root = root
+        self._main_thread = threading.get_ident()
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix='db-writer')
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix='db-reader')
+        self._calls = queue.SimpleQueue()
+        self._pending = 0
+        self._busy_listeners = []
+        self._closed = False
+        self._poll()
+
+    def submit(self, fn, *args, on_done=None, on_error=None, write=False, **kwargs):
+        """Выполняет fn(*args, **kwargs) в фоне.
+
+        on_done(result) или on_error(exception) вызываются в главном потоке Tk,
+        если задача не была отменена. write=True направляет вызов потоку-писателю.
+        """
+        pool = self._writer if write else self._readers
+        future = pool.submit(fn, *args, **kwargs)
+        task = DBTask(future)
+        self._set_pending(self._pending + 1)
+        future.add_done_callback(lambda f: self._calls.put((self._finish, (task, on_done, on_error))))
+        return task
+
+    def call_in_ui(self, fn, *args):
+        """Вызывает fn в главном потоке Tk (сразу, если вызов уже из него)"""
+        if threading.get_ident() == self._main_thread:
+            fn(*args)
+        else:
+            self._calls.put((fn, args))
+
+    def add_busy_listener(self, listener):
+        """listener(busy) вызывается, когда появляются или заканчиваются фоновые задачи"""
+        self._busy_listeners.append(listener)
+
+    def shutdown(self):
+        self._closed = True
+        self._writer.shutdown(wait=False, cancel_futures=True)
+        self._readers.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(self, task, on_done, on_error):
+        self._set_pending(self._pending - 1)
+        if task.cancelled or task.future.cancelled():
+            return
+        error = task.future.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                self.root.report_callback_exception(type(error), error, error.__traceback__)
+        elif on_done:
+            on_done(task.future.result())
+
+    def _set_pending(self, pending):
+        was_busy = self._pending > 0
+        self._pending = pending
+        if was_busy != (pending > 0):
+            for listener in self._busy_listeners:
+                listener(pending > 0)
+
+    def _poll(self):
+        while True:
+            try:
+                fn, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                self.root.report_callback_exception(type(e), e, e.__traceback__)
+        if not self._closed:
+            self.root.after(self.POLL_MS, self._poll)
@@ -1,163 +1,856 @@
-import sqlite3
-import hashlib
 import os
+import re
+import datetime
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+import db_config
+from db_backend import create_backend
 
 # Путь к базе данных
 DB_PATH = os.path.join(os.path.dirname(__file__), 'eventdesign.db')
 
+# Активный бэкенд хранения (создаётся при первом обращении)
+_backend = None
+
+def get_backend():
+    """Возвращает бэкенд из настроек db_config, создавая его при первом обращении"""
+    global _backend
+    name = os.environ.get('EVENTDESIGN_DB_BACKEND', db_config.DB_BACKEND)
+    if _backend is not None and (_backend.name != 'sqlite' or _backend.path == DB_PATH):
+        return _backend
+    if _backend is not None:
+        _backend.close_all()
+    _backend = create_backend(name, DB_PATH, db_config.DB_CONFIG, db_config.DB_POOL_SIZE)
+    # другая база — другие категории и отчеты
+    invalidate_categories()
+    _data_changed()
+    return _backend
+
+def set_backend(backend):
+    """Подменяет активный бэкенд (например, на MySQL с собственным драйвером)"""
+    global _backend
+    if _backend is not None:
+        _backend.close_all()
+    _backend = backend
+    invalidate_categories()
+    _data_changed()
+
+def use_read_only_backend():
+    """Переключает процесс на подключения только для чтения к базе из настроек
+    (например, в процессах пакетного формирования отчетов)"""
+    name = os.environ.get('EVENTDESIGN_DB_BACKEND', db_config.DB_BACKEND)
+    set_backend(create_backend(name, DB_PATH, db_config.DB_CONFIG, 1, read_only=True))
+
 def get_connection():
-    """Создаем и возвращаем подключение к базе данных"""
-    conn = sqlite3.connect(DB_PATH)
-    return conn
+    """Создаем и возвращаем новое подключение к базе данных"""
+    return get_backend().connect()
+
+@contextmanager
+def db_cursor(stream=False):
+    """Курсор для чтения (без фиксации транзакции).
+
+    stream=True — строки не буферизуются целиком, а читаются с сервера по мере fetchmany.
+    """
+    backend = get_backend()
+    with backend.connection() as conn:
+        cursor = backend.cursor(conn, stream)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+@contextmanager
+def transaction():
+    """Курсор в транзакции: commit при успешном выходе, rollback при ошибке"""
+    backend = get_backend()
+    with backend.connection() as conn:
+        cursor = backend.cursor(conn)
+        try:
+            yield cursor
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+def close_connection():
+    """Закрывает подключение текущего потока"""
+    if _backend is not None:
+        _backend.close()
+
+def close_all_connections():
+    """Закрывает все открытые подключения (при завершении приложения)"""
+    if _backend is not None:
+        _backend.close_all()
+
+# Изменение данных: действие ('insert', 'update', 'delete' или 'reload'), таблица,
+# ключ строки, новая строка в том виде, в каком ее возвращают функции чтения,
+# и прежняя строка (для обновления и удаления событий)
+Change = namedtuple('Change', 'action table key row old', defaults=(None, None, None))
+
+_listeners = []
+
+def subscribe(listener):
+    """Подписка на изменения данных: listener(change) вызывается после фиксации транзакции"""
+    _listeners.append(listener)
+
+def unsubscribe(listener):
+    """Отмена подписки на изменения данных"""
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+# Версия данных: увеличивается при каждом изменении Events, Favorites, Categories
+# и Users через этот модуль и при смене базы. Кэши сравнивают с ней версию, с
+# которой были получены их строки. Записи других процессов версию не меняют.
+_data_version = 0
+
+def data_version():
+    """Текущая версия данных"""
+    return _data_version
+
+def _data_changed():
+    global _data_version
+    with _report_lock:
+        _data_version += 1
+        _report_cache.clear()
+
+def _publish(action, table, key=None, row=None, old=None):
+    change = Change(action, table, key, row, old)
+    _data_changed()
+    if table == 'Events':
+        # число совпадений поиска могло измениться
+        with _ranked_lock:
+            _ranked_searches.clear()
+    elif table == 'Categories':
+        invalidate_categories()
+    for listener in list(_listeners):
+        listener(change)
 
 def init_db():
     """Инициализация базы данных и создание таблиц"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Создаем таблицу пользователей
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Users (
-        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_name TEXT NOT NULL,
-        login TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        email TEXT NOT NULL
-    )''')
-    
-    # Создаем таблицу категорий
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Categories (
-        category_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        category_name TEXT NOT NULL,
-        description TEXT
-    )''')
-    
-    # Создаем таблицу событий
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Events (
-        event_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        event_name TEXT NOT NULL,
-        category INTEGER,
-        location TEXT,
-        event_date TEXT,
-        description TEXT,
-        note TEXT,
-        favorite BOOLEAN DEFAULT 0,
-        FOREIGN KEY (category) REFERENCES Categories(category_id) ON DELETE SET NULL
-    )''')
-    
-    # Создаем таблицу избранного
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Favorites (
-        user_id INTEGER,
-        event_id INTEGER,
-        PRIMARY KEY (user_id, event_id),
-        FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE,
-        FOREIGN KEY (event_id) REFERENCES Events(event_id) ON DELETE CASCADE
-    )''')
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+    pk = get_backend().primary_key
+    with transaction() as cursor:
+        # Создаем таблицу пользователей
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS Users (
+            user_id {pk},
+            user_name VARCHAR(255) NOT NULL,
+            login VARCHAR(255) UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            email TEXT NOT NULL
+        )''')
+
+        # Создаем таблицу категорий
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS Categories (
+            category_id {pk},
+            category_name VARCHAR(255) NOT NULL,
+            description TEXT
+        )''')
+
+        # Создаем таблицу событий
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS Events (
+            event_id {pk},
+            event_name VARCHAR(255) NOT NULL,
+            category INTEGER,
+            location VARCHAR(255),
+            event_date VARCHAR(10),
+            description TEXT,
+            note TEXT,
+            favorite BOOLEAN DEFAULT 0,
+            FOREIGN KEY (category) REFERENCES Categories(category_id) ON DELETE SET NULL
+        )''')
+
+        # Создаем таблицу избранного
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Favorites (
+            user_id INTEGER,
+            event_id INTEGER,
+            PRIMARY KEY (user_id, event_id),
+            FOREIGN KEY (user_id) REFERENCES Users(user_id) ON DELETE CASCADE,
+            FOREIGN KEY (event_id) REFERENCES Events(event_id) ON DELETE CASCADE
+        )''')
+
+        # Таблица применённых миграций схемы
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS SchemaVersion (
+            version INTEGER PRIMARY KEY,
+            applied_at VARCHAR(19) NOT NULL
+        )''')
+
+        apply_migrations(cursor)
+
+# Миграции схемы: (версия, список SQL-команд). Каждая применяется один раз
+# по возрастанию версии, номер записывается в таблицу SchemaVersion.
+# Команда, зависящая от диалекта, задается словарем {имя бэкенда: SQL}.
+MIGRATIONS = [
+    (1, [
+        # Индексы для фильтров отчетов и JOIN с избранным
+        'CREATE INDEX idx_events_date ON Events(event_date)',
+        'CREATE INDEX idx_events_category ON Events(category)',
+        'CREATE INDEX idx_favorites_event ON Favorites(event_id)',
+        'CREATE INDEX idx_categories_name ON Categories(category_name)',
+        'CREATE INDEX idx_users_name ON Users(user_name)',
+    ]),
+    (2, [
+        # Индекс для постраничного вывода событий по ключу (дата, название, id)
+        {
+            'sqlite': "CREATE INDEX idx_events_order ON Events(IFNULL(event_date, ''), event_name)",
+            'mysql': "CREATE INDEX idx_events_order ON Events((IFNULL(event_date, '')), event_name)",
+        },
+    ]),
+    (3, [
+        # Полнотекстовый поиск по событиям: в SQLite — таблица FTS5 над Events,
+        # которую синхронизируют триггеры, в MySQL — индекс FULLTEXT
+        {
+            'sqlite': '''
+            CREATE VIRTUAL TABLE EventsSearch USING fts5(
+                event_name, location, description, note,
+                content='Events', content_rowid='event_id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+            )''',
+            'mysql': 'CREATE FULLTEXT INDEX idx_events_search ON Events(event_name, location, description, note)',
+        },
+        {'sqlite': '''
+            CREATE TRIGGER events_search_insert AFTER INSERT ON Events BEGIN
+                INSERT INTO EventsSearch (rowid, event_name, location, description, note)
+                VALUES (new.event_id, new.event_name, new.location, new.description, new.note);
+            END'''},
+        {'sqlite': '''
+            CREATE TRIGGER events_search_delete AFTER DELETE ON Events BEGIN
+                INSERT INTO EventsSearch (EventsSearch, rowid, event_name, location, description, note)
+                VALUES ('delete', old.event_id, old.event_name, old.location, old.description, old.note);
+            END'''},
+        {'sqlite': '''
+            CREATE TRIGGER events_search_update AFTER UPDATE OF event_name, location, description, note ON Events
+            BEGIN
+                INSERT INTO EventsSearch (EventsSearch, rowid, event_name, location, description, note)
+                VALUES ('delete', old.event_id, old.event_name, old.location, old.description, old.note);
+                INSERT INTO EventsSearch (rowid, event_name, location, description, note)
+                VALUES (new.event_id, new.event_name, new.location, new.description, new.note);
+            END'''},
+        # индексируем уже существующие события
+        {'sqlite': "INSERT INTO EventsSearch (EventsSearch) VALUES ('rebuild')"},
+    ]),
+    (4, [
+        # Постраничный вывод событий одной категории
+        {
+            'sqlite': "CREATE INDEX idx_events_category_order ON Events(category, IFNULL(event_date, ''), event_name)",
+            'mysql': "CREATE INDEX idx_events_category_order ON Events(category, (IFNULL(event_date, '')), event_name)",
+        },
+    ]),
+    (5, [
+        # Сводки для отчетов, которые поддерживают триггеры: по событию — число
+        # добавлений в избранное и имена пользователей, по категории и дню — число
+        # событий (категория 0 — без категории, дата '' — без даты)
+        '''
+        CREATE TABLE EventStats (
+            event_id INTEGER PRIMARY KEY,
+            favorite_count INTEGER NOT NULL DEFAULT 0,
+            user_names TEXT,
+            FOREIGN KEY (event_id) REFERENCES Events(event_id) ON DELETE CASCADE
+        )''',
+        '''
+        CREATE TABLE CategoryDayStats (
+            category_id INTEGER NOT NULL,
+            event_date VARCHAR(10) NOT NULL,
+            event_count INTEGER NOT NULL,
+            PRIMARY KEY (category_id, event_date)
+        )''',
+        {
+            'sqlite': '''
+            CREATE TRIGGER event_stats_favorite_insert AFTER INSERT ON Favorites BEGIN
+                INSERT INTO EventStats (event_id, favorite_count, user_names)
+                VALUES (new.event_id, 1, (SELECT user_name FROM Users WHERE user_id = new.user_id))
+                ON CONFLICT (event_id) DO UPDATE SET
+                    favorite_count = favorite_count + 1,
+                    user_names = (SELECT GROUP_CONCAT(user_name, ', ') FROM (
+                        SELECT DISTINCT u.user_name FROM Favorites f JOIN Users u ON f.user_id = u.user_id
+                        WHERE f.event_id = new.event_id));
+            END''',
+            'mysql': '''
+            CREATE TRIGGER event_stats_favorite_insert AFTER INSERT ON Favorites FOR EACH ROW
+                INSERT INTO EventStats (event_id, favorite_count, user_names)
+                VALUES (NEW.event_id, 1, (SELECT user_name FROM Users WHERE user_id = NEW.user_id))
+                ON DUPLICATE KEY UPDATE
+                    favorite_count = favorite_count + 1,
+                    user_names = (SELECT GROUP_CONCAT(DISTINCT u.user_name SEPARATOR ', ')
+                        FROM Favorites f JOIN Users u ON f.user_id = u.user_id
+                        WHERE f.event_id = NEW.event_id)''',
+        },
+        {
+            'sqlite': '''
+            CREATE TRIGGER event_stats_favorite_delete AFTER DELETE ON Favorites BEGIN
+                UPDATE EventStats SET
+                    favorite_count = favorite_count - 1,
+                    user_names = (SELECT GROUP_CONCAT(user_name, ', ') FROM (
+                        SELECT DISTINCT u.user_name FROM Favorites f JOIN Users u ON f.user_id = u.user_id
+                        WHERE f.event_id = old.event_id))
+                WHERE event_id = old.event_id;
+                DELETE FROM EventStats WHERE event_id = old.event_id AND favorite_count <= 0;
+            END''',
+            'mysql': '''
+            CREATE TRIGGER event_stats_favorite_delete AFTER DELETE ON Favorites FOR EACH ROW BEGIN
+                UPDATE EventStats SET
+                    favorite_count = favorite_count - 1,
+                    user_names = (SELECT GROUP_CONCAT(DISTINCT u.user_name SEPARATOR ', ')
+                        FROM Favorites f JOIN Users u ON f.user_id = u.user_id
+                        WHERE f.event_id = OLD.event_id)
+                WHERE event_id = OLD.event_id;
+                DELETE FROM EventStats WHERE event_id = OLD.event_id AND favorite_count <= 0;
+            END''',
+        },
+        {
+            'sqlite': '''
+            CREATE TRIGGER category_day_stats_insert AFTER INSERT ON Events BEGIN
+                INSERT INTO CategoryDayStats (category_id, event_date, event_count)
+                VALUES (IFNULL(new.category, 0), IFNULL(new.event_date, ''), 1)
+                ON CONFLICT (category_id, event_date) DO UPDATE SET event_count = event_count + 1;
+            END''',
+            'mysql': '''
+            CREATE TRIGGER category_day_stats_insert AFTER INSERT ON Events FOR EACH ROW
+                INSERT INTO CategoryDayStats (category_id, event_date, event_count)
+                VALUES (IFNULL(NEW.category, 0), IFNULL(NEW.event_date, ''), 1)
+                ON DUPLICATE KEY UPDATE event_count = event_count + 1''',
+        },
+        {
+            'sqlite': '''
+            CREATE TRIGGER category_day_stats_delete AFTER DELETE ON Events BEGIN
+                UPDATE CategoryDayStats SET event_count = event_count - 1
+                WHERE category_id = IFNULL(old.category, 0) AND event_date = IFNULL(old.event_date, '');
+                DELETE FROM CategoryDayStats
+                WHERE category_id = IFNULL(old.category, 0) AND event_date = IFNULL(old.event_date, '')
+                    AND event_count <= 0;
+            END''',
+            'mysql': '''
+            CREATE TRIGGER category_day_stats_delete AFTER DELETE ON Events FOR EACH ROW BEGIN
+                UPDATE CategoryDayStats SET event_count = event_count - 1
+                WHERE category_id = IFNULL(OLD.category, 0) AND event_date = IFNULL(OLD.event_date, '');
+                DELETE FROM CategoryDayStats
+                WHERE category_id = IFNULL(OLD.category, 0) AND event_date = IFNULL(OLD.event_date, '')
+                    AND event_count <= 0;
+            END''',
+        },
+        {
+            # В SQLite срабатывает и при ON DELETE SET NULL после удаления категории
+            'sqlite': '''
+            CREATE TRIGGER category_day_stats_update AFTER UPDATE OF category, event_date ON Events
+            WHEN IFNULL(old.category, 0) != IFNULL(new.category, 0)
+                OR IFNULL(old.event_date, '') != IFNULL(new.event_date, '')
+            BEGIN
+                UPDATE CategoryDayStats SET event_count = event_count - 1
+                WHERE category_id = IFNULL(old.category, 0) AND event_date = IFNULL(old.event_date, '');
+                DELETE FROM CategoryDayStats
+                WHERE category_id = IFNULL(old.category, 0) AND event_date = IFNULL(old.event_date, '')
+                    AND event_count <= 0;
+                INSERT INTO CategoryDayStats (category_id, event_date, event_count)
+                VALUES (IFNULL(new.category, 0), IFNULL(new.event_date, ''), 1)
+                ON CONFLICT (category_id, event_date) DO UPDATE SET event_count = event_count + 1;
+            END''',
+            'mysql': '''
+            CREATE TRIGGER category_day_stats_update AFTER UPDATE ON Events FOR EACH ROW BEGIN
+                IF IFNULL(OLD.category, 0) != IFNULL(NEW.category, 0)
+                        OR IFNULL(OLD.event_date, '') != IFNULL(NEW.event_date, '') THEN
+                    UPDATE CategoryDayStats SET event_count = event_count - 1
+                    WHERE category_id = IFNULL(OLD.category, 0) AND event_date = IFNULL(OLD.event_date, '');
+                    DELETE FROM CategoryDayStats
+                    WHERE category_id = IFNULL(OLD.category, 0) AND event_date = IFNULL(OLD.event_date, '')
+                        AND event_count <= 0;
+                    INSERT INTO CategoryDayStats (category_id, event_date, event_count)
+                    VALUES (IFNULL(NEW.category, 0), IFNULL(NEW.event_date, ''), 1)
+                    ON DUPLICATE KEY UPDATE event_count = event_count + 1;
+                END IF;
+            END''',
+        },
+        {
+            # В MySQL каскадные действия внешних ключей не запускают триггеры,
+            # поэтому события удаленной категории переносятся в категорию 0 здесь
+            'mysql': '''
+            CREATE TRIGGER category_day_stats_category_delete AFTER DELETE ON Categories FOR EACH ROW BEGIN
+                INSERT INTO CategoryDayStats (category_id, event_date, event_count)
+                SELECT 0, s.event_date, s.event_count FROM CategoryDayStats s WHERE s.category_id = OLD.category_id
+                ON DUPLICATE KEY UPDATE event_count = CategoryDayStats.event_count + VALUES(event_count);
+                DELETE FROM CategoryDayStats WHERE category_id = OLD.category_id;
+            END''',
+        },
+        # заполняем сводки по уже существующим данным
+        {
+            'sqlite': '''
+            INSERT INTO EventStats (event_id, favorite_count, user_names)
+            SELECT f.event_id, COUNT(*), (SELECT GROUP_CONCAT(user_name, ', ') FROM (
+                SELECT DISTINCT u.user_name FROM Favorites f2 JOIN Users u ON f2.user_id = u.user_id
+                WHERE f2.event_id = f.event_id))
+            FROM Favorites f GROUP BY f.event_id''',
+            'mysql': '''
+            INSERT INTO EventStats (event_id, favorite_count, user_names)
+            SELECT f.event_id, COUNT(*), GROUP_CONCAT(DISTINCT u.user_name SEPARATOR ', ')
+            FROM Favorites f LEFT JOIN Users u ON f.user_id = u.user_id GROUP BY f.event_id''',
+        },
+        '''
+        INSERT INTO CategoryDayStats (category_id, event_date, event_count)
+        SELECT IFNULL(category, 0), IFNULL(event_date, ''), COUNT(*)
+        FROM Events GROUP BY IFNULL(category, 0), IFNULL(event_date, '')''',
+    ]),
+    (6, [
+        # Итоги за все время для статистики: избранное по пользователю и категории,
+        # события по месту и категории. За период их получают вычитанием событий
+        # вне периода, поэтому широкий период не требует просмотра всех событий
+        '''
+        CREATE TABLE UserCategoryStats (
+            user_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            favorite_count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, category_id)
+        )''',
+        '''
+        CREATE TABLE LocationStats (
+            location VARCHAR(255) NOT NULL,
+            category_id INTEGER NOT NULL,
+            event_count INTEGER NOT NULL,
+            PRIMARY KEY (location, category_id)
+        )''',
+        {
+            'sqlite': '''
+            CREATE TRIGGER user_category_stats_favorite_insert AFTER INSERT ON Favorites BEGIN
+                INSERT INTO UserCategoryStats (user_id, category_id, favorite_count)
+                SELECT new.user_id, IFNULL(category, 0), 1 FROM Events WHERE event_id = new.event_id
+                ON CONFLICT (user_id, category_id) DO UPDATE SET favorite_count = favorite_count + 1;
+            END''',
+            'mysql': '''
+            CREATE TRIGGER user_category_stats_favorite_insert AFTER INSERT ON Favorites FOR EACH ROW
+                INSERT INTO UserCategoryStats (user_id, category_id, favorite_count)
+                SELECT NEW.user_id, IFNULL(category, 0), 1 FROM Events WHERE event_id = NEW.event_id
+                ON DUPLICATE KEY UPDATE favorite_count = UserCategoryStats.favorite_count + 1''',
+        },
+        {
+            # Если удалено само событие, его избранное уже вычтено триггером на Events
+            'sqlite': '''
+            CREATE TRIGGER user_category_stats_favorite_delete AFTER DELETE ON Favorites BEGIN
+                UPDATE UserCategoryStats SET favorite_count = favorite_count - 1
+                WHERE user_id = old.user_id
+                    AND category_id = (SELECT IFNULL(category, 0) FROM Events WHERE event_id = old.event_id);
+            END''',
+            'mysql': '''
+            CREATE TRIGGER user_category_stats_favorite_delete AFTER DELETE ON Favorites FOR EACH ROW
+                UPDATE UserCategoryStats SET favorite_count = favorite_count - 1
+                WHERE user_id = OLD.user_id
+                    AND category_id = (SELECT IFNULL(category, 0) FROM Events WHERE event_id = OLD.event_id)''',
+        },
+        {
+            'sqlite': '''
+            CREATE TRIGGER user_category_stats_event_delete BEFORE DELETE ON Events BEGIN
+                UPDATE UserCategoryStats SET favorite_count = favorite_count - 1
+                WHERE category_id = IFNULL(old.category, 0)
+                    AND user_id IN (SELECT user_id FROM Favorites WHERE event_id = old.event_id);
+            END''',
+            'mysql': '''
+            CREATE TRIGGER user_category_stats_event_delete BEFORE DELETE ON Events FOR EACH ROW
+                UPDATE UserCategoryStats SET favorite_count = favorite_count - 1
+                WHERE category_id = IFNULL(OLD.category, 0)
+                    AND user_id IN (SELECT user_id FROM Favorites WHERE event_id = OLD.event_id)''',
+        },
+        {
+            'sqlite': '''
+            CREATE TRIGGER user_category_stats_event_update AFTER UPDATE OF category ON Events
+            WHEN IFNULL(old.category, 0) != IFNULL(new.category, 0)
+            BEGIN
+                UPDATE UserCategoryStats SET favorite_count = favorite_count - 1
+                WHERE category_id = IFNULL(old.category, 0)
+                    AND user_id IN (SELECT user_id FROM Favorites WHERE event_id = new.event_id);
+                INSERT INTO UserCategoryStats (user_id, category_id, favorite_count)
+                SELECT user_id, IFNULL(new.category, 0), 1 FROM Favorites WHERE event_id = new.event_id
+                ON CONFLICT (user_id, category_id) DO UPDATE SET favorite_count = favorite_count + 1;
+            END''',
+            'mysql': '''
+            CREATE TRIGGER user_category_stats_event_update AFTER UPDATE ON Events FOR EACH ROW BEGIN
+                IF IFNULL(OLD.category, 0) != IFNULL(NEW.category, 0) THEN
+                    UPDATE UserCategoryStats SET favorite_count = favorite_count - 1
+                    WHERE category_id = IFNULL(OLD.category, 0)
+                        AND user_id IN (SELECT user_id FROM Favorites WHERE event_id = NEW.event_id);
+                    INSERT INTO UserCategoryStats (user_id, category_id, favorite_count)
+                    SELECT user_id, IFNULL(NEW.category, 0), 1 FROM Favorites WHERE event_id = NEW.event_id
+                    ON DUPLICATE KEY UPDATE favorite_count = UserCategoryStats.favorite_count + 1;
+                END IF;
+            END''',
+        },
+        {
+            'sqlite': '''
+            CREATE TRIGGER location_stats_insert AFTER INSERT ON Events BEGIN
+                INSERT INTO LocationStats (location, category_id, event_count)
+                VALUES (IFNULL(new.location, ''), IFNULL(new.category, 0), 1)
+                ON CONFLICT (location, category_id) DO UPDATE SET event_count = event_count + 1;
+            END''',
+            'mysql': '''
+            CREATE TRIGGER location_stats_insert AFTER INSERT ON Events FOR EACH ROW
+                INSERT INTO LocationStats (location, category_id, event_count)
+                VALUES (IFNULL(NEW.location, ''), IFNULL(NEW.category, 0), 1)
+                ON DUPLICATE KEY UPDATE event_count = event_count + 1''',
+        },
+        {
+            'sqlite': '''
+            CREATE TRIGGER location_stats_delete AFTER DELETE ON Events BEGIN
+                UPDATE LocationStats SET event_count = event_count - 1
+                WHERE location = IFNULL(old.location, '') AND category_id = IFNULL(old.category, 0);
+            END''',
+            'mysql': '''
+            CREATE TRIGGER location_stats_delete AFTER DELETE ON Events FOR EACH ROW
+                UPDATE LocationStats SET event_count = event_count - 1
+                WHERE location = IFNULL(OLD.location, '') AND category_id = IFNULL(OLD.category, 0)''',
+        },
+        {
+            'sqlite': '''
+            CREATE TRIGGER location_stats_update AFTER UPDATE OF location, category ON Events
+            WHEN IFNULL(old.location, '') != IFNULL(new.location, '')
+                OR IFNULL(old.category, 0) != IFNULL(new.category, 0)
+            BEGIN
+                UPDATE LocationStats SET event_count = event_count - 1
+                WHERE location = IFNULL(old.location, '') AND category_id = IFNULL(old.category, 0);
+                INSERT INTO LocationStats (location, category_id, event_count)
+                VALUES (IFNULL(new.location, ''), IFNULL(new.category, 0), 1)
+                ON CONFLICT (location, category_id) DO UPDATE SET event_count = event_count + 1;
+            END''',
+            'mysql': '''
+            CREATE TRIGGER location_stats_update AFTER UPDATE ON Events FOR EACH ROW BEGIN
+                IF IFNULL(OLD.location, '') != IFNULL(NEW.location, '')
+                        OR IFNULL(OLD.category, 0) != IFNULL(NEW.category, 0) THEN
+                    UPDATE LocationStats SET event_count = event_count - 1
+                    WHERE location = IFNULL(OLD.location, '') AND category_id = IFNULL(OLD.category, 0);
+                    INSERT INTO LocationStats (location, category_id, event_count)
+                    VALUES (IFNULL(NEW.location, ''), IFNULL(NEW.category, 0), 1)
+                    ON DUPLICATE KEY UPDATE event_count = event_count + 1;
+                END IF;
+            END''',
+        },
+        {
+            # Каскадное обнуление категории в MySQL не запускает триггеры на Events
+            'mysql': '''
+            CREATE TRIGGER category_stats_category_delete AFTER DELETE ON Categories FOR EACH ROW BEGIN
+                INSERT INTO UserCategoryStats (user_id, category_id, favorite_count)
+                SELECT s.user_id, 0, s.favorite_count FROM UserCategoryStats s WHERE s.category_id = OLD.category_id
+                ON DUPLICATE KEY UPDATE favorite_count = UserCategoryStats.favorite_count + VALUES(favorite_count);
+                DELETE FROM UserCategoryStats WHERE category_id = OLD.category_id;
+                INSERT INTO LocationStats (location, category_id, event_count)
+                SELECT s.location, 0, s.event_count FROM LocationStats s WHERE s.category_id = OLD.category_id
+                ON DUPLICATE KEY UPDATE event_count = LocationStats.event_count + VALUES(event_count);
+                DELETE FROM LocationStats WHERE category_id = OLD.category_id;
+            END''',
+        },
+        '''
+        INSERT INTO UserCategoryStats (user_id, category_id, favorite_count)
+        SELECT f.user_id, IFNULL(e.category, 0), COUNT(*)
+        FROM Favorites f JOIN Events e ON f.event_id = e.event_id
+        GROUP BY f.user_id, IFNULL(e.category, 0)''',
+        '''
+        INSERT INTO LocationStats (location, category_id, event_count)
+        SELECT IFNULL(location, ''), IFNULL(category, 0), COUNT(*)
+        FROM Events GROUP BY IFNULL(location, ''), IFNULL(category, 0)''',
+        # индекс по дате, покрывающий место: события вне периода считаются по индексу
+        {
+            'sqlite': 'DROP INDEX idx_events_date',
+            'mysql': 'DROP INDEX idx_events_date ON Events',
+        },
+        'CREATE INDEX idx_events_date_location ON Events(event_date, location)',
+    ]),
+    (7, [
+        # Избранное хранится только в Favorites: вместо общего флага Events.favorite
+        # у события есть число пользователей, добавивших его в избранное, которое
+        # поддерживают триггеры. Принадлежность избранного пользователю проверяется
+        # по первичному ключу Favorites (user_id, event_id), событие — по idx_favorites_event
+        'ALTER TABLE Events ADD COLUMN favorite_count INTEGER NOT NULL DEFAULT 0',
+        {
+            'sqlite': '''
+            CREATE TRIGGER events_favorite_count_insert AFTER INSERT ON Favorites BEGIN
+                UPDATE Events SET favorite_count = favorite_count + 1 WHERE event_id = new.event_id;
+            END''',
+            'mysql': '''
+            CREATE TRIGGER events_favorite_count_insert AFTER INSERT ON Favorites FOR EACH ROW
+                UPDATE Events SET favorite_count = favorite_count + 1 WHERE event_id = NEW.event_id''',
+        },
+        {
+            # При удалении события его строки Favorites удаляются каскадно, а обновлять уже нечего
+            'sqlite': '''
+            CREATE TRIGGER events_favorite_count_delete AFTER DELETE ON Favorites BEGIN
+                UPDATE Events SET favorite_count = favorite_count - 1 WHERE event_id = old.event_id;
+            END''',
+            'mysql': '''
+            CREATE TRIGGER events_favorite_count_delete AFTER DELETE ON Favorites FOR EACH ROW
+                UPDATE Events SET favorite_count = favorite_count - 1 WHERE event_id = OLD.event_id''',
+        },
+        '''
+        UPDATE Events SET favorite_count = (SELECT COUNT(*) FROM Favorites f WHERE f.event_id = Events.event_id)
+        WHERE event_id IN (SELECT event_id FROM Favorites)''',
+        # Флаг без пользователя перенести в Favorites некуда. Столбцы Events.favorite
+        # и EventStats.favorite_count остаются в таблицах, но не читаются и не
+        # обновляются: DROP COLUMN в SQLite есть только с версии 3.35, а пересборка
+        # таблиц ради неиспользуемых столбцов не нужна
+        # Счетчик один — Events.favorite_count, в EventStats поддерживаются только
+        # имена пользователей; строка сводки удаляется, когда у события не осталось
+        # строк Favorites
+        'DROP TRIGGER event_stats_favorite_insert',
+        'DROP TRIGGER event_stats_favorite_delete',
+        'UPDATE EventStats SET favorite_count = 0',
+        {
+            'sqlite': '''
+            CREATE TRIGGER event_stats_favorite_insert AFTER INSERT ON Favorites BEGIN
+                INSERT INTO EventStats (event_id, user_names)
+                VALUES (new.event_id, (SELECT user_name FROM Users WHERE user_id = new.user_id))
+                ON CONFLICT (event_id) DO UPDATE SET
+                    user_names = (SELECT GROUP_CONCAT(user_name, ', ') FROM (
+                        SELECT DISTINCT u.user_name FROM Favorites f JOIN Users u ON f.user_id = u.user_id
+                        WHERE f.event_id = new.event_id));
+            END''',
+            'mysql': '''
+            CREATE TRIGGER event_stats_favorite_insert AFTER INSERT ON Favorites FOR EACH ROW
+                INSERT INTO EventStats (event_id, user_names)
+                VALUES (NEW.event_id, (SELECT user_name FROM Users WHERE user_id = NEW.user_id))
+                ON DUPLICATE KEY UPDATE
+                    user_names = (SELECT GROUP_CONCAT(DISTINCT u.user_name SEPARATOR ', ')
+                        FROM Favorites f JOIN Users u ON f.user_id = u.user_id
+                        WHERE f.event_id = NEW.event_id)''',
+        },
+        {
+            'sqlite': '''
+            CREATE TRIGGER event_stats_favorite_delete AFTER DELETE ON Favorites BEGIN
+                UPDATE EventStats SET
+                    user_names = (SELECT GROUP_CONCAT(user_name, ', ') FROM (
+                        SELECT DISTINCT u.user_name FROM Favorites f JOIN Users u ON f.user_id = u.user_id
+                        WHERE f.event_id = old.event_id))
+                WHERE event_id = old.event_id;
+                DELETE FROM EventStats WHERE event_id = old.event_id
+                    AND NOT EXISTS (SELECT 1 FROM Favorites WHERE event_id = old.event_id);
+            END''',
+            'mysql': '''
+            CREATE TRIGGER event_stats_favorite_delete AFTER DELETE ON Favorites FOR EACH ROW BEGIN
+                UPDATE EventStats SET
+                    user_names = (SELECT GROUP_CONCAT(DISTINCT u.user_name SEPARATOR ', ')
+                        FROM Favorites f JOIN Users u ON f.user_id = u.user_id
+                        WHERE f.event_id = OLD.event_id)
+                WHERE event_id = OLD.event_id;
+                DELETE FROM EventStats WHERE event_id = OLD.event_id
+                    AND NOT EXISTS (SELECT 1 FROM Favorites WHERE event_id = OLD.event_id);
+            END''',
+        },
+    ]),
+]
+
+def get_schema_version(cursor):
+    """Текущая версия схемы (0 — миграции ещё не применялись)"""
+    cursor.execute('SELECT MAX(version) FROM SchemaVersion')
+    return cursor.fetchone()[0] or 0
+
+def apply_migrations(cursor):
+    """Применяет ещё не выполненные миграции и возвращает итоговую версию схемы"""
+    backend = get_backend()
+    version = get_schema_version(cursor)
+    for target, statements in MIGRATIONS:
+        if target <= version:
+            continue
+        # В SQLite миграция применяется целиком или не применяется вовсе;
+        # MySQL фиксирует DDL сразу, поэтому там точка сохранения не нужна
+        atomic = backend.transactional_ddl
+        if atomic:
+            cursor.execute('SAVEPOINT migration')
+        try:
+            for sql in statements:
+                if isinstance(sql, dict):
+                    # SQL для конкретного бэкенда; если для него ничего нет, шаг пропускается
+                    sql = sql.get(backend.name)
+                    if sql is None:
+                        continue
+                cursor.execute(sql)
+            cursor.execute(
+                'INSERT INTO SchemaVersion (version, applied_at) VALUES (?, ?)',
+                (target, datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        except Exception:
+            if atomic:
+                cursor.execute('ROLLBACK TO migration')
+                cursor.execute('RELEASE migration')
+            raise
+        if atomic:
+            cursor.execute('RELEASE migration')
+        version = target
+    return version
+
+def analyze():
+    """Обновляет статистику планировщика по таблицам и индексам"""
+    with transaction() as cursor:
+        cursor.execute(get_backend().analyze_sql())
+
+def explain_query_plan(sql, params=()):
+    """Возвращает план выполнения запроса (для проверки использования индексов)"""
+    with db_cursor() as cursor:
+        cursor.execute(get_backend().explain_prefix + sql, params)
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+# passwords (hashlib, пул потоков хеширования) импортируется при первом входе или
+# регистрации, а не при запуске приложения
 
 def hash_password(password):
-    """Хеширование пароля"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Хеширование пароля с солью по настройкам db_config (см. passwords)"""
+    import passwords
+    return passwords.hash_password(password)
 
-def register_user(name, login, password, email):
-    """Регистрация нового пользователя"""
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Проверка существования логина
-        cursor.execute('SELECT * FROM Users WHERE login = ?', (login,))
-        if cursor.fetchone():
-            return False, "Пользователь с таким логином уже существует"
-        
-        # Хеширование пароля
+def register_user(name, login, password, email, hashed_password=None):
+    """Регистрация нового пользователя. При успехе возвращает (True, (user_id, user_name)).
+
+    Повторный логин отсекает ограничение UNIQUE на Users.login: один INSERT без
+    предварительного SELECT, поэтому из двух одновременных регистраций с одним
+    логином успешна ровно одна. hashed_password — хеш из hash_password, уже
+    посчитанный вне потока записи; без него хеш считается здесь.
+    """
+    import passwords
+
+    if hashed_password is None:
+        # хеш считается до транзакции, чтобы не держать блокировку записи
         hashed_password = hash_password(password)
-        
-        # Добавление пользователя
-        cursor.execute('''
-        INSERT INTO Users (user_name, login, password, email) 
-        VALUES (?, ?, ?, ?)
-        ''', (name, login, hashed_password, email))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return True, None
+    backend = get_backend()
+    try:
+        with transaction() as cursor:
+            cursor.execute('''
+            INSERT INTO Users (user_name, login, password, email)
+            VALUES (?, ?, ?, ?)
+            ''', (name, login, hashed_password, email))
+            user_id = backend.last_insert_id(cursor)
+    except backend.integrity_error:
+        return False, "Пользователь с таким логином уже существует"
+    except Exception as e:
+        return False, str(e)
+    passwords.remember_verified(password, hashed_password)
+    _publish('insert', 'Users', user_id, (user_id, name))
+    return True, (user_id, name)
+
+# Результат проверки входа: user — (user_id, user_name) или None; rehash — аргументы
+# update_password_hash, если хеш записан старой схемой или с прежними параметрами
+LoginCheck = namedtuple('LoginCheck', 'user rehash')
+
+def check_login(login, password):
+    """Проверка логина и пароля без записи в базу; возвращает LoginCheck.
+
+    Хеш сравнивается в Python за постоянное время. Новый хеш для устаревшего
+    считается здесь же, поэтому записать его (update_password_hash) можно
+    отдельной короткой задачей записи.
+    """
+    import passwords
+
+    with db_cursor() as cursor:
+        cursor.execute('SELECT user_id, user_name, password FROM Users WHERE login = ?', (login,))
+        row = cursor.fetchone()
+    if row is None:
+        return LoginCheck(passwords.verify_unknown_user(password) or None, None)
+    user_id, user_name, stored = row
+    if not passwords.verify_password(password, stored):
+        return LoginCheck(None, None)
+    rehash = None
+    if passwords.needs_rehash(stored):
+        rehash = (user_id, stored, passwords.hash_password(password), password)
+    return LoginCheck((user_id, user_name), rehash)
+
+def update_password_hash(user_id, old_hash, new_hash, password):
+    """Записывает пересчитанный хеш пароля; возвращает (ok, err)"""
+    import passwords
+
+    try:
+        # условие на прежний хеш: параллельный вход не перезапишет уже обновленный
+        with transaction() as cursor:
+            cursor.execute('UPDATE Users SET password = ? WHERE user_id = ? AND password = ?',
+                           (new_hash, user_id, old_hash))
     except Exception as e:
         return False, str(e)
+    passwords.remember_verified(password, new_hash)
+    return True, None
 
 def authenticate_user(login, password):
-    """Аутентификация пользователя"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Хеширование введенного пароля
-    hashed_password = hash_password(password)
-    
-    # Проверка логина и пароля
-    cursor.execute('''
-    SELECT user_id, user_name FROM Users 
-    WHERE login = ? AND password = ?
-    ''', (login, hashed_password))
-    
-    user = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    
-    return user
+    """Аутентификация пользователя: (user_id, user_name) или None.
+
+    После успешного входа хеш, записанный старой схемой или с прежними
+    параметрами, пересчитывается (check_login и update_password_hash за один вызов).
+    """
+    check = check_login(login, password)
+    if check.rehash:
+        update_password_hash(*check.rehash)
+    return check.user
+
+# Кэш категорий в памяти процесса: категории меняются редко, а читаются при каждой
+# смене экрана. Любое изменение категорий увеличивает поколение и сбрасывает кэш;
+# строки, прочитанные из базы при устаревшем поколении, в кэш не попадают
+CacheStats = namedtuple('CacheStats', 'hits misses generation')
+
+_category_cache = {'generation': 0, 'rows': None, 'map': None, 'hits': 0, 'misses': 0}
+_category_lock = threading.Lock()
+
+def invalidate_categories():
+    """Сбрасывает кэш категорий (после изменения таблицы Categories)"""
+    with _category_lock:
+        _category_cache['generation'] += 1
+        _category_cache['rows'] = None
+        _category_cache['map'] = None
+
+def category_cache_stats():
+    """Число попаданий и промахов кэша категорий и текущее поколение"""
+    with _category_lock:
+        return CacheStats(_category_cache['hits'], _category_cache['misses'], _category_cache['generation'])
+
+def _cached_categories():
+    """Строки категорий из кэша или из базы; возвращает кортеж строк"""
+    with _category_lock:
+        rows = _category_cache['rows']
+        if rows is not None:
+            _category_cache['hits'] += 1
+            return rows
+        _category_cache['misses'] += 1
+        generation = _category_cache['generation']
+    with db_cursor() as cursor:
+        cursor.execute('SELECT category_id, category_name, description FROM Categories')
+        rows = tuple(cursor.fetchall())
+    with _category_lock:
+        if _category_cache['generation'] == generation:
+            _category_cache['rows'] = rows
+    return rows
 
 def get_categories():
-    """Получение списка категорий"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT category_id, category_name, description FROM Categories')
-    categories = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
-    
-    return categories
+    """Получение списка категорий (из кэша, если категории не менялись)"""
+    return list(_cached_categories())
+
+def get_category_map():
+    """Словарь название категории -> category_id (из кэша)"""
+    rows = _cached_categories()
+    with _category_lock:
+        category_map = _category_cache['map']
+        if category_map is None or _category_cache['rows'] is not rows:
+            category_map = {name: category_id for category_id, name, _ in rows}
+            if _category_cache['rows'] is rows:
+                _category_cache['map'] = category_map
+    return dict(category_map)
 
 def add_category(name, description=''):
-    """Добавление новой категории"""
+    """Добавление новой категории. При успехе возвращает (True, category_id)"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        INSERT INTO Categories (category_name, description) 
-        VALUES (?, ?)
-        ''', (name, description))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return True, None
+        with transaction() as cursor:
+            cursor.execute('''
+            INSERT INTO Categories (category_name, description)
+            VALUES (?, ?)
+            ''', (name, description))
+            category_id = get_backend().last_insert_id(cursor)
+        _publish('insert', 'Categories', category_id, (category_id, name, description))
+        return True, category_id
     except Exception as e:
         return False, str(e)
 
 def update_category(category_id, name, description=''):
     """Обновление категории"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        UPDATE Categories 
-        SET category_name = ?, description = ? 
-        WHERE category_id = ?
-        ''', (name, description, category_id))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with transaction() as cursor:
+            cursor.execute('''
+            UPDATE Categories
+            SET category_name = ?, description = ?
+            WHERE category_id = ?
+            ''', (name, description, category_id))
+        _publish('update', 'Categories', category_id, (category_id, name, description))
         return True, None
     except Exception as e:
         return False, str(e)
@@ -165,160 +858,803 @@ def update_category(category_id, name, description=''):
 def delete_category(category_id):
     """Удаление категории"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM Categories WHERE category_id = ?', (category_id,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with transaction() as cursor:
+            cursor.execute('DELETE FROM Categories WHERE category_id = ?', (category_id,))
+        _publish('delete', 'Categories', category_id)
         return True, None
     except Exception as e:
         return False, str(e)
 
-def get_events():
-    """Получение списка событий с названием категории"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT 
-        e.event_id, 
-        e.event_name, 
-        c.category_name, 
-        e.location, 
-        e.event_date, 
-        e.description, 
-        e.favorite 
+_EVENTS_SQL = '''
+    SELECT
+        e.event_id,
+        e.event_name,
+        c.category_name,
+        e.location,
+        e.event_date,
+        e.description,
+        e.favorite_count
     FROM Events e
     LEFT JOIN Categories c ON e.category = c.category_id
-    ''')
-    events = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
-    
-    return events
-
-def add_event(name, category_id, date, location, description='', note='', favorite=False):
-    """Добавление нового события"""
+'''
+
+# Порядок постраничного вывода событий: (дата, название, id), события без даты первыми
+_EVENTS_ORDER = "IFNULL(e.event_date, ''), e.event_name, e.event_id"
+_EVENTS_ORDER_DESC = "IFNULL(e.event_date, '') DESC, e.event_name DESC, e.event_id DESC"
+
+# Варианты сортировки для get_events
+EVENT_SORTS = {
+    'date': _EVENTS_ORDER,
+    'date_desc': _EVENTS_ORDER_DESC,
+    'name': 'e.event_name, e.event_id',
+    'name_desc': 'e.event_name DESC, e.event_id DESC',
+}
+
+# Критерии отбора событий. Поля комбинируются через И, None — без ограничения:
+# category_id — категория, date_from/date_to — диапазон дат (включительно),
+# favorite — True: события в избранном хотя бы у одного пользователя, False — ни у кого,
+# user_id — только избранное пользователя,
+# text — полнотекстовый поиск. Уточненный фильтр получается через _replace
+EventFilter = namedtuple('EventFilter', 'category_id date_from date_to favorite user_id text',
+                         defaults=(None, None, None, None, None, None))
+
+def _event_conditions(criteria):
+    """Условия WHERE (для псевдонима e таблицы Events) и их параметры по критериям отбора"""
+    conditions, params = [], []
+    if criteria is None:
+        return conditions, params
+    if criteria.category_id is not None:
+        conditions.append('e.category = ?')
+        params.append(criteria.category_id)
+    if criteria.date_from:
+        conditions.append('e.event_date >= ?')
+        params.append(str(criteria.date_from))
+    if criteria.date_to:
+        conditions.append('e.event_date <= ?')
+        params.append(str(criteria.date_to))
+    if criteria.favorite is not None:
+        conditions.append('e.favorite_count > 0' if criteria.favorite else 'e.favorite_count = 0')
+    if criteria.user_id is not None:
+        conditions.append('e.event_id IN (SELECT event_id FROM Favorites WHERE user_id = ?)')
+        params.append(criteria.user_id)
+    query = _search_query(criteria.text) if criteria.text else None
+    if query is not None:
+        search_sql, search_params = get_backend().search_events_sql(query, ranked=False)
+        conditions.append(f'e.event_id IN (SELECT event_id FROM ({search_sql}) s)')
+        params += search_params
+    return conditions, params
+
+def _where(conditions):
+    return ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+
+def get_events(criteria=None, sort=None, limit=None):
+    """Получение списка событий с названием категории.
+
+    criteria — EventFilter, sort — ключ EVENT_SORTS, limit — наибольшее число строк.
+    """
+    conditions, params = _event_conditions(criteria)
+    sql = _EVENTS_SQL + _where(conditions)
+    if sort is not None:
+        sql += ' ORDER BY ' + EVENT_SORTS[sort]
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    with db_cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+def _select_event(cursor, event_id):
+    cursor.execute(_EVENTS_SQL + ' WHERE e.event_id = ?', (event_id,))
+    return cursor.fetchone()
+
+def get_event(event_id):
+    """Получение одного события в том же виде, что и строки get_events"""
+    with db_cursor() as cursor:
+        return _select_event(cursor, event_id)
+
+def event_page_key(row):
+    """Ключ строки событий (дата, название, id) для get_events_page"""
+    return (row[4] or '', row[1], row[0])
+
+def search_page_key(row):
+    """Ключ строки результатов поиска (ранг, id) для search_events"""
+    return (row[7], row[0])
+
+# Результаты поиска ранжируются, только если совпадений не больше стольких: подсчет
+# bm25 по сотням тысяч строк занимает секунды. Иначе находятся все совпадения, но
+# идут они в порядке id (интерфейс сообщает об этом по count_search_events)
+SEARCH_LIMIT = 10000
+
+def _search_query(text):
+    """Запрос полнотекстового поиска по словам из text (None, если слов нет)"""
+    words = re.findall(r'\w+', text.lower())
+    return get_backend().fulltext_query(words) if words else None
+
+# Запрос -> ранжировать ли его результаты; запоминается при подсчете совпадений,
+# чтобы страницы при прокрутке не пересчитывали совпадения заново. Очищается из
+# потока записи (_publish) и из потоков чтения, поэтому изменяется под блокировкой
+_ranked_searches = {}
+_ranked_lock = threading.Lock()
+
+def _search_from(query, ranked, criteria):
+    """FROM/WHERE результатов поиска: подзапрос s по индексу, события e и их условия отбора"""
+    search_sql, params = get_backend().search_events_sql(query, ranked)
+    conditions, filter_params = _event_conditions(criteria)
+    sql = f'''
+        FROM ({search_sql}) s
+        JOIN Events e ON e.event_id = s.event_id
+        LEFT JOIN Categories c ON e.category = c.category_id
+    '''
+    return sql, conditions, params + filter_params
+
+def _count_matches(cursor, query, criteria, exact=False):
+    """Число совпадений запроса; без exact — не больше SEARCH_LIMIT + 1"""
+    from_sql, conditions, params = _search_from(query, False, criteria)
+    if exact:
+        cursor.execute(f'SELECT COUNT(*) {from_sql}{_where(conditions)}', params)
+    else:
+        cursor.execute(f'SELECT COUNT(*) FROM (SELECT 1 {from_sql}{_where(conditions)} LIMIT ?) m',
+                       params + [SEARCH_LIMIT + 1])
+    count = cursor.fetchone()[0]
+    with _ranked_lock:
+        if len(_ranked_searches) > 256:
+            _ranked_searches.clear()
+        _ranked_searches[query, criteria] = count <= SEARCH_LIMIT
+    return count
+
+def search_events(text, after=None, before=None, offset=None, limit=100, criteria=None):
+    """Страница результатов полнотекстового поиска по названию, месту, описанию и примечанию.
+
+    Слова из text ищутся целиком, последнее — как префикс. Лучшие совпадения идут
+    первыми; если совпадений больше SEARCH_LIMIT, результаты идут в порядке id.
+    Строки такие же, как у get_events, с рангом совпадения последним столбцом;
+    after, before и offset работают как в get_events_page с ключами search_page_key,
+    criteria — дополнительный EventFilter.
+    """
+    query = _search_query(text)
+    if query is None:
+        return []
+    with db_cursor() as cursor:
+        # запись читается один раз: другой поток может очистить словарь в любой момент
+        ranked = _ranked_searches.get((query, criteria))
+        if ranked is None:
+            ranked = _count_matches(cursor, query, criteria) <= SEARCH_LIMIT
+        from_sql, conditions, params = _search_from(query, ranked, criteria)
+        # без ранжирования ранг у всех строк нулевой и ключом служит только id
+        key = '(s.search_rank, s.event_id)' if ranked else 's.event_id'
+        order = 's.search_rank, s.event_id' if ranked else 's.event_id'
+        if after is not None:
+            conditions.append(f'{key} > {"(?, ?)" if ranked else "?"}')
+            params += list(after) if ranked else [after[1]]
+        elif before is not None:
+            conditions.append(f'{key} < {"(?, ?)" if ranked else "?"}')
+            params += list(before) if ranked else [before[1]]
+            order = 's.search_rank DESC, s.event_id DESC' if ranked else 's.event_id DESC'
+        sql = f'''
+            SELECT e.event_id, e.event_name, c.category_name, e.location, e.event_date,
+                   e.description, e.favorite_count, s.search_rank
+            {from_sql}{_where(conditions)} ORDER BY {order} LIMIT ?
+        '''
+        params.append(limit)
+        if offset is not None and after is None and before is None:
+            sql += ' OFFSET ?'
+            params.append(offset)
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if before is not None:
+        rows.reverse()
+    return rows
+
+def count_search_events(text, criteria=None):
+    """Число событий, найденных полнотекстовым поиском.
+
+    Если оно больше SEARCH_LIMIT, search_events выдает их без ранжирования.
+    """
+    query = _search_query(text)
+    if query is None:
+        return 0
+    with db_cursor() as cursor:
+        return _count_matches(cursor, query, criteria, exact=True)
+
+def get_events_page(after=None, before=None, offset=None, limit=100, criteria=None):
+    """Страница событий в порядке (дата, название, id) по ключу соседней строки.
+
+    after — ключ последней уже показанной строки (листание вперед),
+    before — ключ первой показанной строки (листание назад, строки все равно
+    возвращаются по возрастанию), offset — переход к произвольной позиции,
+    например при перетаскивании ползунка прокрутки.
+    Ключ сравнивается как кортеж, а первая колонка дублируется отдельным
+    условием, чтобы поиск шел по индексу idx_events_order (с фильтром по
+    категории — по idx_events_category_order).
+    criteria — EventFilter, страницы строятся только по подходящим событиям.
+    """
+    conditions, params = _event_conditions(criteria)
+    if offset is not None and after is None and before is None:
+        # Сначала находим ключ строки на позиции offset по индексу (без JOIN),
+        # затем читаем страницу начиная с него
+        with db_cursor() as cursor:
+            cursor.execute(f'''
+            SELECT {_EVENTS_ORDER} FROM Events e{_where(conditions)}
+            ORDER BY {_EVENTS_ORDER} LIMIT 1 OFFSET ?
+            ''', [*params, offset])
+            start = cursor.fetchone()
+        if start is None:
+            return []
+        return _fetch_events_page(conditions + [f"IFNULL(e.event_date, '') >= ? AND ({_EVENTS_ORDER}) >= (?, ?, ?)"],
+                                  [*params, start[0], *start], _EVENTS_ORDER, limit)
+    if before is not None:
+        rows = _fetch_events_page(conditions + [f"IFNULL(e.event_date, '') <= ? AND ({_EVENTS_ORDER}) < (?, ?, ?)"],
+                                  [*params, before[0], *before], _EVENTS_ORDER_DESC, limit)
+        rows.reverse()
+        return rows
+    if after is not None:
+        return _fetch_events_page(conditions + [f"IFNULL(e.event_date, '') >= ? AND ({_EVENTS_ORDER}) > (?, ?, ?)"],
+                                  [*params, after[0], *after], _EVENTS_ORDER, limit)
+    return _fetch_events_page(conditions, params, _EVENTS_ORDER, limit)
+
+def _fetch_events_page(conditions, params, order, limit):
+    sql = _EVENTS_SQL + _where(conditions) + f' ORDER BY {order} LIMIT ?'
+    with db_cursor() as cursor:
+        cursor.execute(sql, [*params, limit])
+        return cursor.fetchall()
+
+def validate_event(name, category, date, location):
+    """Проверка полей события по правилам формы. Возвращает текст ошибки или None"""
+    # базовая валидация на пустые поля
+    if not (name and category and date):
+        return 'Название, категория и дата обязательны!'
+
+    # валидация названия (не менее 3 символов)
+    if len(name) < 3:
+        return 'Название мероприятия должно содержать минимум 3 символа'
+
+    # валидация места проведения (не пустое и минимум 3 символа)
+    if not location or len(location) < 3:
+        return 'Укажите место проведения (минимум 3 символа)'
+
+    # валидация даты (формат ГГГГ-ММ-ДД)
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        INSERT INTO Events 
-        (event_name, category, event_date, location, description, note, favorite) 
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (name, category_id, date, location, description, note, favorite))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return True, None
+        datetime.datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        return 'Неверный формат даты. Используйте формат ГГГГ-ММ-ДД (например, 2023-05-15)'
+    return None
+
+_INSERT_EVENT_SQL = '''
+    INSERT INTO Events
+    (event_name, category, event_date, location, description, note)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+def _insert_event(cursor, name, category_id, date, location, description, note):
+    """Вставляет событие на переданном курсоре и возвращает его id"""
+    cursor.execute(_INSERT_EVENT_SQL, (name, category_id, date, location, description, note))
+    return get_backend().last_insert_id(cursor)
+
+def add_event(name, category_id, date, location, description='', note=''):
+    """Добавление нового события. При успехе возвращает (True, event_id)"""
+    try:
+        with transaction() as cursor:
+            event_id = _insert_event(cursor, name, category_id, date, location, description, note)
+            row = _select_event(cursor, event_id)
+        _publish('insert', 'Events', event_id, row)
+        return True, event_id
     except Exception as e:
         return False, str(e)
 
-def update_event(event_id, name, category_id, date, location, description='', note='', favorite=False):
-    """Обновление события"""
+def add_favorite_event(user_id, name, category_id, date, location, description='', note=''):
+    """Создание события и добавление его в избранное пользователя одной транзакцией.
+    При успехе возвращает (True, event_id)"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        UPDATE Events 
-        SET event_name = ?, category = ?, event_date = ?, 
-            location = ?, description = ?, note = ?, favorite = ? 
-        WHERE event_id = ?
-        ''', (name, category_id, date, location, description, note, favorite, event_id))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return True, None
+        with transaction() as cursor:
+            event_id = _insert_event(cursor, name, category_id, date, location, description, note)
+            cursor.execute('''
+            INSERT INTO Favorites (user_id, event_id)
+            VALUES (?, ?)
+            ''', (user_id, event_id))
+            # строка читается после вставки в избранное: favorite_count уже учтен
+            row = _select_event(cursor, event_id)
+        _publish('insert', 'Events', event_id, row)
+        _publish('insert', 'Favorites', (user_id, event_id), row)
+        return True, event_id
+    except Exception as e:
+        return False, str(e)
+
+# Итог массового импорта: число вставленных строк, ошибки [(номер строки, текст)],
+# затраченное время в секундах и скорость в строках в секунду
+ImportResult = namedtuple('ImportResult', 'inserted errors elapsed rows_per_sec')
+
+def bulk_add_events(rows, chunk_size=1000, progress=None):
+    """Массовое добавление событий.
+
+    rows — итерируемое словарей с ключами name, category (название категории),
+    date, location и необязательными description, note; строки читаются
+    потоково. Каждая строка проверяется по правилам validate_event, категории
+    сопоставляются с id по одной выборке, вставка идет через executemany
+    блоками по chunk_size строк, каждый блок в своей транзакции. progress(inserted)
+    вызывается после каждого блока.
+    """
+    start = time.perf_counter()
+    categories = get_category_map()
+    errors = []
+    inserted = 0
+    chunk = []
+
+    def flush():
+        nonlocal inserted
+        try:
+            with transaction() as cursor:
+                cursor.executemany(_INSERT_EVENT_SQL, [values for _, values in chunk])
+            inserted += len(chunk)
+        except Exception:
+            # Блок целиком откатан: вставляем построчно, чтобы найти ошибочные строки
+            for line, values in chunk:
+                try:
+                    with transaction() as cursor:
+                        cursor.execute(_INSERT_EVENT_SQL, values)
+                    inserted += 1
+                except Exception as e:
+                    errors.append((line, str(e)))
+        chunk.clear()
+        if progress:
+            progress(inserted)
+
+    for line, row in enumerate(rows, start=1):
+        name = str(row.get('name') or '').strip()
+        category = str(row.get('category') or '').strip()
+        date = str(row.get('date') or '').strip()
+        location = str(row.get('location') or '').strip()
+        err = validate_event(name, category, date, location)
+        if err is None and category not in categories:
+            err = f'Неизвестная категория: {category}'
+        if err:
+            errors.append((line, err))
+            continue
+        chunk.append((line, (name, categories[category], date, location,
+                             str(row.get('description') or '').strip(),
+                             str(row.get('note') or '').strip())))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    if inserted:
+        _publish('reload', 'Events')
+    elapsed = time.perf_counter() - start
+    return ImportResult(inserted, errors, elapsed, inserted / elapsed if elapsed else 0.0)
+
+def update_event(event_id, name, category_id, date, location, description='', note=''):
+    """Обновление события. При успехе возвращает (True, обновленная строка)"""
+    try:
+        with transaction() as cursor:
+            old = _select_event(cursor, event_id)
+            cursor.execute('''
+            UPDATE Events
+            SET event_name = ?, category = ?, event_date = ?,
+                location = ?, description = ?, note = ?
+            WHERE event_id = ?
+            ''', (name, category_id, date, location, description, note, event_id))
+            row = _select_event(cursor, event_id)
+        _publish('update', 'Events', event_id, row, old)
+        return True, row
     except Exception as e:
         return False, str(e)
 
 def delete_event(event_id):
     """Удаление события"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM Events WHERE event_id = ?', (event_id,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with transaction() as cursor:
+            old = _select_event(cursor, event_id)
+            cursor.execute('DELETE FROM Events WHERE event_id = ?', (event_id,))
+        _publish('delete', 'Events', event_id, old=old)
         return True, None
     except Exception as e:
         return False, str(e)
 
-def get_favorites(user_id):
-    """Получение избранных событий для пользователя"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT 
-        e.event_id, 
-        e.event_name, 
-        c.category_name, 
-        e.location, 
-        e.event_date, 
-        e.description, 
-        e.favorite 
-    FROM Events e
-    JOIN Favorites f ON e.event_id = f.event_id
-    LEFT JOIN Categories c ON e.category = c.category_id
-    WHERE f.user_id = ?
-    ''', (user_id,))
-    
-    favorites = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
-    
-    return favorites
+def get_favorites(user_id, criteria=None):
+    """Получение избранных событий для пользователя (criteria — дополнительный EventFilter)"""
+    return get_events((criteria or EventFilter())._replace(user_id=user_id))
+
+def is_favorite(user_id, event_id):
+    """Есть ли событие в избранном пользователя (поиск по первичному ключу Favorites)"""
+    with db_cursor() as cursor:
+        cursor.execute('SELECT 1 FROM Favorites WHERE user_id = ? AND event_id = ?', (user_id, event_id))
+        return cursor.fetchone() is not None
 
 def add_favorite(user_id, event_id):
-    """Добавление события в избранное"""
+    """Добавление события в избранное.
+
+    В изменении публикуется строка события с новым favorite_count.
+    """
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Проверяем, не добавлено ли уже в избранное
-        cursor.execute('SELECT * FROM Favorites WHERE user_id = ? AND event_id = ?', (user_id, event_id))
-        if cursor.fetchone():
-            return True, None
-        
-        cursor.execute('''
-        INSERT INTO Favorites (user_id, event_id) 
-        VALUES (?, ?)
-        ''', (user_id, event_id))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with transaction() as cursor:
+            # Повторное добавление в избранное игнорируется
+            cursor.execute(f'''
+            {get_backend().insert_ignore} INTO Favorites (user_id, event_id)
+            VALUES (?, ?)
+            ''', (user_id, event_id))
+            row = _select_event(cursor, event_id) if cursor.rowcount else None
+        if row:
+            _publish('insert', 'Favorites', (user_id, event_id), row)
         return True, None
     except Exception as e:
         return False, str(e)
 
 def remove_favorite(user_id, event_id):
-    """Удаление события из избранного"""
+    """Удаление события из избранного.
+
+    В изменении публикуется строка события с новым favorite_count.
+    """
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        DELETE FROM Favorites 
-        WHERE user_id = ? AND event_id = ?
-        ''', (user_id, event_id))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with transaction() as cursor:
+            cursor.execute('''
+            DELETE FROM Favorites
+            WHERE user_id = ? AND event_id = ?
+            ''', (user_id, event_id))
+            row = _select_event(cursor, event_id) if cursor.rowcount else None
+        if row:
+            _publish('delete', 'Favorites', (user_id, event_id), row)
         return True, None
     except Exception as e:
-        return False, str(e) 
\ No newline at end of file
+        return False, str(e)
+
+# Типы отчетов и варианты сортировки (значения совпадают с подписями в интерфейсе)
+REPORT_ALL = 'Все'
+REPORT_BY_CATEGORY = 'По категориям'
+REPORT_BY_USER = 'По пользователям'
+REPORT_STATISTICS = 'Статистика'
+
+# Сортировка отчета: (столбец, направление). Строки сравниваются по кодам символов
+# на обоих бэкендах (binary_sort), а при равенстве — по event_id в том же направлении,
+# поэтому ORDER BY и сортировка в памяти по REPORT_SORT_KEYS дают один и тот же порядок
+REPORT_SORTS = {
+    'Дата (по убыванию)': ("IFNULL(e.event_date, '2999-12-31')", 'DESC'),
+    'Дата (по возрастанию)': ("IFNULL(e.event_date, '2999-12-31')", 'ASC'),
+    'Название (А-Я)': ('e.event_name', 'ASC'),
+    'Название (Я-А)': ('e.event_name', 'DESC'),
+}
+
+# Ключи сортировки уже полученных строк отчета в памяти, как в REPORT_SORTS
+REPORT_SORT_KEYS = {
+    'Дата (по убыванию)': (lambda row: (row[4] or '2999-12-31', row[0]), True),
+    'Дата (по возрастанию)': (lambda row: (row[4] or '2999-12-31', row[0]), False),
+    'Название (А-Я)': (lambda row: (row[1], row[0]), False),
+    'Название (Я-А)': (lambda row: (row[1], row[0]), True),
+}
+
+def _report_order(sort_option):
+    column, direction = REPORT_SORTS[sort_option]
+    return f'{get_backend().binary_sort(column)} {direction}, e.event_id {direction}'
+
+# События в избранном у пользователя с заданным именем
+_USER_FAVORITES_SQL = '''
+    SELECT f.event_id FROM Favorites f
+    JOIN Users u ON f.user_id = u.user_id
+    WHERE u.user_name = ?
+'''
+
+def build_report_query(report_type, date_from=None, date_to=None, category=None, user=None, sort_option=None):
+    """Собирает SQL отчета по событиям и его параметры.
+
+    Имена пользователей, добавивших событие в избранное, берутся из сводки
+    EventStats, которую поддерживают триггеры, поэтому отчет не группирует
+    JOIN с Favorites и Users, а число добавлений — из Events.favorite_count.
+    При фильтре по пользователю колонка содержит только его имя.
+    """
+    user = user if user and user != 'Все' else None
+    category = category if category and category != 'Все' else None
+    filter_user = user if report_type in (REPORT_ALL, REPORT_BY_USER) else None
+
+    params = []
+    if filter_user and report_type == REPORT_BY_USER:
+        # в отчет попадает только избранное пользователя
+        user_names = '?'
+        params.append(filter_user)
+    elif filter_user:
+        user_names = f"CASE WHEN e.event_id IN ({_USER_FAVORITES_SQL}) THEN ? ELSE '' END"
+        params.extend([filter_user, filter_user])
+    else:
+        user_names = "IFNULL(s.user_names, '')"
+
+    sql = f'''
+        SELECT e.event_id, e.event_name, c.category_name, e.location, e.event_date,
+               e.description, e.favorite_count, {user_names} AS user_names
+        FROM Events e
+        LEFT JOIN Categories c ON e.category = c.category_id
+        LEFT JOIN EventStats s ON s.event_id = e.event_id
+    '''
+
+    conditions = []
+    if date_from and date_to:
+        conditions.append('(e.event_date BETWEEN ? AND ? OR e.event_date IS NULL)')
+        params.extend([str(date_from), str(date_to)])
+    if category:
+        conditions.append('c.category_name = ?')
+        params.append(category)
+    if filter_user and report_type == REPORT_BY_USER:
+        # Только события из избранного пользователя
+        conditions.append(f'e.event_id IN ({_USER_FAVORITES_SQL})')
+        params.append(filter_user)
+    elif filter_user:
+        # События пользователя и события, которых нет ни у кого в избранном
+        conditions.append(f'''(e.event_id IN ({_USER_FAVORITES_SQL})
+            OR e.favorite_count = 0)''')
+        params.append(filter_user)
+
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    if sort_option in REPORT_SORTS:
+        sql += ' ORDER BY ' + _report_order(sort_option)
+    return sql, params
+
+def get_report(report_type, date_from=None, date_to=None, category=None, user=None, sort_option=None):
+    """Получение строк отчета по событиям"""
+    sql, params = build_report_query(report_type, date_from, date_to, category, user, sort_option)
+    with db_cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+def iter_report(report_type, date_from=None, date_to=None, category=None, user=None, sort_option=None,
+                batch_size=1000):
+    """Строки отчета по мере чтения курсора, пачками по batch_size (без загрузки всего отчета в память)"""
+    sql, params = build_report_query(report_type, date_from, date_to, category, user, sort_option)
+    with db_cursor(stream=True) as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+# Кэш отчетов: не больше REPORT_CACHE_SIZE отчетов и REPORT_CACHE_ROWS строк во всех
+# отчетах вместе (более длинные отчеты не кэшируются)
+REPORT_CACHE_SIZE = 16
+REPORT_CACHE_ROWS = 200000
+
+_report_cache = OrderedDict()  # ключ фильтров -> (версия данных, кортеж строк)
+_report_cache_stats = {'hits': 0, 'misses': 0}
+_report_lock = threading.Lock()
+
+def report_cache_key(report_type, date_from=None, date_to=None, category=None, user=None):
+    """Ключ фильтров отчета: значения 'Все' и фильтры, которые тип отчета не использует, отбрасываются"""
+    category = category if category and category != 'Все' else None
+    user = user if user and user != 'Все' and report_type in (REPORT_ALL, REPORT_BY_USER) else None
+    period = (str(date_from), str(date_to)) if date_from and date_to else None
+    return report_type, period, category, user
+
+def sort_report_rows(rows, sort_option):
+    """Строки отчета, отсортированные в памяти так же, как ORDER BY из REPORT_SORTS"""
+    if sort_option not in REPORT_SORT_KEYS:
+        return list(rows)
+    key, reverse = REPORT_SORT_KEYS[sort_option]
+    return sorted(rows, key=key, reverse=reverse)
+
+def report_cache_stats():
+    """Число попаданий и промахов кэша отчетов и текущая версия данных"""
+    with _report_lock:
+        return CacheStats(_report_cache_stats['hits'], _report_cache_stats['misses'], _data_version)
+
+def cached_report(report_type, date_from=None, date_to=None, category=None, user=None, sort_option=None):
+    """Строки отчета (или статистики) из кэша, если данные не менялись с прошлого запроса.
+
+    Кэш хранит несортированные строки, поэтому смена сортировки упорядочивает их
+    в памяти без повторного запроса. При промахе отчет читается get_report или
+    get_statistics и запоминается, если за время чтения версия данных не изменилась.
+    """
+    key = report_cache_key(report_type, date_from, date_to, category, user)
+    with _report_lock:
+        entry = _report_cache.get(key)
+        if entry is not None and entry[0] == _data_version:
+            _report_cache.move_to_end(key)
+            _report_cache_stats['hits'] += 1
+            rows = entry[1]
+        else:
+            _report_cache_stats['misses'] += 1
+            version, rows = _data_version, None
+    if rows is None:
+        if report_type == REPORT_STATISTICS:
+            rows = tuple(get_statistics(date_from, date_to, category))
+        else:
+            rows = tuple(get_report(report_type, date_from, date_to, category, user))
+        with _report_lock:
+            if version == _data_version and len(rows) <= REPORT_CACHE_ROWS:
+                _report_cache[key] = (version, rows)
+                _report_cache.move_to_end(key)
+                total = sum(len(cached) for _, cached in _report_cache.values())
+                while len(_report_cache) > REPORT_CACHE_SIZE or total > REPORT_CACHE_ROWS:
+                    _, (_, evicted) = _report_cache.popitem(last=False)
+                    total -= len(evicted)
+    if report_type == REPORT_STATISTICS:
+        return list(rows)
+    return sort_report_rows(rows, sort_option)
+
+def get_category_day_counts(date_from=None, date_to=None):
+    """Число событий по дням и категориям из сводки CategoryDayStats.
+
+    Возвращает строки (event_date, category_name, event_count); события без даты
+    имеют дату '', без категории — category_name None.
+    """
+    sql = '''
+        SELECT s.event_date, c.category_name, s.event_count
+        FROM CategoryDayStats s
+        LEFT JOIN Categories c ON s.category_id = c.category_id
+    '''
+    params = []
+    if date_from and date_to:
+        sql += " WHERE s.event_date BETWEEN ? AND ? OR s.event_date = ''"
+        params.extend([str(date_from), str(date_to)])
+    sql += ' ORDER BY s.event_date, c.category_name'
+    with db_cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+# Строка статистического отчета: раздел, показатель и значение
+StatsRow = namedtuple('StatsRow', 'section label value')
+
+# Сколько строк выводить в разделах-рейтингах статистики
+STATS_TOP = 10
+
+def get_statistics(date_from=None, date_to=None, category=None):
+    """Сводная статистика по событиям: по категориям, месяцам и неделям, избранное
+    по пользователям и популярные места. Возвращает список StatsRow.
+
+    Все подсчеты выполняются GROUP BY в базе по сводкам, которые поддерживают
+    триггеры: разделы по категориям и периодам читают CategoryDayStats (строка на
+    категорию и день). Рейтинги пользователей и мест считаются по событиям периода,
+    а если период охватывает больше половины событий — как итог за все время
+    (UserCategoryStats, LocationStats) минус события вне периода. Период отбирает
+    события с датой в интервале и события без даты, как в остальных отчетах.
+    """
+    backend = get_backend()
+    category = category if category and category != 'Все' else None
+    period = bool(date_from and date_to)
+
+    day_conditions, day_params = [], []
+    if period:
+        day_conditions.append("(s.event_date BETWEEN ? AND ? OR s.event_date = '')")
+        day_params.extend([str(date_from), str(date_to)])
+    # условия на категорию для событий (e) и для итоговых сводок (s)
+    category_params = []
+    if category:
+        day_conditions.append('c.category_name = ?')
+        day_params.append(category)
+        category_params.append(category)
+    category_ids = 'SELECT category_id FROM Categories WHERE category_name = ?'
+    event_category = [f'e.category IN ({category_ids})'] if category else []
+    stats_category = [f's.category_id IN ({category_ids})'] if category else []
+
+    days_from = '''
+        FROM CategoryDayStats s
+        LEFT JOIN Categories c ON s.category_id = c.category_id
+    '''
+    in_period = total = 0
+    if period:
+        # событий в периоде и всего (с учетом категории) — по сводке, без просмотра событий
+        with db_cursor() as cursor:
+            cursor.execute(f'''
+                SELECT SUM(CASE WHEN s.event_date BETWEEN ? AND ? OR s.event_date = ''
+                                THEN s.event_count ELSE 0 END),
+                       SUM(s.event_count)
+                FROM CategoryDayStats s{_where(stats_category)}''',
+                [str(date_from), str(date_to)] + category_params)
+            in_period, total = (value or 0 for value in cursor.fetchone())
+
+    if not period:
+        user_counts = f'''
+            SELECT s.user_id, SUM(s.favorite_count) AS n
+            FROM UserCategoryStats s{_where(stats_category)}
+            GROUP BY s.user_id'''
+        user_params = category_params
+        location_counts = f'''
+            SELECT s.location, SUM(s.event_count) AS n
+            FROM LocationStats s{_where(stats_category)}
+            GROUP BY s.location'''
+        location_params = category_params
+    elif in_period * 2 > total:
+        # итог за все время минус события вне периода (события без даты — в периоде)
+        outside = ['(e.event_date < ? OR e.event_date > ?)'] + event_category
+        outside_params = [str(date_from), str(date_to)] + category_params
+        user_counts = f'''
+            SELECT t.user_id, SUM(t.n) AS n FROM (
+                SELECT s.user_id, s.favorite_count AS n FROM UserCategoryStats s{_where(stats_category)}
+                UNION ALL
+                SELECT f.user_id, -COUNT(*) FROM Favorites f
+                WHERE f.event_id IN (SELECT e.event_id FROM Events e{_where(outside)})
+                GROUP BY f.user_id
+            ) t GROUP BY t.user_id'''
+        user_params = category_params + outside_params
+        location_counts = f'''
+            SELECT t.location, SUM(t.n) AS n FROM (
+                SELECT s.location, s.event_count AS n FROM LocationStats s{_where(stats_category)}
+                UNION ALL
+                SELECT IFNULL(e.location, ''), -COUNT(*) FROM Events e{_where(outside)}
+                GROUP BY IFNULL(e.location, '')
+            ) t GROUP BY t.location'''
+        location_params = category_params + outside_params
+    else:
+        inside = ['(e.event_date BETWEEN ? AND ? OR e.event_date IS NULL)'] + event_category
+        inside_params = [str(date_from), str(date_to)] + category_params
+        user_counts = f'''
+            SELECT f.user_id, COUNT(*) AS n FROM Favorites f
+            WHERE f.event_id IN (SELECT e.event_id FROM Events e{_where(inside)})
+            GROUP BY f.user_id'''
+        user_params = inside_params
+        location_counts = f'''
+            SELECT IFNULL(e.location, '') AS location, COUNT(*) AS n FROM Events e{_where(inside)}
+            GROUP BY IFNULL(e.location, '')'''
+        location_params = inside_params
+
+    dated = _where(day_conditions + ["s.event_date != ''"])
+    sections = [
+        ('Событий по категориям', f'''
+            SELECT IFNULL(c.category_name, 'Без категории'), SUM(s.event_count)
+            {days_from}{_where(day_conditions)}
+            GROUP BY s.category_id, c.category_name
+            ORDER BY 2 DESC''', day_params),
+        ('Событий по месяцам', f'''
+            SELECT SUBSTR(s.event_date, 1, 7) AS period, SUM(s.event_count)
+            {days_from}{dated}
+            GROUP BY period ORDER BY period''', day_params),
+        ('Событий по неделям', f'''
+            SELECT {backend.week_sql('s.event_date')} AS period, SUM(s.event_count)
+            {days_from}{dated}
+            GROUP BY period ORDER BY period''', day_params),
+        ('Избранное по пользователям', f'''
+            SELECT u.user_name, uc.n
+            FROM ({user_counts}) uc
+            JOIN Users u ON uc.user_id = u.user_id
+            WHERE uc.n > 0
+            ORDER BY uc.n DESC, u.user_name LIMIT {STATS_TOP}''', user_params),
+        ('Популярные места', f'''
+            SELECT lc.location, lc.n
+            FROM ({location_counts}) lc
+            WHERE lc.n > 0 AND lc.location != ''
+            ORDER BY lc.n DESC, lc.location LIMIT {STATS_TOP}''', location_params),
+    ]
+
+    rows = []
+    with db_cursor() as cursor:
+        for section, sql, params in sections:
+            cursor.execute(sql, params)
+            rows.extend(StatsRow(section, label, int(value)) for label, value in cursor.fetchall())
+    return rows
+
+def count_events(criteria=None):
+    """Количество событий в базе (подходящих под EventFilter, если он задан)"""
+    conditions, params = _event_conditions(criteria)
+    with db_cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM Events e' + _where(conditions), params)
+        return cursor.fetchone()[0]
+
+def create_sample_events():
+    """Создает простые тестовые события (и категорию, если категорий нет)"""
+    backend = get_backend()
+    with transaction() as cursor:
+        # Проверяем наличие хотя бы одной категории
+        cursor.execute('SELECT category_id FROM Categories LIMIT 1')
+        cat_result = cursor.fetchone()
+        if cat_result:
+            cat_id = cat_result[0]
+        else:
+            cursor.execute(
+                'INSERT INTO Categories (category_name, description) VALUES (?, ?)',
+                ('Тестовая категория', 'Тестовое описание'))
+            cat_id = backend.last_insert_id(cursor)
+
+        # Тестовые события на сегодня и ближайшие дни
+        today = datetime.date.today()
+        cursor.executemany('''
+        INSERT INTO Events (event_name, category, event_date, location, description, note)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            ('Тестовое событие 1', cat_id, str(today), 'Тестовое место', 'Описание события 1', ''),
+            ('Тестовое событие 2', cat_id, str(today + datetime.timedelta(days=1)), 'Место 2', 'Описание события 2', ''),
+            ('Тестовое событие 3', cat_id, str(today + datetime.timedelta(days=2)), 'Место 3', 'Описание события 3', ''),
+        ])
+    _publish('reload', 'Categories')
+    _publish('reload', 'Events')
+
+def get_users():
+    """Получение списка пользователей (id и имя)"""
+    with db_cursor() as cursor:
+        cursor.execute('SELECT user_id, user_name FROM Users')
+        return cursor.fetchall()
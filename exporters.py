@@ -0,0 +1,187 @@
+"""Экспорт отчетов по событиям в файлы.
+
+Строки отчета передаются итератором (например, db_utils.iter_report) и
+записываются по одной, поэтому память не зависит от размера отчета.
+openpyxl и reportlab импортируются при первом экспорте, а не при запуске приложения.
+"""
+import time
+from collections import namedtuple
+from itertools import islice
+
+from db_utils import REPORT_BY_USER, REPORT_STATISTICS
+
+# Итог экспорта в PDF: строк, страниц, время в секундах и скорость
+PdfResult = namedtuple('PdfResult', 'rows pages elapsed pages_per_sec')
+
+# Заголовки колонок отчета
+REPORT_COLUMNS = ['ID', 'Название', 'Категория', 'Место', 'Дата', 'Описание', 'В избранном']
+
+# Заголовки колонок статистического отчета (строки db_utils.StatsRow)
+STATISTICS_COLUMNS = ['Раздел', 'Показатель', 'Значение']
+
+
+def report_columns(report_type):
+    """Заголовки колонок с правильным названием колонки пользователя для типа отчета"""
+    if report_type == REPORT_STATISTICS:
+        return STATISTICS_COLUMNS
+    if report_type == REPORT_BY_USER:
+        return REPORT_COLUMNS + ['Добавил в избранное']
+    return REPORT_COLUMNS + ['Пользователь']
+
+
+def format_report_row(row):
+    """Строка отчета для вывода: пустые значения в '-' (favorite_count выводится числом)"""
+    row_list = list(row)
+    if not row_list[7]:
+        row_list[7] = '-'
+    return row_list
+
+
+def export_excel(filename, rows, columns, progress=None, progress_every=1000, row_format=format_report_row):
+    """Записывает строки отчета в XLSX в режиме write-only openpyxl.
+
+    progress(n) вызывается каждые progress_every строк и в конце; row_format
+    превращает строку из базы в значения ячеек. Возвращает число записанных строк.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Отчет')
+    bold = Font(bold=True)
+    header = []
+    for title in columns:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font = bold
+        header.append(cell)
+    ws.append(header)
+
+    count = 0
+    for row in rows:
+        ws.append(row_format(row))
+        count += 1
+        if progress and count % progress_every == 0:
+            progress(count)
+    wb.save(filename)
+    if progress:
+        progress(count)
+    return count
+
+
+class _LazyFlowables(list):
+    """Список flowables для doc.build, который дополняется из генератора по мере верстки.
+
+    reportlab забирает элементы с начала списка и проверяет его длину перед каждым
+    элементом, поэтому в памяти одновременно находятся лишь одна-две таблицы.
+    """
+
+    def __init__(self, first, source):
+        super().__init__(first)
+        self._source = source
+
+    def __len__(self):
+        if list.__len__(self) < 2 and self._source is not None:
+            chunk = next(self._source, None)
+            if chunk is None:
+                self._source = None
+            else:
+                self.append(chunk)
+        return list.__len__(self)
+
+
+def warm_up():
+    """Импортирует модули экспорта заранее (например, в фоне после запуска приложения)"""
+    import openpyxl  # noqa: F401
+    import reportlab.platypus  # noqa: F401
+
+    register_fonts()
+
+
+def register_fonts():
+    """Один раз регистрирует в reportlab шрифты с кириллицей (см. fonts.register_fonts)"""
+    import fonts
+
+    return fonts.register_fonts()
+
+
+def _font(name, fallback):
+    """Имя шрифта, если он зарегистрирован в reportlab, иначе встроенный fallback"""
+    from reportlab.pdfbase import pdfmetrics
+
+    return name if name in pdfmetrics.getRegisteredFontNames() else fallback
+
+
+def export_pdf(filename, rows, columns, title, chunk_rows=200, progress=None,
+               font=None, bold_font=None, row_format=format_report_row):
+    """Записывает строки отчета в PDF таблицами по chunk_rows строк.
+
+    Каждая таблица повторяет заголовок на новых страницах (repeatRows), чередование
+    цвета строк задается одной командой ROWBACKGROUNDS. progress(pages) вызывается
+    после каждой страницы, row_format — как в export_excel. По умолчанию шрифты
+    берутся из fonts.register_fonts(). Возвращает PdfResult.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    start = time.perf_counter()
+    fonts = register_fonts()
+    if fonts:
+        font = font or fonts.regular
+        bold_font = bold_font or fonts.bold
+    font = _font(font, 'Helvetica')
+    bold_font = _font(bold_font, 'Helvetica-Bold')
+
+    title_style = getSampleStyleSheet()['Heading1']
+    title_style.alignment = TA_CENTER
+    title_style.fontName = bold_font
+
+    # Один стиль на все таблицы: заголовок, шрифты, сетка и "зебра" строк
+    style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.blue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), bold_font),
+        ('FONTNAME', (0, 1), (-1, -1), font),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ])
+    # ширины колонок отчета по событиям; для других отчетов их подбирает reportlab
+    col_widths = [1*cm, 3*cm, 3*cm, 3*cm, 2*cm, 4*cm, 2*cm, 3*cm]
+    if len(columns) != len(col_widths):
+        col_widths = None
+    # четное число строк в таблице сохраняет чередование цветов между таблицами
+    chunk_rows += chunk_rows % 2
+
+    count = 0
+
+    def tables():
+        nonlocal count
+        rows_iter = iter(rows)
+        while True:
+            chunk = [['-' if value in (None, '') else str(value) for value in row_format(row)]
+                     for row in islice(rows_iter, chunk_rows)]
+            if not chunk:
+                return
+            count += len(chunk)
+            yield Table([columns] + chunk, colWidths=col_widths, repeatRows=1, style=style)
+
+    pages = 0
+
+    def on_page(canvas, doc):
+        nonlocal pages
+        pages += 1
+        if progress:
+            progress(pages)
+
+    doc = SimpleDocTemplate(filename, pagesize=letter, title=title)
+    flowables = _LazyFlowables([Paragraph(title, title_style), Spacer(1, 0.5*cm)], tables())
+    doc.build(flowables, onFirstPage=on_page, onLaterPages=on_page)
+
+    elapsed = time.perf_counter() - start
+    return PdfResult(count, pages, elapsed, pages / elapsed if elapsed else 0.0)
@@ -0,0 +1,321 @@
+"""Поддельный драйвер MySQL поверх SQLite для проверки MySQLBackend без сервера.
+
+Повторяет ту часть mysql.connector, которой пользуется db_backend.MySQLBackend:
+pooling.MySQLConnectionPool, подключения с cursor(buffered=...), commit,
+rollback и close (возврат в пул со сбросом сессии), исключения IntegrityError
+и ProgrammingError. Запросы приходят в диалекте MySQL с плейсхолдерами %s, как
+их отправляет бэкенд, и переводятся в SQLite: INSERT IGNORE, ON DUPLICATE KEY
+UPDATE, GROUP_CONCAT ... SEPARATOR, MATCH ... AGAINST, DATE_FORMAT, триггеры
+FOR EACH ROW с BEGIN ... END и IF ... END IF, COLLATE utf8mb4_bin. Перевод покрывает только SQL этого
+приложения, а не весь диалект MySQL.
+
+Отличия от настоящего сервера: каскадные действия внешних ключей в SQLite
+запускают триггеры (в MySQL — нет), а полнотекстовый поиск не учитывает
+стоп-слова и минимальную длину слова, и его ранг — просто число совпадений.
+
+    import fake_mysql
+    from db_backend import MySQLBackend
+    backend = MySQLBackend({'database': 'test.db'}, driver=fake_mysql)
+"""
+import datetime
+import queue
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+from types import SimpleNamespace
+
+
+class Error(Exception):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+class IntegrityError(DatabaseError):
+    pass
+
+
+class ProgrammingError(DatabaseError):
+    pass
+
+
+class OperationalError(DatabaseError):
+    pass
+
+
+class InternalError(DatabaseError):
+    pass
+
+
+class PoolError(Error):
+    pass
+
+
+def _bind(operation):
+    """Плейсхолдеры %s в ? и %% в %; другой % без экранирования — ошибка, как в mysql.connector"""
+    def replace(match):
+        if match.group(1) == 's':
+            return '?'
+        if match.group(1) == '%':
+            return '%'
+        raise ProgrammingError(f'Неэкранированный % в запросе с параметрами: {operation[:80]!r}')
+    return re.sub(r'%(.)', replace, operation, flags=re.S)
+
+
+_TRIGGER_RE = re.compile(
+    r'^\s*CREATE\s+TRIGGER\s+(\w+)\s+(BEFORE|AFTER)\s+(INSERT|UPDATE|DELETE)\s+ON\s+(\w+)\s+FOR\s+EACH\s+ROW\s+(.*)$',
+    re.I | re.S)
+_IF_RE = re.compile(r'^IF\s+(.*?)\s+THEN\s+(.*?);?\s*END\s+IF\s*;?$', re.I | re.S)
+
+
+def _translate_trigger(match):
+    """Тело триггера MySQL (одна команда, BEGIN ... END, IF ... END IF) в синтаксис SQLite"""
+    name, timing, event, table, body = match.groups()
+    body = body.strip()
+    if re.match(r'BEGIN\b', body, re.I) and re.search(r'\bEND\s*$', body, re.I):
+        body = re.sub(r'\bEND\s*$', '', body[5:], flags=re.I).strip()
+    when = ''
+    condition = _IF_RE.match(body)
+    if condition:
+        when = f' WHEN {condition.group(1)}'
+        body = condition.group(2).strip()
+    body = body.rstrip(';').strip()
+    return f'CREATE TRIGGER {name} {timing} {event} ON {table} FOR EACH ROW{when} BEGIN {body}; END'
+
+
+@lru_cache(maxsize=512)
+def translate(sql):
+    """Запрос MySQL (с плейсхолдерами ?) в запрос SQLite; None — команда ничего не делает"""
+    stripped = sql.strip()
+    if re.match(r'CREATE\s+FULLTEXT\s+INDEX\b', stripped, re.I):
+        # поиск выполняет функция mysql_match, индекс не нужен
+        return None
+    if re.match(r'ANALYZE\s+TABLE\b', stripped, re.I):
+        return 'ANALYZE'
+    sql = re.sub(r'^\s*EXPLAIN\s+(?!QUERY\s+PLAN)', 'EXPLAIN QUERY PLAN ', sql, flags=re.I)
+    sql = re.sub(r'\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b', 'INTEGER PRIMARY KEY AUTOINCREMENT', sql, flags=re.I)
+    sql = re.sub(r'\bINSERT\s+IGNORE\b', 'INSERT OR IGNORE', sql, flags=re.I)
+    sql = re.sub(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', 'ON CONFLICT DO UPDATE SET', sql, flags=re.I)
+    sql = re.sub(r'\bVALUES\((\w+)\)', r'excluded.\1', sql, flags=re.I)
+    sql = re.sub(r"\bGROUP_CONCAT\(\s*DISTINCT\s+(.+?)\s+SEPARATOR\s+('[^']*')\s*\)",
+                 r'mysql_group_concat_distinct(\1, \2)', sql, flags=re.I | re.S)
+    sql = re.sub(r"\bGROUP_CONCAT\(\s*(.+?)\s+SEPARATOR\s+('[^']*')\s*\)",
+                 r'GROUP_CONCAT(\1, \2)', sql, flags=re.I | re.S)
+    sql = re.sub(r'\bMATCH\s*\(([^)]*)\)\s*AGAINST\s*\(\s*\?\s+IN\s+BOOLEAN\s+MODE\s*\)',
+                 r'mysql_match(?, \1)', sql, flags=re.I)
+    sql = re.sub(r'^(\s*DROP\s+INDEX\s+\w+)\s+ON\s+\w+', r'\1', sql, flags=re.I)
+    sql = re.sub(r'\bCONVERT\(\s*(.+?)\s+USING\s+utf8mb4\s*\)\s+COLLATE\s+utf8mb4_bin\b',
+                 r'\1 COLLATE BINARY', sql, flags=re.I)
+    return _TRIGGER_RE.sub(_translate_trigger, sql)
+
+
+def _date_format(value, fmt):
+    """DATE_FORMAT MySQL для спецификаторов %Y %m %d %x %v %%"""
+    if not value or fmt is None:
+        return None
+    try:
+        date = datetime.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+    iso_year, iso_week, _ = date.isocalendar()
+    specs = {
+        'Y': f'{date.year:04d}', 'm': f'{date.month:02d}', 'd': f'{date.day:02d}',
+        'x': f'{iso_year:04d}', 'v': f'{iso_week:02d}', '%': '%',
+    }
+    return re.sub(r'%(.)', lambda m: specs.get(m.group(1), m.group(1)), fmt)
+
+
+def _match(query, *columns):
+    """MATCH ... AGAINST (... IN BOOLEAN MODE) для запросов вида '+слово +префикс*'.
+
+    Возвращает число совпавших слов текста или 0, если нет хотя бы одного слова запроса.
+    """
+    words = re.findall(r'\w+', ' '.join(str(column) for column in columns if column).lower())
+    score = 0
+    for term in query.lower().split():
+        term = term.lstrip('+')
+        prefix = term.endswith('*')
+        term = term.rstrip('*')
+        hits = sum(1 for word in words if (word.startswith(term) if prefix else word == term))
+        if not hits:
+            return 0
+        score += hits
+    return float(score)
+
+
+class _GroupConcatDistinct:
+    """GROUP_CONCAT(DISTINCT x SEPARATOR s): различные значения в порядке появления"""
+
+    def __init__(self):
+        self.values = {}
+        self.separator = ','
+
+    def step(self, value, separator):
+        self.separator = separator
+        if value is not None:
+            self.values.setdefault(str(value), None)
+
+    def finalize(self):
+        return self.separator.join(self.values) if self.values else None
+
+
+def _wrap_errors(fn):
+    try:
+        return fn()
+    except sqlite3.IntegrityError as e:
+        raise IntegrityError(str(e)) from e
+    except sqlite3.OperationalError as e:
+        raise OperationalError(str(e)) from e
+    except sqlite3.Error as e:
+        raise DatabaseError(str(e)) from e
+
+
+class Cursor:
+    """Курсор: буферизованный читает все строки сразу, небуферизованный — по мере выборки.
+
+    Как в mysql.connector, новый запрос на небуферизованном курсоре с непрочитанными
+    строками — ошибка.
+    """
+
+    def __init__(self, connection, buffered=False):
+        self._connection = connection
+        self._cursor = connection._conn.cursor()
+        self._buffered = buffered
+        self._rows = None
+        self._unread = False
+
+    def _run(self, operation, params, many=False):
+        if self._unread:
+            raise InternalError('Unread result found')
+        if params is not None:
+            operation = _bind(operation)
+        if re.match(r'\s*SET\s+SESSION\s+TRANSACTION\s+READ\s+ONLY\s*$', operation, re.I):
+            self._connection._set_read_only(True)
+            return
+        sql = translate(operation)
+        if sql is None:
+            self._rows = iter(())
+            return
+        if many:
+            _wrap_errors(lambda: self._cursor.executemany(sql, params))
+        else:
+            _wrap_errors(lambda: self._cursor.execute(sql, params if params is not None else ()))
+        if self._buffered:
+            self._rows = iter(_wrap_errors(self._cursor.fetchall))
+        else:
+            self._rows = None
+            self._unread = self._cursor.description is not None
+
+    def execute(self, operation, params=None):
+        self._run(operation, tuple(params) if params is not None else None)
+
+    def executemany(self, operation, seq_params):
+        self._run(operation, [tuple(p) for p in seq_params], many=True)
+
+    def fetchone(self):
+        if self._rows is not None:
+            return next(self._rows, None)
+        row = _wrap_errors(self._cursor.fetchone)
+        if row is None:
+            self._unread = False
+        return row
+
+    def fetchmany(self, size=1):
+        rows = []
+        while len(rows) < size:
+            row = self.fetchone()
+            if row is None:
+                break
+            rows.append(row)
+        return rows
+
+    def fetchall(self):
+        return list(iter(self.fetchone, None))
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._unread = False
+        self._cursor.close()
+
+
+class PooledConnection:
+    """Подключение из пула; close() сбрасывает сессию и возвращает его в пул"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def _set_read_only(self, read_only):
+        self._conn.execute(f'PRAGMA query_only = {"ON" if read_only else "OFF"}')
+
+    def cursor(self, buffered=False):
+        return Cursor(self, buffered)
+
+    def commit(self):
+        _wrap_errors(self._conn.commit)
+
+    def rollback(self):
+        _wrap_errors(self._conn.rollback)
+
+    def close(self):
+        # как reset_session: незафиксированная транзакция и настройки сессии сбрасываются
+        self._conn.rollback()
+        self._set_read_only(False)
+        self._pool._release(self._conn)
+
+
+class MySQLConnectionPool:
+    """Пул подключений к файлу SQLite из config['database'] (по умолчанию — база в памяти)"""
+
+    def __init__(self, pool_name=None, pool_size=5, **config):
+        self.pool_name = pool_name
+        self.pool_size = pool_size
+        self.database = config.get('database') or ':memory:'
+        self._free = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, check_same_thread=False)
+        # InnoDB проверяет внешние ключи всегда
+        conn.execute('PRAGMA foreign_keys = ON')
+        conn.execute('PRAGMA busy_timeout = 5000')
+        conn.create_function('DATE_FORMAT', 2, _date_format, deterministic=True)
+        conn.create_function('mysql_match', -1, _match, deterministic=True)
+        conn.create_aggregate('mysql_group_concat_distinct', 2, _GroupConcatDistinct)
+        return conn
+
+    def get_connection(self):
+        try:
+            conn = self._free.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created >= self.pool_size:
+                    # mysql.connector не ждет освобождения подключения
+                    raise PoolError('Failed getting connection; pool exhausted')
+                self._created += 1
+            conn = self._connect()
+        return PooledConnection(self, conn)
+
+    def _release(self, conn):
+        self._free.put(conn)
+
+
+pooling = SimpleNamespace(MySQLConnectionPool=MySQLConnectionPool)
@@ -0,0 +1,246 @@
+"""Поиск и регистрация шрифтов с кириллицей для экспорта в PDF.
+
+Шрифт ищется по списку кандидатов (Arial, DejaVu Sans, Liberation Sans, ...)
+в каталогах из FONT_DIRS, переменной окружения EVENTDESIGN_FONT_DIRS и в
+системных каталогах шрифтов Windows, macOS и Linux; кандидат без кириллицы
+пропускается. Выбранные пути и отметки о кириллице в проверенных файлах
+кэшируются на диске в JSON, поэтому повторные запуски не обходят каталоги и
+не разбирают заведомо неподходящие шрифты. Сами шрифты всегда загружаются
+публичным конструктором reportlab TTFont.
+"""
+import json
+import os
+import sys
+import threading
+from collections import namedtuple
+
+# Имена, под которыми шрифты регистрируются в reportlab
+FONT_NAME = 'ReportFont'
+BOLD_FONT_NAME = 'ReportFont-Bold'
+
+# Кандидаты в порядке предпочтения: (обычный, жирный) файл шрифта
+FONT_CANDIDATES = [
+    ('arial.ttf', 'arialbd.ttf'),
+    ('DejaVuSans.ttf', 'DejaVuSans-Bold.ttf'),
+    ('LiberationSans-Regular.ttf', 'LiberationSans-Bold.ttf'),
+    ('NotoSans-Regular.ttf', 'NotoSans-Bold.ttf'),
+    ('FreeSans.ttf', 'FreeSansBold.ttf'),
+]
+
+# Дополнительные каталоги шрифтов; просматриваются раньше системных.
+# Можно дополнить переменной окружения EVENTDESIGN_FONT_DIRS (через os.pathsep).
+FONT_DIRS = []
+
+# Символ, наличие которого в шрифте считается поддержкой кириллицы ('Ж')
+CYRILLIC_PROBE = 0x0416
+
+CACHE_FILE = 'fonts.json'
+CACHE_FORMAT = 3
+
+# Найденные шрифты: пути к файлам и имена, под которыми они зарегистрированы
+ReportFonts = namedtuple('ReportFonts', 'regular bold regular_path bold_path')
+
+
+def font_dirs():
+    """Каталоги поиска шрифтов: настроенные, затем системные для текущей ОС"""
+    dirs = list(FONT_DIRS)
+    env = os.environ.get('EVENTDESIGN_FONT_DIRS')
+    if env:
+        dirs.extend(path for path in env.split(os.pathsep) if path)
+    home = os.path.expanduser('~')
+    if sys.platform == 'win32':
+        dirs.append(os.path.join(os.environ.get('WINDIR', 'C:/Windows'), 'Fonts'))
+        if os.environ.get('LOCALAPPDATA'):
+            dirs.append(os.path.join(os.environ['LOCALAPPDATA'], 'Microsoft', 'Windows', 'Fonts'))
+    elif sys.platform == 'darwin':
+        dirs += [os.path.join(home, 'Library', 'Fonts'), '/Library/Fonts', '/System/Library/Fonts']
+    else:
+        data_home = os.environ.get('XDG_DATA_HOME') or os.path.join(home, '.local', 'share')
+        dirs += [os.path.join(data_home, 'fonts'), os.path.join(home, '.fonts'),
+                 '/usr/local/share/fonts', '/usr/share/fonts']
+    return [path for path in dict.fromkeys(dirs) if os.path.isdir(path)]
+
+
+def cache_dir():
+    """Каталог кэша приложения (создается при первой записи)"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'eventdesign')
+
+
+def _index_dirs(dirs):
+    """Словарь имя файла в нижнем регистре -> первый найденный путь (как у fontconfig, рекурсивно)"""
+    found = {}
+    for root in dirs:
+        for path, _, files in os.walk(root):
+            for name in files:
+                if name.lower().endswith('.ttf'):
+                    found.setdefault(name.lower(), os.path.join(path, name))
+    return found
+
+
+def find_font_files(dirs=None):
+    """Пары (обычный, жирный) из FONT_CANDIDATES, найденные в каталогах, в порядке предпочтения.
+
+    Жирный файл может отсутствовать — тогда вместо него используется обычный.
+    Кириллица в найденных файлах не проверяется (это делает load_fonts).
+    """
+    index = _index_dirs(font_dirs() if dirs is None else dirs)
+    found = []
+    for regular, bold in FONT_CANDIDATES:
+        regular_path = index.get(regular.lower())
+        if regular_path:
+            found.append((regular_path, index.get(bold.lower(), regular_path)))
+    return found
+
+
+def _file_key(path):
+    """Отметка файла для проверки кэша: [mtime, размер]"""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class _FontCache:
+    """Кэш выбранных путей и отметок о кириллице в файле JSON.
+
+    Кэш сбрасывается при смене версии reportlab или списка каталогов, а запись о
+    шрифте — при изменении его файла. Любая ошибка чтения означает пустой кэш.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+        self.dirty = False
+
+    def load(self, version, dirs):
+        data = None
+        if self.path is not None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception:
+                pass
+        if not isinstance(data, dict) or data.get('key') != [CACHE_FORMAT, version]:
+            data = {'key': [CACHE_FORMAT, version], 'cyrillic': {}}
+            self.dirty = True
+        if data.get('dirs') != dirs:
+            data['dirs'] = dirs
+            data['resolved'] = None
+            self.dirty = True
+        self.data = data
+
+    def resolved(self):
+        """Закэшированная пара путей, если файлы не изменились"""
+        entry = self.data.get('resolved')
+        if not entry:
+            return None
+        try:
+            if all(_file_key(path) == key for path, key in entry):
+                return tuple(path for path, _ in entry)
+        except OSError:
+            pass
+        return None
+
+    def set_resolved(self, paths):
+        self.data['resolved'] = [[path, _file_key(path)] for path in paths]
+        self.dirty = True
+
+    def cyrillic(self, path):
+        """Есть ли в файле кириллица: True/False или None, если файл не проверялся или изменился"""
+        entry = self.data['cyrillic'].get(path)
+        try:
+            if entry and entry[0] == _file_key(path):
+                return entry[1]
+        except OSError:
+            pass
+        return None
+
+    def set_cyrillic(self, path, supported):
+        self.data['cyrillic'][path] = [_file_key(path), supported]
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty or self.path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, separators=(',', ':'))
+            os.replace(tmp, self.path)
+            self.dirty = False
+        except OSError:
+            pass
+
+
+def _supports_cyrillic(font):
+    return CYRILLIC_PROBE in font.face.charToGlyph
+
+
+def load_fonts(dirs=None, use_cache=True, cache_file=None):
+    """Находит и загружает шрифты отчетов, не регистрируя их.
+
+    Кандидаты из find_font_files перебираются по порядку, пока не найдется шрифт
+    с кириллицей. cache_file — путь к файлу кэша (по умолчанию CACHE_FILE в
+    cache_dir()). Возвращает (обычный TTFont, жирный TTFont) или None, если
+    подходящий шрифт не найден.
+    """
+    import reportlab
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    dirs = font_dirs() if dirs is None else list(dirs)
+    if use_cache:
+        cache_file = cache_file or os.path.join(cache_dir(), CACHE_FILE)
+    cache = _FontCache(cache_file if use_cache else None)
+    cache.load(reportlab.Version, dirs)
+
+    fonts = None
+    resolved = cache.resolved()
+    for paths in [resolved] if resolved else find_font_files(dirs):
+        supported = cache.cyrillic(paths[0])
+        if supported is False:
+            # файл уже проверялся, кириллицы в нем нет
+            continue
+        regular = TTFont(FONT_NAME, paths[0])
+        if supported is None:
+            supported = _supports_cyrillic(regular)
+            cache.set_cyrillic(paths[0], supported)
+        if supported:
+            fonts = regular, TTFont(BOLD_FONT_NAME, paths[1])
+            if not resolved:
+                cache.set_resolved(paths)
+            break
+    cache.save()
+    return fonts
+
+
+_registered = None
+_lock = threading.Lock()
+
+
+def register_fonts():
+    """Один раз находит и регистрирует шрифты отчетов в reportlab.
+
+    Возвращает ReportFonts или None, если шрифт с кириллицей не найден.
+    """
+    global _registered
+    with _lock:
+        if _registered is not None:
+            return _registered or None
+        from reportlab.pdfbase import pdfmetrics
+
+        try:
+            fonts = load_fonts()
+        except Exception:
+            fonts = None
+        if fonts is None:
+            print("Не найден шрифт с поддержкой кириллицы. Будут использованы встроенные шрифты.")
+            _registered = False
+            return None
+        regular, bold = fonts
+        pdfmetrics.registerFont(regular)
+        pdfmetrics.registerFont(bold)
+        _registered = ReportFonts(FONT_NAME, BOLD_FONT_NAME, regular.face.filename, bold.face.filename)
+        return _registered
@@ -0,0 +1,100 @@
+"""Массовый импорт мероприятий из CSV или XLSX.
+
+Запуск: python import_events.py events.xlsx [--chunk-size 1000]
+
+Первая строка файла — заголовки. Поддерживаются русские заголовки
+(как в экспорте отчетов) и английские имена полей:
+Название/name, Категория/category, Место/location, Дата/date,
+Описание/description, Примечание/note. Избранное у каждого пользователя
+свое, поэтому колонка избранного из файла не импортируется.
+"""
+import argparse
+import csv
+import datetime
+import os
+import sys
+
+from db_utils import init_db, bulk_add_events
+
+HEADERS = {
+    'название': 'name',
+    'категория': 'category',
+    'место': 'location',
+    'дата': 'date',
+    'описание': 'description',
+    'примечание': 'note',
+}
+
+
+def _field(header):
+    header = str(header or '').strip().lower()
+    return HEADERS.get(header, header)
+
+
+def _cell(value):
+    """Значение ячейки XLSX в виде строки (даты — в формате ГГГГ-ММ-ДД)"""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def read_csv(path):
+    """Потоково читает строки CSV как словари с именами полей событий"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        fields = [_field(h) for h in next(reader, [])]
+        for values in reader:
+            yield dict(zip(fields, values))
+
+
+def read_xlsx(path):
+    """Потоково читает строки первого листа XLSX (режим read-only openpyxl)"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        fields = [_field(h) for h in next(rows, ())]
+        for values in rows:
+            yield dict(zip(fields, (_cell(v) for v in values)))
+    finally:
+        wb.close()
+
+
+def read_rows(path):
+    """Выбирает читатель по расширению файла"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return read_csv(path)
+    if ext in ('.xlsx', '.xlsm'):
+        return read_xlsx(path)
+    raise ValueError(f'Неподдерживаемый формат файла: {ext}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Массовый импорт мероприятий')
+    parser.add_argument('path', help='файл CSV или XLSX')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='строк в одной транзакции')
+    args = parser.parse_args()
+
+    init_db()
+    result = bulk_add_events(
+        read_rows(args.path), args.chunk_size,
+        progress=lambda n: print(f'Добавлено: {n}', file=sys.stderr))
+
+    for line, err in result.errors:
+        # строка 1 — заголовки, поэтому номер строки в файле на единицу больше
+        print(f'Строка {line + 1}: {err}')
+    print(f'Добавлено {result.inserted} мероприятий, ошибок: {len(result.errors)}, '
+          f'{result.elapsed:.2f} с ({result.rows_per_sec:,.0f} строк/с)')
+    return 1 if result.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,29 +1,28 @@
+import bisect
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox, Tk, Frame, Label, Entry, StringVar, BooleanVar, filedialog
 from db_utils import (
-    init_db, register_user, authenticate_user, get_categories, add_category, update_category, delete_category,
-    get_events, add_event, update_event, delete_event,
-    get_favorites, add_favorite, remove_favorite, get_connection
+    init_db, register_user, hash_password, check_login, update_password_hash, get_categories, add_category, update_category, delete_category,
+    add_event, update_event, delete_event,
+    get_favorites, add_favorite, remove_favorite, add_favorite_event, close_all_connections,
+    get_users, is_favorite, count_events, create_sample_events,
+    validate_event, get_events_page, event_page_key, subscribe, unsubscribe,
+    search_events, count_search_events, search_page_key, EventFilter, sort_report_rows, data_version,
+    REPORT_STATISTICS, SEARCH_LIMIT
 )
-import datetime
-from tkcalendar import DateEntry
-import pandas as pd
+from db_executor import DBExecutor
+from themes import ThemeEngine
+import exporters
+import reporting
 from tkinter import font
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from reportlab.lib.units import cm
-
-# регистрируем шрифт с поддержкой кириллицы
-try:
-    pdfmetrics.registerFont(TTFont('Arial', 'C:/Windows/Fonts/arial.ttf'))
-    pdfmetrics.registerFont(TTFont('Arial-Bold', 'C:/Windows/Fonts/arialbd.ttf'))
-except:
-    print("Не удалось зарегистрировать шрифт Arial. Будут использованы встроенные шрифты.")
+
+
+def warm_up_imports():
+    """Заранее загружает модули, нужные только экрану отчетов (календарь, reportlab,
+    openpyxl). Вызывается в фоновом потоке после показа первого экрана."""
+    import tkcalendar  # noqa: F401
+    exporters.warm_up()
 
 # основной класс приложения
 class EventDesignApp(tk.Tk):
@@ -33,91 +32,75 @@ class EventDesignApp(tk.Tk):
         self.geometry('1400x700')
         self.resizable(False, False)
         self.current_frame = None
+        # созданные экраны: скрываются и показываются снова вместо пересоздания
+        self.frames = {}
         self.current_user = None  # user_id, user_name
-        self.theme = 'dark'  # по умолчанию
-        self.style = ttk.Style(self)
-        self.apply_theme()
+        # стили обеих тем создаются один раз, по умолчанию тема темная
+        self.themes = ThemeEngine(self, 'dark')
+        self.style = self.themes.style
+        self.configure(bg=self.themes.palette.bg)
+        # индикатор фоновых запросов к базе
+        self.busy_label = tk.Label(self, text='', font=('Arial', 10), anchor='e',
+                                   bg=self.themes.palette.bg, fg=self.themes.palette.fg)
+        self.busy_label.pack(side='bottom', fill='x', padx=10)
+        self.themes.register(self.busy_label)
         init_db()  # инициализация базы при запуске
+        # все запросы экранов к базе идут через фоновые потоки
+        self.db = DBExecutor(self)
+        self.db.add_busy_listener(self.set_busy)
+        self.protocol('WM_DELETE_WINDOW', self.on_close)
         self.show_welcome()
+        # тяжелые модули отчетов загружаются в фоне, когда первый экран уже показан
+        self.after(300, lambda: threading.Thread(target=warm_up_imports, daemon=True).start())
 
-    def apply_theme(self):
-        if self.theme == 'dark':
-            bg = '#232323'
-            fg = 'white'
-            btn_bg = '#3399ff'
-            btn_fg = 'white'
-            btn_active = '#4da3ff'
-            entry_bg = '#232323'
-            entry_fg = 'white'
-            combo_bg = '#3399ff'
-            combo_fg = 'white'
-        else:
-            bg = 'white'
-            fg = 'black'
-            btn_bg = '#3399ff'
-            btn_fg = 'black'
-            btn_active = '#4da3ff'
-            entry_bg = 'white'
-            entry_fg = 'black'
-            combo_bg = 'white'
-            combo_fg = 'black'
-        self.configure(bg=bg)
-        self.style.theme_use('default')
-        
-        self.style.configure('TButton', background=btn_bg, foreground=btn_fg, font=('Arial', 12), padding=6)
-        
-        self.style.element_create('RoundedFrame', 'from', 'default')
-        self.style.layout('Rounded.TButton', [
-            ('Button.focus', {'children': [
-                ('Button.border', {'border': '2', 'sticky': 'nswe', 'children': [
-                    ('Button.padding', {'sticky': 'nswe', 'children': [
-                        ('Button.label', {'sticky': 'nswe'})
-                    ]})
-                ]})
-            ]}),
-        ])
-        self.style.configure('Rounded.TButton', background=btn_bg, foreground=btn_fg, font=('Arial', 12, 'bold'), 
-                           padding=6, borderwidth=2, relief="raised", bordercolor=btn_bg)
-        self.style.map('Rounded.TButton', background=[('active', btn_active), ('pressed', btn_active)],
-                     relief=[('pressed', 'raised')])
-        
-        self.style.configure('TEntry', fieldbackground=entry_bg, foreground=entry_fg, borderwidth=1, 
-                           relief="solid", padding=8)
-        
-        self.style.configure('Treeview', background=bg, fieldbackground=bg, foreground=fg)
-        self.style.configure('Treeview.Heading', background=btn_bg, foreground=btn_fg, font=('Arial', 11, 'bold'))
-        
-        self.style.configure('CustomCombobox.TCombobox', fieldbackground=combo_bg, background=combo_bg, 
-                           foreground=combo_fg, selectbackground=combo_bg, selectforeground=combo_fg, 
-                           bordercolor=btn_bg, lightcolor=btn_bg, darkcolor=btn_bg)
-        self.style.map('CustomCombobox.TCombobox', fieldbackground=[('readonly', combo_bg)], 
-                     foreground=[('readonly', combo_fg)])
-        
-        if self.current_frame:
-            self.current_frame.update_theme(bg, fg, btn_bg, btn_fg)
+    def set_busy(self, busy):
+        self.busy_label.config(text='Загрузка данных...' if busy else '')
+        self.config(cursor='watch' if busy else '')
+
+    def on_close(self):
+        self.db.shutdown()
+        self.destroy()
+
+    @property
+    def theme(self):
+        return self.themes.theme
 
     def set_theme(self, theme):
-        self.theme = theme
-        self.apply_theme()
+        """Переключает тему всех экранов; возвращает время переключения в мс"""
+        return self.themes.set_theme(theme)
 
-    def clear_frame(self):
-        if self.current_frame:
-            self.current_frame.destroy()
+    def show_frame(self, key, factory, cache=True):
+        """Показывает экран из реестра self.frames, создавая его при первом показе.
+
+        Экран, который уходит с показа, скрывается pack_forget (экраны не из реестра
+        уничтожаются); показанный экран перечитывает данные в on_show, только если
+        они менялись, пока он был скрыт.
+        """
+        frame = self.frames.get(key)
+        if frame is None or not frame.winfo_exists():
+            frame = factory()
+            self.themes.register(frame)
+            if cache:
+                self.frames[key] = frame
+        previous, self.current_frame = self.current_frame, frame
+        if previous is not None and previous is not frame:
+            previous.on_hide()
+            if previous in self.frames.values():
+                previous.pack_forget()
+            else:
+                previous.destroy()
+        frame.pack(expand=True)
+        frame.on_show()
+        return frame
 
     def show_welcome(self):
-        self.clear_frame()
-        self.current_frame = WelcomeFrame(self, self.show_register, self.show_login)
-        self.current_frame.pack(expand=True)
+        self.show_frame('welcome', lambda: WelcomeFrame(self, self.show_register, self.show_login), cache=False)
 
     def show_login(self):
-        self.clear_frame()
-        self.current_frame = LoginFrame(self, self.on_login_success, self.show_register)
-        self.current_frame.pack(expand=True)
+        self.show_frame('login', lambda: LoginFrame(self, self.on_login_success, self.show_register), cache=False)
 
     def show_register(self):
-        self.clear_frame()
-        self.current_frame = RegisterFrame(self, self.on_register_success)
-        self.current_frame.pack(expand=True)
+        self.show_frame('register', lambda: RegisterFrame(self, self.on_register_success), cache=False)
 
     def on_login_success(self, user):
         self.current_user = user
@@ -128,54 +111,356 @@ class EventDesignApp(tk.Tk):
         self.show_main_menu()
 
     def show_main_menu(self):
-        self.clear_frame()
-        self.current_frame = MainMenuFrame(self, self.show_events, self.show_categories, self.show_favorites, self.show_settings, self.show_reports)
-        self.current_frame.pack(expand=True)
+        self.show_frame('main_menu', lambda: MainMenuFrame(
+            self, self.show_events, self.show_categories, self.show_favorites, self.show_settings, self.show_reports))
 
     def show_events(self):
-        self.clear_frame()
-        self.current_frame = EventsFrame(self, self.show_main_menu)
-        self.current_frame.pack(expand=True)
+        self.show_frame('events', lambda: EventsFrame(self, self.show_main_menu))
 
     def show_categories(self):
-        self.clear_frame()
-        self.current_frame = CategoriesFrame(self, self.show_main_menu)
-        self.current_frame.pack(expand=True)
+        self.show_frame('categories', lambda: CategoriesFrame(self, self.show_main_menu))
 
     def show_favorites(self):
-        self.clear_frame()
-        self.current_frame = FavoritesFrame(self, self.show_main_menu, self.current_user)
-        self.current_frame.pack(expand=True)
+        # избранное у каждого пользователя свое
+        user = self.current_user
+        self.show_frame(('favorites', user[0] if user else None),
+                        lambda: FavoritesFrame(self, self.show_main_menu, user))
 
     def show_settings(self):
-        self.clear_frame()
-        self.current_frame = SettingsFrame(self, self.show_main_menu)
-        self.current_frame.pack(expand=True)
+        self.show_frame('settings', lambda: SettingsFrame(self, self.show_main_menu))
 
     def show_reports(self):
-        self.clear_frame()
-        self.current_frame = ReportsFrame(self, self.show_main_menu)
-        self.current_frame.pack(expand=True)
+        self.show_frame('reports', lambda: ReportsFrame(self, self.show_main_menu))
 
 class ThemedFrame(tk.Frame):
-    def update_theme(self, bg, fg, btn_bg, btn_fg):
-        self.configure(bg=bg)
-        for w in self.winfo_children():
-            if isinstance(w, (tk.Label, tk.Frame)):
-                w.configure(bg=bg, fg=fg if isinstance(w, tk.Label) else None)
-            if isinstance(w, ttk.Button):
-                w.configure(style='TButton')
-            if isinstance(w, ttk.Entry):
-                w.configure(style='TEntry')
-            if isinstance(w, ttk.Treeview):
-                w.configure(style='Treeview')
-            if isinstance(w, ttk.Combobox):
-                w.configure(foreground=fg)
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        # версия данных (db_utils.data_version), с которой экран показывает данные;
+        # None — экран пропустил изменения и перечитает данные при показе
+        self.seen_version = data_version()
+        self.visible = True
+
+    def on_show(self):
+        """Экран снова показан: перечитывает данные, если они менялись с прошлого показа"""
+        self.visible = True
+        version = data_version()
+        if self.seen_version != version:
+            self.seen_version = version
+            self.refresh()
+
+    def on_hide(self):
+        self.visible = False
+
+    def refresh(self):
+        """Перечитывает данные экрана из базы (экраны с данными переопределяют)"""
+
+    def listen(self, listener):
+        """Подписывает фрейм на изменения данных (db_utils.subscribe) до его уничтожения.
+        Изменения из фоновых потоков доставляются в главный поток Tk; скрытый экран
+        их не обрабатывает, а перечитывает данные при следующем показе"""
+        def deliver(change):
+            if not self.winfo_exists():
+                return
+            if not self.visible:
+                self.seen_version = None
+                return
+            listener(change)
+            self.seen_version = data_version()
+        wrapper = lambda change: self.master.db.call_in_ui(deliver, change)
+        subscribe(wrapper)
+        if not hasattr(self, '_listeners'):
+            self._listeners = []
+        self._listeners.append(wrapper)
+
+    def run_db(self, fn, *args, on_done=None, on_error=None, write=False):
+        """Выполняет вызов db_utils в фоне; обработчики вызываются, пока фрейм существует"""
+        if not hasattr(self, '_tasks'):
+            self._tasks = []
+        self._tasks = [t for t in self._tasks if not t.done]
+        task = self.master.db.submit(fn, *args, on_done=on_done, on_error=on_error, write=write)
+        self._tasks.append(task)
+        return task
+
+    def run_mutation(self, fn, *args, on_success=None, error='Ошибка'):
+        """Выполняет изменение данных в фоне и разбирает результат (ok, err) в главном потоке"""
+        def done(result):
+            ok, res = result
+            if ok:
+                if on_success:
+                    on_success(res)
+            else:
+                messagebox.showerror('Ошибка', res or error)
+        return self.run_db(fn, *args, on_done=done, write=True)
+
+    def destroy(self):
+        self.master.themes.unregister(self)
+        for listener in getattr(self, '_listeners', []):
+            unsubscribe(listener)
+        for task in getattr(self, '_tasks', []):
+            task.cancel()
+        super().destroy()
+
+class VirtualTable:
+    """Виртуальный режим Treeview для больших таблиц.
+
+    В дереве находятся только видимые строки. Вокруг них держится буфер с запасом
+    prefetch строк с каждой стороны: при прокрутке он дозагружается страницами
+    по ключу соседней строки и подрезается с дальней стороны, а при перетаскивании
+    ползунка перечитывается со смещения. Память и время перерисовки не зависят
+    от числа строк в таблице.
+
+    Все запросы к базе идут через run, поэтому прокрутка не ждет базу. Страница
+    запрашивается по одной; пришедшая после перезагрузки или изменения буфера
+    (другое поколение) отбрасывается, а пока идет перезагрузка, страницы не
+    запрашиваются.
+    """
+
+    def __init__(self, table, scrollbar, fetch_page, count, key, format_row, prefetch=50, run=None,
+                 on_reload=None):
+        self.table = table
+        self.scrollbar = scrollbar
+        self.fetch_page = fetch_page  # fetch_page(after=, before=, offset=, limit=)
+        self.count = count
+        self.key = key
+        self.format_row = format_row
+        self.visible = int(table['height'])
+        self.prefetch = prefetch
+        self.total = 0
+        self.top = 0  # индекс первой видимой строки
+        self.buffer = []  # строки с индексами [buffer_start, buffer_start + len(buffer))
+        self.buffer_start = 0
+        self.run = run  # run(fn, on_done, on_error) — выполнение в фоне
+        self.on_reload = on_reload  # on_reload(total) — после перезагрузки
+        self._loading = False
+        self._paging = False  # запрошена страница для буфера
+        self._stale = False
+        self._generation = 0  # поколение буфера: устаревшие результаты отбрасываются
+
+        scrollbar.configure(command=self.on_scrollbar)
+        table.bind('<MouseWheel>', self.on_wheel)
+        table.bind('<Button-4>', lambda e: self.scroll(-3))
+        table.bind('<Button-5>', lambda e: self.scroll(3))
+
+    def set_source(self, fetch_page, count, key):
+        """Переключает источник строк (например, на результаты поиска) и перечитывает с начала"""
+        self.fetch_page, self.count, self.key = fetch_page, count, key
+        self.top = 0
+        self.reload()
+
+    def reload(self):
+        """Перечитывает число строк и буфер вокруг текущей позиции (в фоне, если задан run)"""
+        top, size = self.top, self.visible + 2 * self.prefetch
+        fetch_page, count = self.fetch_page, self.count
+        self._generation += 1
+        generation = self._generation
+
+        def load():
+            total = count()
+            new_top = max(0, min(top, total - self.visible))
+            start = max(0, new_top - self.prefetch)
+            return total, new_top, start, list(fetch_page(offset=start, limit=size))
+
+        def done(result):
+            if generation != self._generation:
+                # пока шла загрузка, запущена более новая
+                return
+            self._loading = False
+            self.total, self.top, self.buffer_start, self.buffer = result
+            self.render()
+            if self.on_reload:
+                self.on_reload(self.total)
+            if self._stale:
+                # за время загрузки данные изменились — перечитываем еще раз
+                self._stale = False
+                self.reload()
+
+        def failed(error):
+            if generation == self._generation:
+                self._loading = False
+            raise error
+
+        if self.run is None:
+            done(load())
+        else:
+            self._loading = True
+            self.run(load, done, failed)
+
+    def _set_total(self, total):
+        self.total = total
+        self.top = max(0, min(self.top, total - self.visible))
+
+    def _request(self, page, on_rows):
+        """Запрашивает fetch_page(**page) в фоне и передает строки в on_rows, если буфер не сменился"""
+        fetch_page, generation = self.fetch_page, self._generation
+
+        def done(rows):
+            self._paging = False
+            if self._loading:
+                # окно заполнит перезагрузка
+                return
+            if generation == self._generation:
+                on_rows(rows)
+            self._ensure_window()
+            self.render()
+
+        def failed(error):
+            self._paging = False
+            raise error
+
+        self._paging = True
+        if self.run is None:
+            done(list(fetch_page(**page)))
+        else:
+            self.run(lambda: list(fetch_page(**page)), done, failed)
+
+    def _load_at(self, index):
+        start = max(0, index - self.prefetch)
+        size = self.visible + 2 * self.prefetch
+
+        def loaded(rows):
+            self.buffer, self.buffer_start = rows, start
+            if len(rows) < size:
+                # строк меньше, чем казалось: буфер доходит до конца таблицы
+                self._set_total(start + len(rows))
+
+        self._request(dict(offset=start, limit=size), loaded)
+
+    def _ensure_window(self):
+        """Запрашивает страницу, если видимое окно подошло к краю буфера"""
+        if self._loading or self._paging or self.top >= self.total:
+            return
+        end = self.buffer_start + len(self.buffer)
+        if self.top + self.visible <= self.buffer_start or self.top >= end:
+            # далекий переход (ползунок) — перечитываем со смещения
+            self._load_at(self.top)
+            return
+        max_len = self.visible + 3 * self.prefetch
+        if self.top + self.visible + self.prefetch > end and end < self.total:
+            def appended(rows):
+                self.buffer.extend(rows)
+                if len(rows) < self.prefetch:
+                    self._set_total(self.buffer_start + len(self.buffer))
+                trim = max(0, len(self.buffer) - max_len)
+                del self.buffer[:trim]
+                self.buffer_start += trim
+
+            self._request(dict(after=self.key(self.buffer[-1]), limit=self.prefetch), appended)
+        elif self.top - self.prefetch < self.buffer_start and self.buffer_start > 0:
+            def prepended(rows):
+                self.buffer[:0] = rows
+                self.buffer_start -= len(rows)
+                if len(rows) < self.prefetch and self.buffer_start > 0:
+                    # выше буфера строк меньше, чем казалось: он начинается с первой строки
+                    shift = self.buffer_start
+                    self.buffer_start = 0
+                    self.total -= shift
+                    self.top = max(0, self.top - shift)
+                del self.buffer[max_len:]
+
+            self._request(dict(before=self.key(self.buffer[0]), limit=self.prefetch), prepended)
+
+    def scroll(self, delta):
+        self.top = max(0, min(self.top + delta, self.total - self.visible))
+        self._ensure_window()
+        self.render()
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == 'moveto':
+            self.scroll(int(float(value) * self.total) - self.top)
+        elif unit == 'pages':
+            self.scroll(int(value) * self.visible)
+        else:
+            self.scroll(int(value))
+
+    def on_wheel(self, event):
+        if event.delta:
+            self.scroll(-3 if event.delta > 0 else 3)
+
+    def _buffer_index(self, row_id):
+        for i, row in enumerate(self.buffer):
+            if row[0] == row_id:
+                return i
+        return None
+
+    def _remove(self, row_id, old):
+        """Убирает строку из буфера с учетом сдвига позиций"""
+        i = self._buffer_index(row_id)
+        if i is not None:
+            del self.buffer[i]
+            if self.buffer_start + i < self.top:
+                self.top -= 1
+        elif old is not None and self.buffer and self.key(old) < self.key(self.buffer[0]):
+            # строка была выше буфера: все позиции сдвигаются на одну вверх
+            self.buffer_start -= 1
+            self.top -= 1
+        self.total -= 1
+
+    def _insert(self, row):
+        """Вставляет строку в буфер на ее место по ключу"""
+        self.total += 1
+        key = self.key(row)
+        keys = [self.key(r) for r in self.buffer]
+        end = self.buffer_start + len(self.buffer)
+        if not keys or key > keys[-1]:
+            # после буфера: добавляем, только если буфер доходит до конца таблицы
+            if end == self.total - 1:
+                self.buffer.append(row)
+            return
+        if key < keys[0] and self.buffer_start > 0:
+            # выше буфера: все позиции сдвигаются на одну вниз
+            self.buffer_start += 1
+            self.top += 1
+            return
+        i = bisect.bisect_left(keys, key)
+        self.buffer.insert(i, row)
+        if self.buffer_start + i < self.top:
+            self.top += 1
+
+    def apply(self, action, row_id, row=None, old=None):
+        """Применяет изменение одной строки без перечитывания таблицы.
+
+        Если строка осталась на месте, обновляется только ее элемент в дереве;
+        иначе перерисовываются видимые строки (их число не зависит от размера таблицы).
+        """
+        if self._loading:
+            # буфер еще загружается: изменение учтется повторной загрузкой
+            self._stale = True
+            return
+        # запрошенная раньше страница не учитывает это изменение
+        self._generation += 1
+        i = self._buffer_index(row_id)
+        if action == 'update' and i is not None and self.key(self.buffer[i]) == self.key(row):
+            self.buffer[i] = row
+            if self.table.exists(str(row_id)):
+                self.table.item(str(row_id), values=self.format_row(row))
+            return
+        if action == 'update' and i is None and (old is None or self.key(old) == self.key(row)):
+            # строка вне буфера и ее позиция не изменилась
+            return
+        if action in ('update', 'delete'):
+            self._remove(row_id, old)
+        if action in ('update', 'insert') and row is not None:
+            self._insert(row)
+        self.top = max(0, min(self.top, self.total - self.visible))
+        self._ensure_window()
+        self.render()
+
+    def render(self):
+        """Перерисовывает только видимые строки"""
+        self.table.delete(*self.table.get_children())
+        # строки окна, которых еще нет в буфере, появятся, когда придет страница
+        offset = self.top - self.buffer_start
+        for row in self.buffer[max(0, offset):max(0, offset + self.visible)]:
+            self.table.insert('', 'end', iid=str(row[0]), values=self.format_row(row))
+        if self.total:
+            self.scrollbar.set(self.top / self.total, min(1.0, (self.top + self.visible) / self.total))
+        else:
+            self.scrollbar.set(0, 1)
 
 class WelcomeFrame(ThemedFrame):
     def __init__(self, master, on_register, on_login):
         super().__init__(master, bg=master['bg'])
-        tk.Label(self, text='\uD83D\uDCC5 EventDesign', font=('Arial', 22), fg=master.style.lookup('TButton', 'foreground'), bg=master['bg']).pack(pady=20)
+        tk.Label(self, text='\uD83D\uDCC5 EventDesign', font=('Arial', 22), fg=master.themes.palette.fg, bg=master['bg']).pack(pady=20)
         btn_width = 25
         welcome_container = tk.Frame(self, bg=master['bg'], padx=20, pady=20)
         welcome_container.pack()
@@ -186,13 +471,11 @@ class WelcomeFrame(ThemedFrame):
         
         ttk.Button(form, text='Зарегистрироваться', command=on_register, width=btn_width, style='Rounded.TButton').pack(pady=15, ipady=8)
         ttk.Button(form, text='Авторизация', command=on_login, width=btn_width, style='Rounded.TButton').pack(pady=15, ipady=8)
-    def update_theme(self, bg, fg, btn_bg, btn_fg):
-        super().update_theme(bg, fg, btn_bg, btn_fg)
 
 class LoginFrame(ThemedFrame):
     def __init__(self, master, on_login_success, on_register):
         super().__init__(master, bg=master['bg'])
-        tk.Label(self, text='Авторизация', font=('Arial', 20), fg=master.style.lookup('TButton', 'foreground'), bg=master['bg']).pack(pady=20)
+        tk.Label(self, text='Авторизация', font=('Arial', 20), fg=master.themes.palette.fg, bg=master['bg']).pack(pady=20)
         
         form_container = tk.Frame(self, bg=master['bg'], padx=20, pady=20)
         form_container.pack(pady=10)
@@ -201,12 +484,12 @@ class LoginFrame(ThemedFrame):
                        highlightthickness=0, bd=0, padx=20, pady=20)
         form.pack()
         
-        tk.Label(form, text='Логин', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(form, text='Логин', fg=master.themes.palette.fg, 
                 bg=master['bg'], anchor='w', font=('Arial', 12)).pack(anchor='w', pady=(0, 5))
         self.login_entry = ttk.Entry(form, style='TEntry', width=40, font=('Arial', 12))
         self.login_entry.pack(pady=(0, 15), ipady=5)
         
-        tk.Label(form, text='Пароль', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(form, text='Пароль', fg=master.themes.palette.fg, 
                 bg=master['bg'], anchor='w', font=('Arial', 12)).pack(anchor='w', pady=(0, 5))
         self.password_entry = ttk.Entry(form, show='*', style='TEntry', width=40, font=('Arial', 12))
         self.password_entry.pack(pady=(0, 20), ipady=5)
@@ -217,7 +500,7 @@ class LoginFrame(ThemedFrame):
         # ссылка на регистрацию
         link_frame = tk.Frame(form, bg=master['bg'])
         link_frame.pack(pady=10)
-        tk.Label(link_frame, text='Нет аккаунта?', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(link_frame, text='Нет аккаунта?', fg=master.themes.palette.fg, 
                 bg=master['bg'], font=('Arial', 11)).pack(side='left')
         reg_link = tk.Label(link_frame, text='Зарегистрироваться', fg='#4da3ff', bg=master['bg'], 
                            cursor='hand2', font=('Arial', 11, 'underline'))
@@ -238,17 +521,23 @@ class LoginFrame(ThemedFrame):
             messagebox.showerror('Ошибка', 'Поле пароля не может быть пустым')
             return
         
-        user = authenticate_user(login, password)
-        if user:
-            messagebox.showinfo('Успех', f'Добро пожаловать, {user[1]}!')
-            self.on_login_success(user)
-        else:
-            messagebox.showerror('Ошибка', 'Неверный логин или пароль')
+        def logged_in(check):
+            if check.rehash:
+                # пересчитанный хеш пишется отдельной задачей записи; вход от нее не зависит
+                self.run_db(update_password_hash, *check.rehash, write=True)
+            user = check.user
+            if user:
+                messagebox.showinfo('Успех', f'Добро пожаловать, {user[1]}!')
+                self.on_login_success(user)
+            else:
+                messagebox.showerror('Ошибка', 'Неверный логин или пароль')
+
+        self.run_db(check_login, login, password, on_done=logged_in)
 
 class RegisterFrame(ThemedFrame):
     def __init__(self, master, on_register_success):
         super().__init__(master, bg=master['bg'])
-        tk.Label(self, text='Регистрация', font=('Arial', 20), fg=master.style.lookup('TButton', 'foreground'), bg=master['bg']).pack(pady=20)
+        tk.Label(self, text='Регистрация', font=('Arial', 20), fg=master.themes.palette.fg, bg=master['bg']).pack(pady=20)
         
         form_container = tk.Frame(self, bg=master['bg'], padx=20, pady=20)
         form_container.pack(pady=10)
@@ -262,7 +551,7 @@ class RegisterFrame(ThemedFrame):
         labels = ['Почта', 'Имя', 'Логин', 'Пароль']
         
         for label in labels:
-            tk.Label(form, text=label, fg=master.style.lookup('TButton', 'foreground'), 
+            tk.Label(form, text=label, fg=master.themes.palette.fg, 
                     bg=master['bg'], anchor='w', font=('Arial', 12)).pack(anchor='w', pady=(0, 5))
             entry = ttk.Entry(form, show='*' if label == 'Пароль' else None, 
                              style='TEntry', width=40, font=('Arial', 12))
@@ -277,7 +566,7 @@ class RegisterFrame(ThemedFrame):
         # ссылка на вход
         link_frame = tk.Frame(form, bg=master['bg'])
         link_frame.pack(pady=10)
-        tk.Label(link_frame, text='Есть аккаунт?', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(link_frame, text='Есть аккаунт?', fg=master.themes.palette.fg, 
                 bg=master['bg'], font=('Arial', 11)).pack(side='left')
         login_link = tk.Label(link_frame, text='Войти', fg='#4da3ff', bg=master['bg'], 
                              cursor='hand2', font=('Arial', 11, 'underline'))
@@ -319,19 +608,22 @@ class RegisterFrame(ThemedFrame):
             return
         
         # Если все проверки пройдены, регистрируем пользователя
-        ok, err = register_user(name, login, password, email)
-        if ok:
-            # Получаем user_id для нового пользователя
-            user = authenticate_user(login, password)
+        def registered(user):
             messagebox.showinfo('Успех', 'Регистрация прошла успешно!')
             self.on_register_success(user)
-        else:
-            messagebox.showerror('Ошибка', err or 'Ошибка регистрации')
+
+        # хеш считается в потоке чтения, чтобы не занимать поток записи;
+        # register_user сразу возвращает (user_id, user_name) нового пользователя
+        def hashed(hashed_password):
+            self.run_mutation(register_user, name, login, password, email, hashed_password,
+                              on_success=registered, error='Ошибка регистрации')
+
+        self.run_db(hash_password, password, on_done=hashed)
 
 class MainMenuFrame(ThemedFrame):
     def __init__(self, master, on_events, on_categories, on_favorites, on_settings, on_reports):
         super().__init__(master, bg=master['bg'])
-        tk.Label(self, text='\uD83D\uDCC5 EventDesign', font=('Arial', 22), fg=master.style.lookup('TButton', 'foreground'), bg=master['bg']).pack(pady=20)
+        tk.Label(self, text='\uD83D\uDCC5 EventDesign', font=('Arial', 22), fg=master.themes.palette.fg, bg=master['bg']).pack(pady=20)
         
         menu_container = tk.Frame(self, bg=master['bg'], padx=20, pady=10)
         menu_container.pack()
@@ -364,20 +656,50 @@ class EventsFrame(ThemedFrame):
         )
     
         back_btn.pack(side='bottom', pady=20, ipady=5)
-        tk.Label(self, text='Мероприятия', font=('Arial', 20), fg=master.style.lookup('TButton', 'foreground'), bg=master['bg']).pack(pady=10)
+        tk.Label(self, text='Мероприятия', font=('Arial', 20), fg=master.themes.palette.fg, bg=master['bg']).pack(pady=10)
+
+        # поиск по мере ввода: запрос к полнотекстовому индексу после паузы в наборе
+        search_frame = tk.Frame(self, bg=master['bg'])
+        search_frame.pack(pady=5, padx=10, fill='x')
+        tk.Label(search_frame, text='Поиск:', fg=master.themes.palette.fg, bg=master['bg']).pack(side='left', padx=4)
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=50, style='TEntry')
+        self.search_entry.pack(side='left', padx=4)
+        self.search_text = ''
+        self._search_after = None
+        self.search_var.trace_add('write', lambda *args: self.schedule_search())
+        # фильтры применяются в SQL: в таблицу попадают только подходящие события
+        tk.Label(search_frame, text='Категория:', fg=master.themes.palette.fg, bg=master['bg']).pack(side='left', padx=4)
+        self.filter_cat_var = tk.StringVar(value='Все')
+        self.filter_cat_combo = ttk.Combobox(search_frame, textvariable=self.filter_cat_var, values=['Все'], width=20,
+                                             state='readonly', style='CustomCombobox.TCombobox')
+        self.filter_cat_combo.pack(side='left', padx=4)
+        self.filter_cat_combo.bind('<<ComboboxSelected>>', lambda e: self.apply_filter())
+        self.only_fav_var = tk.BooleanVar()
+        ttk.Checkbutton(search_frame, text='Только избранные', variable=self.only_fav_var,
+                        command=self.apply_filter).pack(side='left', padx=4)
+        self.criteria = EventFilter()
+        # сообщение о том, что результатов поиска слишком много для сортировки по релевантности
+        self.search_note = tk.Label(self, text='', fg=master.themes.palette.fg, bg=master['bg'])
+        self.search_note.pack(padx=10, anchor='w')
         
         table_frame = tk.Frame(self, bg=master['bg'], highlightthickness=0, bd=0)
         table_frame.pack(pady=5, padx=10, fill='both', expand=True)
         
         columns = ('id', 'name', 'category', 'location', 'date', 'desc', 'favorite')
         self.table = ttk.Treeview(table_frame, columns=columns, show='headings', height=10) 
-        for col, text in zip(columns, ['ID', 'Название', 'Категория', 'Место', 'Дата', 'Описание', 'Избранное']):
+        for col, text in zip(columns, ['ID', 'Название', 'Категория', 'Место', 'Дата', 'Описание', 'В избранном']):
             self.table.heading(col, text=text)
             self.table.column(col, width=170 if col != 'id' else 40, anchor='center')
 
-        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.table.yview)
-        self.table.configure(yscrollcommand=scrollbar.set)
+        # таблица работает в виртуальном режиме: в дереве только видимые строки
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical")
         scrollbar.pack(side='right', fill='y')
+        self.virtual = VirtualTable(
+            self.table, scrollbar, get_events_page, count_events, event_page_key,
+            lambda ev: (ev[0], ev[1], ev[2], ev[3], ev[4], ev[5], ev[6] or ''),
+            run=lambda fn, on_done, on_error: self.run_db(fn, on_done=on_done, on_error=on_error),
+            on_reload=self.show_search_note)
         
         self.table.pack(fill='both', expand=True)
         self.refresh_table()
@@ -388,33 +710,35 @@ class EventsFrame(ThemedFrame):
         form_frame = tk.Frame(form_outer, bg=master['bg'], highlightthickness=0, bd=0)
         form_frame.pack(pady=0, padx=0)
         # название
-        tk.Label(form_frame, text='Название:', fg=master.style.lookup('TButton', 'foreground'), bg=master['bg'], anchor='e').grid(row=0, column=0, sticky='e', pady=6, padx=4)
+        tk.Label(form_frame, text='Название:', fg=master.themes.palette.fg, bg=master['bg'], anchor='e').grid(row=0, column=0, sticky='e', pady=6, padx=4)
         self.name_entry = ttk.Entry(form_frame, width=25, style='TEntry')
         self.name_entry.grid(row=0, column=1, sticky='w', pady=6, padx=4)
         # категория
-        tk.Label(form_frame, text='Категория:', fg=master.style.lookup('TButton', 'foreground'), bg=master['bg'], anchor='e').grid(row=0, column=2, sticky='e', pady=6, padx=4)
+        tk.Label(form_frame, text='Категория:', fg=master.themes.palette.fg, bg=master['bg'], anchor='e').grid(row=0, column=2, sticky='e', pady=6, padx=4)
         self.cat_var = tk.StringVar()
         self.cat_combo = ttk.Combobox(form_frame, textvariable=self.cat_var, width=23, state='readonly', style='CustomCombobox.TCombobox')
         self.cat_combo.grid(row=0, column=3, sticky='w', pady=6, padx=4)
         self.refresh_categories()
         # место
-        tk.Label(form_frame, text='Место:', fg=master.style.lookup('TButton', 'foreground'), bg=master['bg'], anchor='e').grid(row=1, column=0, sticky='e', pady=6, padx=4)
+        tk.Label(form_frame, text='Место:', fg=master.themes.palette.fg, bg=master['bg'], anchor='e').grid(row=1, column=0, sticky='e', pady=6, padx=4)
         self.loc_entry = ttk.Entry(form_frame, width=25, style='TEntry')
         self.loc_entry.grid(row=1, column=1, sticky='w', pady=6, padx=4)
         # дата
-        tk.Label(form_frame, text='Дата (ГГГГ-ММ-ДД):', fg=master.style.lookup('TButton', 'foreground'), bg=master['bg'], anchor='e').grid(row=1, column=2, sticky='e', pady=6, padx=4)
+        tk.Label(form_frame, text='Дата (ГГГГ-ММ-ДД):', fg=master.themes.palette.fg, bg=master['bg'], anchor='e').grid(row=1, column=2, sticky='e', pady=6, padx=4)
         self.date_entry = ttk.Entry(form_frame, width=23, style='TEntry')
         self.date_entry.grid(row=1, column=3, sticky='w', pady=6, padx=4)
         # описание
-        tk.Label(form_frame, text='Описание:', fg=master.style.lookup('TButton', 'foreground'), bg=master['bg'], anchor='e').grid(row=2, column=0, sticky='e', pady=6, padx=4)
+        tk.Label(form_frame, text='Описание:', fg=master.themes.palette.fg, bg=master['bg'], anchor='e').grid(row=2, column=0, sticky='e', pady=6, padx=4)
         self.desc_entry = ttk.Entry(form_frame, width=60, style='TEntry')
         self.desc_entry.grid(row=2, column=1, columnspan=3, sticky='w', pady=6, padx=4)
         # примечание
-        tk.Label(form_frame, text='Примечание:', fg=master.style.lookup('TButton', 'foreground'), bg=master['bg'], anchor='e').grid(row=3, column=0, sticky='e', pady=6, padx=4)
+        tk.Label(form_frame, text='Примечание:', fg=master.themes.palette.fg, bg=master['bg'], anchor='e').grid(row=3, column=0, sticky='e', pady=6, padx=4)
         self.note_entry = ttk.Entry(form_frame, width=60, style='TEntry')
         self.note_entry.grid(row=3, column=1, columnspan=3, sticky='w', pady=6, padx=4)
         # чекбокс избранное
         self.favorite_var = tk.BooleanVar()
+        # избранное выбранного события по данным базы; None — еще не загружено
+        self.favorite_loaded = None
         fav_frame = tk.Frame(form_frame, bg=master['bg'])
         fav_frame.grid(row=4, column=0, columnspan=4, pady=8)
         self.favorite_check = ttk.Checkbutton(fav_frame, text='Добавить в избранное', variable=self.favorite_var)
@@ -445,19 +769,100 @@ class EventsFrame(ThemedFrame):
         
         self.table.bind('<<TreeviewSelect>>', self.on_select)
         self.selected_id = None
+        self.listen(self.on_data_change)
+
+    def refresh(self):
+        self.refresh_categories()
+        self.refresh_table()
 
     def refresh_categories(self):
-        cats = get_categories()
+        self.cat_map = {}
+        self.run_db(get_categories, on_done=self.fill_categories)
+
+    def fill_categories(self, cats):
         self.cat_combo['values'] = ['Все'] + [c[1] for c in cats]
         self.cat_map = {c[1]: c[0] for c in cats}
         self.cat_combo.current(0)
+        # фильтр хранит id категории: после переименования показываем новое название,
+        # после удаления сбрасываем фильтр
+        names = {c[0]: c[1] for c in cats}
+        self.filter_cat_combo['values'] = ['Все'] + [c[1] for c in cats]
+        self.filter_cat_var.set(names.get(self.criteria.category_id, 'Все'))
+        self.apply_filter()
 
     def refresh_table(self):
-        for row in self.table.get_children():
-            self.table.delete(row)
-        for ev in get_events():
-            # Первый элемент (ev[0]) - это ID мероприятия
-            self.table.insert('', 'end', values=(ev[0], ev[1], ev[2], ev[3], ev[4], ev[5], '✔' if ev[6] else ''))
+        self.virtual.reload()
+
+    SEARCH_DELAY_MS = 300
+
+    def schedule_search(self):
+        """Откладывает поиск, пока пользователь продолжает набирать текст"""
+        if self._search_after is not None:
+            self.after_cancel(self._search_after)
+        self._search_after = self.after(self.SEARCH_DELAY_MS, self.apply_filter)
+
+    def apply_filter(self):
+        """Переключает таблицу на события, подходящие под поиск и фильтры"""
+        if self._search_after is not None:
+            self.after_cancel(self._search_after)
+            self._search_after = None
+        text = self.search_var.get().strip()
+        criteria = EventFilter(category_id=self.cat_map.get(self.filter_cat_var.get()))
+        if self.only_fav_var.get():
+            # избранное текущего пользователя, без входа — события в чьем-либо избранном
+            user = self.master.current_user
+            criteria = criteria._replace(user_id=user[0]) if user else criteria._replace(favorite=True)
+        if text == self.search_text and criteria == self.criteria:
+            return
+        self.search_text, self.criteria = text, criteria
+        if text:
+            self.virtual.set_source(
+                lambda **page: search_events(text, criteria=criteria, **page),
+                lambda: count_search_events(text, criteria), search_page_key)
+        else:
+            self.virtual.set_source(
+                lambda **page: get_events_page(criteria=criteria, **page),
+                lambda: count_events(criteria), event_page_key)
+
+    def show_search_note(self, total):
+        if self.search_text and total > SEARCH_LIMIT:
+            self.search_note.config(text=f'Найдено событий: {total}. Их больше {SEARCH_LIMIT}, поэтому они '
+                                         'показаны в порядке добавления, а не по релевантности')
+        else:
+            self.search_note.config(text='')
+
+    def destroy(self):
+        if self._search_after is not None:
+            self.after_cancel(self._search_after)
+        super().destroy()
+
+    def on_data_change(self, change):
+        # строки таблицы обновляются точечно по event_id
+        if change.table == 'Events' and (self.search_text or self.criteria != EventFilter()):
+            # измененная строка может перестать подходить под фильтр, а позиция
+            # в результатах поиска зависит от ранга — перечитываем окно
+            self.refresh_table()
+        elif change.table == 'Events':
+            if change.action == 'reload':
+                self.refresh_table()
+            else:
+                self.virtual.apply(change.action, change.key, change.row, change.old)
+        elif change.table == 'Favorites' and change.row is not None:
+            # изменилось число пользователей, добавивших событие в избранное; при
+            # фильтре по избранному меняется и состав строк, а у результатов поиска
+            # строки другого вида (с рангом), поэтому окно перечитывается
+            if self.search_text or self.criteria.favorite is not None or self.criteria.user_id is not None:
+                self.refresh_table()
+            else:
+                self.virtual.apply('update', change.key[1], change.row, change.row)
+            user = self.master.current_user
+            if user and change.key == (user[0], self.selected_id):
+                self.show_favorite(self.selected_id, change.action == 'insert')
+        elif change.table == 'Categories':
+            self.refresh_categories()
+            # переименование или удаление категории меняет колонку "Категория"
+            if change.action != 'insert':
+                self.refresh_table()
 
     def on_select(self, event):
         sel = self.table.selection()
@@ -476,7 +881,24 @@ class EventsFrame(ThemedFrame):
             self.date_entry.insert(0, vals[4])  # Дата теперь в пятом элементе
             self.desc_entry.delete(0, tk.END)
             self.desc_entry.insert(0, vals[5])  # Описание теперь в шестом элементе
-            self.favorite_var.set(vals[6] == '✔')  # Избранное теперь в седьмом элементе
+            # избранное у каждого пользователя свое: проверяем по таблице Favorites;
+            # пока ответа нет, флажок недоступен, а сохранение избранное не трогает
+            self.favorite_var.set(False)
+            self.favorite_loaded = None
+            user = self.master.current_user
+            if user:
+                self.favorite_check.state(['disabled'])
+                event_id = self.selected_id
+                self.run_db(is_favorite, user[0], event_id,
+                            on_done=lambda favorite: self.show_favorite(event_id, favorite))
+
+    def show_favorite(self, event_id, favorite):
+        """Показывает избранное события, если оно все еще выбрано"""
+        if event_id != self.selected_id:
+            return
+        self.favorite_loaded = favorite
+        self.favorite_var.set(favorite)
+        self.favorite_check.state(['!disabled'])
 
     def add_event(self):
         name = self.name_entry.get().strip()
@@ -487,26 +909,10 @@ class EventsFrame(ThemedFrame):
         note = self.note_entry.get().strip()
         favorite = self.favorite_var.get()
         
-        # базовая валидация на пустые поля
-        if not (name and cat and date):
-            messagebox.showerror('Ошибка', 'Название, категория и дата обязательны!')
-            return
-            
-        # валидация названия (не менее 3 символов)
-        if len(name) < 3:
-            messagebox.showerror('Ошибка', 'Название мероприятия должно содержать минимум 3 символа')
-            return
-            
-        # валидация места проведения (не пустое и минимум 3 символа)
-        if not loc or len(loc) < 3:
-            messagebox.showerror('Ошибка', 'Укажите место проведения (минимум 3 символа)')
-            return
-        
-        # валидация даты (формат ГГГГ-ММ-ДД)
-        try:
-            datetime.datetime.strptime(date, '%Y-%m-%d')
-        except ValueError:
-            messagebox.showerror('Ошибка', 'Неверный формат даты. Используйте формат ГГГГ-ММ-ДД (например, 2023-05-15)')
+        # валидация полей (те же правила, что и при массовом импорте)
+        err = validate_event(name, cat, date, loc)
+        if err:
+            messagebox.showerror('Ошибка', err)
             return
             
         cat_id = self.cat_map.get(cat)
@@ -514,23 +920,13 @@ class EventsFrame(ThemedFrame):
             messagebox.showerror('Ошибка', 'Выберите корректную категорию!')
             return
         
-        ok, err = add_event(name, cat_id, date, loc, desc, note, favorite)
-        if ok:
-            self.refresh_table()
-            # если мероприятие добавлено в избранное и пользователь авторизован
-            if favorite and self.master.current_user:
-                # получаем id последнего добавленного мероприятия
-                conn = get_connection()
-                cursor = conn.cursor()
-                cursor.execute('SELECT LAST_INSERT_ID()')
-                event_id = cursor.fetchone()[0]
-                cursor.close()
-                conn.close()
-                # добавляем в избранное для текущего пользователя
-                add_favorite(self.master.current_user[0], event_id)
-            self.clear_form()
+        # избранное для текущего пользователя создается в той же транзакции, что и мероприятие
+        if favorite and self.master.current_user:
+            self.run_mutation(add_favorite_event, self.master.current_user[0], name, cat_id, date, loc, desc, note,
+                              on_success=lambda event_id: self.clear_form(), error='Ошибка добавления')
         else:
-            messagebox.showerror('Ошибка', err or 'Ошибка добавления')
+            self.run_mutation(add_event, name, cat_id, date, loc, desc, note,
+                              on_success=lambda event_id: self.clear_form(), error='Ошибка добавления')
 
     def edit_event(self):
         if not self.selected_id:
@@ -545,26 +941,10 @@ class EventsFrame(ThemedFrame):
         note = self.note_entry.get().strip()
         favorite = self.favorite_var.get()
         
-        # базовая валидация на пустые поля
-        if not (name and cat and date):
-            messagebox.showerror('Ошибка', 'Название, категория и дата обязательны!')
-            return
-            
-        # валидация названия (не менее 3 символов)
-        if len(name) < 3:
-            messagebox.showerror('Ошибка', 'Название мероприятия должно содержать минимум 3 символа')
-            return
-            
-        # валидация места проведения (не пустое и минимум 3 символа)
-        if not loc or len(loc) < 3:
-            messagebox.showerror('Ошибка', 'Укажите место проведения (минимум 3 символа)')
-            return
-        
-        # валидация даты (формат ГГГГ-ММ-ДД)
-        try:
-            datetime.datetime.strptime(date, '%Y-%m-%d')
-        except ValueError:
-            messagebox.showerror('Ошибка', 'Неверный формат даты. Используйте формат ГГГГ-ММ-ДД (например, 2023-05-15)')
+        # валидация полей (те же правила, что и при массовом импорте)
+        err = validate_event(name, cat, date, loc)
+        if err:
+            messagebox.showerror('Ошибка', err)
             return
             
         cat_id = self.cat_map.get(cat)
@@ -572,31 +952,33 @@ class EventsFrame(ThemedFrame):
             messagebox.showerror('Ошибка', 'Выберите корректную категорию!')
             return
             
-        ok, err = update_event(self.selected_id, name, cat_id, date, loc, desc, note, favorite)
-        if ok:
-            # если установлен флаг избранное и пользователь авторизован
-            if favorite and self.master.current_user:
-                # добавляем в избранное для текущего пользователя
-                add_favorite(self.master.current_user[0], self.selected_id)
-            # если флаг избранное снят и пользователь авторизован
-            elif not favorite and self.master.current_user:
-                # удаляем из избранного для текущего пользователя
-                remove_favorite(self.master.current_user[0], self.selected_id)
-            self.refresh_table()
-        else:
-            messagebox.showerror('Ошибка', err or 'Ошибка редактирования')
+        event_id = self.selected_id
+        user = self.master.current_user
+        # избранное меняется, только если пользователь переключил загруженный флажок
+        loaded = self.favorite_loaded
+
+        def save():
+            ok, err = update_event(event_id, name, cat_id, date, loc, desc, note)
+            if ok and user and loaded is not None and favorite != loaded:
+                if favorite:
+                    # добавляем в избранное для текущего пользователя
+                    add_favorite(user[0], event_id)
+                else:
+                    # удаляем из избранного для текущего пользователя
+                    remove_favorite(user[0], event_id)
+            return ok, err
+
+        self.run_mutation(save, error='Ошибка редактирования')
 
     def delete_event(self):
         if not self.selected_id:
             messagebox.showerror('Ошибка', 'Выберите мероприятие для удаления')
             return
-        ok, err = delete_event(self.selected_id)
-        if ok:
-            self.refresh_table()
+        def deleted(_):
             self.clear_form()
             self.selected_id = None
-        else:
-            messagebox.showerror('Ошибка', err or 'Ошибка удаления')
+
+        self.run_mutation(delete_event, self.selected_id, on_success=deleted, error='Ошибка удаления')
 
     def add_to_favorites(self):
         if not self.selected_id:
@@ -609,21 +991,10 @@ class EventsFrame(ThemedFrame):
         
         # добавляем мероприятие в избранное
         user_id = self.master.current_user[0]
-        
-        # Также обновляем флаг favorite в таблице Events
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute('UPDATE Events SET favorite = 1 WHERE event_id = %s', (self.selected_id,))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        ok, err = add_favorite(user_id, self.selected_id)
-        if ok:
-            messagebox.showinfo('Успех', 'Мероприятие добавлено в избранное')
-            self.refresh_table()
-        else:
-            messagebox.showerror('Ошибка', err or 'Ошибка при добавлении в избранное')
+        event_id = self.selected_id
+
+        self.run_mutation(add_favorite, user_id, event_id, on_success=lambda _: messagebox.showinfo('Успех', 'Мероприятие добавлено в избранное'),
+                          error='Ошибка при добавлении в избранное')
 
     def clear_form(self):
         self.name_entry.delete(0, tk.END)
@@ -632,6 +1003,8 @@ class EventsFrame(ThemedFrame):
         self.desc_entry.delete(0, tk.END)
         self.note_entry.delete(0, tk.END)
         self.favorite_var.set(False)
+        self.favorite_loaded = None
+        self.favorite_check.state(['!disabled'])
         self.cat_combo.set('')
 
 class CategoriesFrame(ThemedFrame):
@@ -650,7 +1023,7 @@ class CategoriesFrame(ThemedFrame):
         # Размещаем кнопку внизу
         back_btn.pack(side='bottom', pady=20, ipady=5)
         
-        tk.Label(self, text='Категории', font=('Arial', 20), fg=master.style.lookup('TButton', 'foreground'), bg=master['bg']).pack(pady=10)
+        tk.Label(self, text='Категории', font=('Arial', 20), fg=master.themes.palette.fg, bg=master['bg']).pack(pady=10)
         
         # Создаем рамку для таблицы с заметной обводкой
         table_frame = tk.Frame(self, bg=master['bg'], highlightthickness=0, bd=0)
@@ -681,12 +1054,12 @@ class CategoriesFrame(ThemedFrame):
         form.pack()
         
         # Поля ввода с улучшенным стилем
-        tk.Label(form, text='Название:', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(form, text='Название:', fg=master.themes.palette.fg, 
                bg=master['bg'], font=('Arial', 12)).grid(row=0, column=0, sticky='e', padx=10, pady=10)
         self.name_entry = ttk.Entry(form, width=25, style='TEntry', font=('Arial', 12))
         self.name_entry.grid(row=0, column=1, padx=10, pady=10, ipady=5)
         
-        tk.Label(form, text='Описание:', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(form, text='Описание:', fg=master.themes.palette.fg, 
                bg=master['bg'], font=('Arial', 12)).grid(row=1, column=0, sticky='e', padx=10, pady=10)
         self.desc_entry = ttk.Entry(form, width=25, style='TEntry', font=('Arial', 12))
         self.desc_entry.grid(row=1, column=1, padx=10, pady=10, ipady=5)
@@ -707,12 +1080,33 @@ class CategoriesFrame(ThemedFrame):
 
         self.table.bind('<<TreeviewSelect>>', self.on_select)
         self.selected_id = None
+        self.listen(self.on_data_change)
+
+    def refresh(self):
+        self.refresh_table()
 
     def refresh_table(self):
+        self.run_db(get_categories, on_done=self.fill_table)
+
+    def fill_table(self, categories):
         for row in self.table.get_children():
             self.table.delete(row)
-        for cat in get_categories():
-            self.table.insert('', 'end', values=cat)
+        for cat in categories:
+            self.table.insert('', 'end', iid=str(cat[0]), values=cat)
+
+    def on_data_change(self, change):
+        # строки таблицы обновляются точечно по category_id
+        if change.table != 'Categories':
+            return
+        iid = str(change.key)
+        if change.action == 'insert':
+            self.table.insert('', 'end', iid=iid, values=change.row)
+        elif change.action == 'update' and self.table.exists(iid):
+            self.table.item(iid, values=change.row)
+        elif change.action == 'delete' and self.table.exists(iid):
+            self.table.delete(iid)
+        else:
+            self.refresh_table()
 
     def on_select(self, event):
         sel = self.table.selection()
@@ -743,13 +1137,7 @@ class CategoriesFrame(ThemedFrame):
             messagebox.showerror('Ошибка', 'Название категории должно содержать только буквы, цифры и пробелы')
             return
             
-        ok, err = add_category(name, desc)
-        if ok:
-            self.refresh_table()
-            self.name_entry.delete(0, tk.END)
-            self.desc_entry.delete(0, tk.END)
-        else:
-            messagebox.showerror('Ошибка', err or 'Ошибка добавления')
+        self.run_mutation(add_category, name, desc, on_success=lambda _: self.clear_form(), error='Ошибка добавления')
 
     def edit_category(self):
         if not self.selected_id:
@@ -774,24 +1162,21 @@ class CategoriesFrame(ThemedFrame):
             messagebox.showerror('Ошибка', 'Название категории должно содержать только буквы, цифры и пробелы')
             return
             
-        ok, err = update_category(self.selected_id, name, desc)
-        if ok:
-            self.refresh_table()
-        else:
-            messagebox.showerror('Ошибка', err or 'Ошибка редактирования')
+        self.run_mutation(update_category, self.selected_id, name, desc, error='Ошибка редактирования')
 
     def delete_category(self):
         if not self.selected_id:
             messagebox.showerror('Ошибка', 'Выберите категорию для удаления')
             return
-        ok, err = delete_category(self.selected_id)
-        if ok:
-            self.refresh_table()
-            self.name_entry.delete(0, tk.END)
-            self.desc_entry.delete(0, tk.END)
+        def deleted(_):
+            self.clear_form()
             self.selected_id = None
-        else:
-            messagebox.showerror('Ошибка', err or 'Ошибка удаления')
+
+        self.run_mutation(delete_category, self.selected_id, on_success=deleted, error='Ошибка удаления')
+
+    def clear_form(self):
+        self.name_entry.delete(0, tk.END)
+        self.desc_entry.delete(0, tk.END)
 
 class FavoritesFrame(ThemedFrame):
     def __init__(self, master, on_back, user):
@@ -810,7 +1195,20 @@ class FavoritesFrame(ThemedFrame):
         # Размещаем кнопку внизу
         back_btn.pack(side='bottom', pady=20, ipady=5)
         
-        tk.Label(self, text='Избранное', font=('Arial', 20), fg=master.style.lookup('TButton', 'foreground'), bg=master['bg']).pack(pady=10)
+        tk.Label(self, text='Избранное', font=('Arial', 20), fg=master.themes.palette.fg, bg=master['bg']).pack(pady=10)
+
+        # фильтр по категории (применяется в SQL)
+        filter_frame = tk.Frame(self, bg=master['bg'])
+        filter_frame.pack(padx=20, fill='x')
+        tk.Label(filter_frame, text='Категория:', fg=master.themes.palette.fg, bg=master['bg']).pack(side='left', padx=4)
+        self.filter_cat_var = tk.StringVar(value='Все')
+        self.filter_cat_combo = ttk.Combobox(filter_frame, textvariable=self.filter_cat_var, values=['Все'], width=20,
+                                             state='readonly', style='CustomCombobox.TCombobox')
+        self.filter_cat_combo.pack(side='left', padx=4)
+        self.filter_cat_combo.bind('<<ComboboxSelected>>', lambda e: self.apply_filter())
+        self.criteria = EventFilter()
+        self.cat_map = {}
+        self.refresh_categories()
         
         # Создаем рамку для таблицы с заметной обводкой
         table_frame = tk.Frame(self, bg=master['bg'], highlightthickness=0, bd=0)
@@ -824,7 +1222,7 @@ class FavoritesFrame(ThemedFrame):
         self.table.heading('location', text='Место')
         self.table.heading('date', text='Дата')
         self.table.heading('desc', text='Описание')
-        self.table.heading('favorite', text='Избранное')
+        self.table.heading('favorite', text='В избранном')
         
         # Настройка ширины колонок
         self.table.column('id', width=40)
@@ -850,14 +1248,73 @@ class FavoritesFrame(ThemedFrame):
 
         self.table.bind('<<TreeviewSelect>>', self.on_select)
         self.selected_id = None
+        self.listen(self.on_data_change)
+
+    def refresh(self):
+        self.refresh_categories()
+        self.refresh_table()
+
+    def refresh_categories(self):
+        self.run_db(get_categories, on_done=self.fill_categories)
+
+    def fill_categories(self, cats):
+        self.cat_map = {c[1]: c[0] for c in cats}
+        names = {c[0]: c[1] for c in cats}
+        self.filter_cat_combo['values'] = ['Все'] + [c[1] for c in cats]
+        self.filter_cat_var.set(names.get(self.criteria.category_id, 'Все'))
+        self.apply_filter()
+
+    def apply_filter(self):
+        criteria = EventFilter(category_id=self.cat_map.get(self.filter_cat_var.get()))
+        if criteria != self.criteria:
+            self.criteria = criteria
+            self.refresh_table()
 
     def refresh_table(self):
+        if self.user:
+            self.run_db(get_favorites, self.user[0], self.criteria, on_done=self.fill_table)
+        else:
+            self.fill_table([])
+
+    def fill_table(self, favorites):
         for row in self.table.get_children():
             self.table.delete(row)
-        if self.user:
-            favorites = get_favorites(self.user[0])
-            for ev in favorites:
-                self.table.insert('', 'end', values=(ev[0], ev[1], ev[2], ev[3], ev[4], ev[5], 'Да'))
+        for ev in favorites:
+            self.table.insert('', 'end', iid=str(ev[0]), values=ev[:7])
+
+    def on_data_change(self, change):
+        # строки таблицы обновляются точечно по event_id
+        if not self.user:
+            return
+        filtered = self.criteria != EventFilter()
+        if change.action == 'reload':
+            self.refresh_table()
+        elif change.table == 'Favorites' and change.key[0] == self.user[0]:
+            iid = str(change.key[1])
+            if change.action == 'insert' and filtered:
+                # новое избранное может не подходить под фильтр
+                self.refresh_table()
+            elif change.action == 'insert' and not self.table.exists(iid):
+                self.table.insert('', 'end', iid=iid, values=change.row[:7])
+            elif change.action == 'delete' and self.table.exists(iid):
+                self.table.delete(iid)
+        elif change.table == 'Favorites' and change.row is not None and self.table.exists(str(change.key[1])):
+            # другой пользователь изменил свое избранное: обновляем число в колонке
+            self.table.item(str(change.key[1]), values=change.row[:7])
+        elif change.table == 'Events' and self.table.exists(str(change.key)):
+            if change.action == 'update' and filtered:
+                self.refresh_table()
+            elif change.action == 'update':
+                self.table.item(str(change.key), values=change.row[:7])
+            elif change.action == 'delete':
+                self.table.delete(str(change.key))
+        elif change.table == 'Events' and change.action == 'update' and filtered:
+            # событие из избранного могло перейти в выбранную категорию
+            self.refresh_table()
+        elif change.table == 'Categories':
+            self.refresh_categories()
+            if change.action != 'insert':
+                self.refresh_table()
 
     def on_select(self, event):
         sel = self.table.selection()
@@ -869,12 +1326,10 @@ class FavoritesFrame(ThemedFrame):
         if not self.selected_id:
             messagebox.showerror('Ошибка', 'Выберите мероприятие для удаления из избранного')
             return
-        ok, err = remove_favorite(self.user[0], self.selected_id)
-        if ok:
-            self.refresh_table()
+        def removed(_):
             self.selected_id = None
-        else:
-            messagebox.showerror('Ошибка', err or 'Ошибка удаления')
+
+        self.run_mutation(remove_favorite, self.user[0], self.selected_id, on_success=removed, error='Ошибка удаления')
 
 class SettingsFrame(ThemedFrame):
     def __init__(self, master, on_back):
@@ -892,16 +1347,20 @@ class SettingsFrame(ThemedFrame):
         # Размещаем кнопку внизу
         back_btn.pack(side='bottom', pady=20, ipady=5)
         
-        tk.Label(self, text='Настройки', font=('Arial', 20), fg=master.style.lookup('TButton', 'foreground'), bg=master['bg']).pack(pady=10)
+        tk.Label(self, text='Настройки', font=('Arial', 20), fg=master.themes.palette.fg, bg=master['bg']).pack(pady=10)
         theme_frame = tk.Frame(self, bg=master['bg'])
         theme_frame.pack(pady=10)
-        tk.Label(theme_frame, text='Тема:', fg=master.style.lookup('TButton', 'foreground'), bg=master['bg']).pack(side='left')
+        tk.Label(theme_frame, text='Тема:', fg=master.themes.palette.fg, bg=master['bg']).pack(side='left')
         self.theme_var = tk.StringVar(value=master.theme)
-        ttk.Radiobutton(theme_frame, text='Тёмная', variable=self.theme_var, value='dark', command=lambda: master.set_theme('dark')).pack(side='left', padx=5)
-        ttk.Radiobutton(theme_frame, text='Светлая', variable=self.theme_var, value='light', command=lambda: master.set_theme('light')).pack(side='left', padx=5)
+        ttk.Radiobutton(theme_frame, text='Тёмная', variable=self.theme_var, value='dark', command=lambda: self.switch_theme('dark')).pack(side='left', padx=5)
+        ttk.Radiobutton(theme_frame, text='Светлая', variable=self.theme_var, value='light', command=lambda: self.switch_theme('light')).pack(side='left', padx=5)
+        # время последнего переключения темы
+        self.switch_label = tk.Label(self, text='', fg=master.themes.palette.fg, bg=master['bg'], font=('Arial', 10))
+        self.switch_label.pack(pady=5)
 
-    def update_theme(self, bg, fg, btn_bg, btn_fg):
-        super().update_theme(bg, fg, btn_bg, btn_fg)
+    def switch_theme(self, theme):
+        elapsed = self.master.set_theme(theme)
+        self.switch_label.config(text=f'Тема переключена за {elapsed:.1f} мс')
 
 class ReportsFrame(ThemedFrame):
     def __init__(self, master, on_back):
@@ -920,7 +1379,7 @@ class ReportsFrame(ThemedFrame):
         # Размещаем кнопку внизу
         back_btn.pack(side='bottom', pady=20, ipady=5)
         
-        tk.Label(self, text='Отчеты', font=('Arial', 20), fg=master.style.lookup('TButton', 'foreground'), bg=master['bg']).pack(pady=10)
+        tk.Label(self, text='Отчеты', font=('Arial', 20), fg=master.themes.palette.fg, bg=master['bg']).pack(pady=10)
         
         # Создаем контейнер с фильтрами
         filter_container = tk.Frame(self, bg=master['bg'], highlightthickness=0, bd=0, padx=20, pady=15)
@@ -930,21 +1389,24 @@ class ReportsFrame(ThemedFrame):
         period_frame = tk.Frame(filter_container, bg=master['bg'])
         period_frame.pack(fill='x', pady=5)
         
-        tk.Label(period_frame, text='Период:', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(period_frame, text='Период:', fg=master.themes.palette.fg, 
                 bg=master['bg'], font=('Arial', 12)).grid(row=0, column=0, padx=5, pady=5)
         
+        # календарь загружается при первом открытии отчетов (или заранее в warm_up_imports)
+        from tkcalendar import DateEntry
+
         date_frame = tk.Frame(period_frame, bg=master['bg'])
         date_frame.grid(row=0, column=1, padx=10, pady=5)
         
-        tk.Label(date_frame, text='С:', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(date_frame, text='С:', fg=master.themes.palette.fg, 
                 bg=master['bg']).grid(row=0, column=0, padx=5)
-        self.date_from = DateEntry(date_frame, width=12, background=master.style.lookup('TButton', 'background'),
+        self.date_from = DateEntry(date_frame, width=12, background=master.themes.palette.btn_bg,
                                  foreground='white', borderwidth=2, date_pattern='yyyy-mm-dd', font=('Arial', 9))
         self.date_from.grid(row=0, column=1, padx=5)
         
-        tk.Label(date_frame, text='По:', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(date_frame, text='По:', fg=master.themes.palette.fg, 
                 bg=master['bg']).grid(row=0, column=2, padx=5)
-        self.date_to = DateEntry(date_frame, width=12, background=master.style.lookup('TButton', 'background'),
+        self.date_to = DateEntry(date_frame, width=12, background=master.themes.palette.btn_bg,
                                foreground='white', borderwidth=2, date_pattern='yyyy-mm-dd', font=('Arial', 9))
         self.date_to.grid(row=0, column=3, padx=5)
         
@@ -952,11 +1414,11 @@ class ReportsFrame(ThemedFrame):
         report_type_frame = tk.Frame(filter_container, bg=master['bg'])
         report_type_frame.pack(fill='x', pady=5)
         
-        tk.Label(report_type_frame, text='Тип отчета:', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(report_type_frame, text='Тип отчета:', fg=master.themes.palette.fg, 
                 bg=master['bg'], font=('Arial', 12)).grid(row=0, column=0, padx=5, pady=5)
         
         self.report_type_var = tk.StringVar(value="Все")
-        report_types = ["Все", "По категориям", "По пользователям"]
+        report_types = ["Все", "По категориям", "По пользователям", REPORT_STATISTICS]
         self.report_type_combo = ttk.Combobox(report_type_frame, textvariable=self.report_type_var, 
                                            values=report_types, width=20, state='readonly', 
                                            style='CustomCombobox.TCombobox')
@@ -967,7 +1429,7 @@ class ReportsFrame(ThemedFrame):
         self.category_frame = tk.Frame(filter_container, bg=master['bg'])
         self.category_frame.pack(fill='x', pady=5)
         
-        tk.Label(self.category_frame, text='Категория:', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(self.category_frame, text='Категория:', fg=master.themes.palette.fg, 
                 bg=master['bg'], font=('Arial', 12)).grid(row=0, column=0, padx=5, pady=5)
         
         self.cat_var = tk.StringVar()
@@ -979,7 +1441,7 @@ class ReportsFrame(ThemedFrame):
         # Пользователь (скрыт по умолчанию)
         self.user_frame = tk.Frame(filter_container, bg=master['bg'])
         
-        tk.Label(self.user_frame, text='Пользователь:', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(self.user_frame, text='Пользователь:', fg=master.themes.palette.fg, 
                 bg=master['bg'], font=('Arial', 12)).grid(row=0, column=0, padx=5, pady=5)
         
         self.user_var = tk.StringVar()
@@ -992,7 +1454,7 @@ class ReportsFrame(ThemedFrame):
         sort_frame = tk.Frame(filter_container, bg=master['bg'])
         sort_frame.pack(fill='x', pady=5)
         
-        tk.Label(sort_frame, text='Сортировка:', fg=master.style.lookup('TButton', 'foreground'), 
+        tk.Label(sort_frame, text='Сортировка:', fg=master.themes.palette.fg, 
                 bg=master['bg'], font=('Arial', 12)).grid(row=0, column=0, padx=5, pady=5)
         
         self.sort_var = tk.StringVar(value="Дата (по убыванию)")
@@ -1000,6 +1462,8 @@ class ReportsFrame(ThemedFrame):
         self.sort_combo = ttk.Combobox(sort_frame, textvariable=self.sort_var, values=sort_options, 
                                      width=20, state='readonly', style='CustomCombobox.TCombobox')
         self.sort_combo.grid(row=0, column=1, padx=10, pady=5)
+        # уже сформированный отчет пересортировывается в памяти, без запроса к базе
+        self.sort_combo.bind("<<ComboboxSelected>>", self.on_sort_change)
         
         # Кнопки управления отчетом
         btn_frame = tk.Frame(filter_container, bg=master['bg'])
@@ -1011,6 +1475,10 @@ class ReportsFrame(ThemedFrame):
                  style='Rounded.TButton', width=20).grid(row=0, column=1, padx=10, pady=5)
         ttk.Button(btn_frame, text='Экспорт в PDF', command=lambda: self.export_report('pdf'), 
                  style='Rounded.TButton', width=20).grid(row=0, column=2, padx=10, pady=5)
+        self.cancel_btn = ttk.Button(btn_frame, text='Отмена', command=self.cancel_report,
+                                     style='Rounded.TButton', width=20)
+        self.cancel_btn.grid(row=0, column=3, padx=10, pady=5)
+        self.cancel_btn.state(['disabled'])
         
         # Таблица для отчета
         self.report_container = tk.Frame(self, bg=master['bg'], highlightthickness=0, bd=0)
@@ -1018,7 +1486,7 @@ class ReportsFrame(ThemedFrame):
         
         # Статус отчета
         self.status_label = tk.Label(self.report_container, text='Выберите параметры и нажмите "Показать отчет"', 
-                                   fg=master.style.lookup('TButton', 'foreground'), bg=master['bg'], 
+                                   fg=master.themes.palette.fg, bg=master['bg'], 
                                    font=('Arial', 11))
         self.status_label.pack(pady=10)
         
@@ -1029,7 +1497,7 @@ class ReportsFrame(ThemedFrame):
         # Настраиваем заголовки
         self.headings = {
             'id': 'ID', 'name': 'Название', 'category': 'Категория', 'location': 'Место', 
-            'date': 'Дата', 'description': 'Описание', 'favorite': 'Избранное', 'username': 'Пользователь'
+            'date': 'Дата', 'description': 'Описание', 'favorite': 'В избранном', 'username': 'Пользователь'
         }
         
         for col, text in self.headings.items():
@@ -1038,10 +1506,18 @@ class ReportsFrame(ThemedFrame):
             width = 40 if col == 'id' else 80 if col in ['favorite', 'date'] else 100 if col == 'location' else 150
             self.table.column(col, width=width)
         
+        # Таблица статистического отчета (раздел, показатель, значение), показывается вместо основной
+        self.stats_table = ttk.Treeview(self.report_container, columns=('section', 'label', 'value'),
+                                        show='headings', height=10)
+        for col, text, width in (('section', 'Раздел', 200), ('label', 'Показатель', 250), ('value', 'Значение', 100)):
+            self.stats_table.heading(col, text=text)
+            self.stats_table.column(col, width=width, anchor='e' if col == 'value' else 'w')
+        
         # Добавляем полосу прокрутки
-        scrollbar = ttk.Scrollbar(self.report_container, orient='vertical', command=self.table.yview)
-        self.table.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side='right', fill='y')
+        self.scrollbar = ttk.Scrollbar(self.report_container, orient='vertical', command=self.table.yview)
+        self.table.configure(yscrollcommand=self.scrollbar.set)
+        self.stats_table.configure(yscrollcommand=self.scrollbar.set)
+        self.scrollbar.pack(side='right', fill='y')
         self.table.pack(fill='both', expand=True, pady=5, padx=5)
         
         # Скрываем фреймы по умолчанию
@@ -1067,167 +1543,130 @@ class ReportsFrame(ThemedFrame):
             self.category_frame.pack(fill='x', pady=5)  # Показываем категории для комбинированного отчета
             # Обновляем заголовок для колонки пользователя
             self.table.heading('username', text='Добавил в избранное')
+        elif report_type == REPORT_STATISTICS:
+            # Статистика считается по периоду и категории, сортировка не нужна
+            self.category_frame.pack(fill='x', pady=5)
+            self.user_frame.pack_forget()
         else:  # "Все"
             self.category_frame.pack(fill='x', pady=5)
             self.user_frame.pack(fill='x', pady=5)
             # Обновляем заголовок для колонки пользователя
             self.table.heading('username', text=self.headings['username'])
+        self.sort_combo.state(['disabled'] if report_type == REPORT_STATISTICS else ['!disabled'])
+
+    def on_sort_change(self, event):
+        query = getattr(self, 'report_query', None)
+        if not query or query.report_type == REPORT_STATISTICS or self.report_task:
+            return
+        sort_option = self.sort_var.get()
+        self.fill_report(query._replace(sort=sort_option), sort_report_rows(self.report_data, sort_option))
+
+    def refresh(self):
+        # сформированный отчет остается на экране, обновляются списки фильтров
+        self.refresh_categories()
+        self.refresh_users()
 
     def refresh_categories(self):
-        cats = get_categories()
+        self.cat_map = {}
+        self.run_db(get_categories, on_done=self.fill_categories)
+
+    def fill_categories(self, cats):
+        selected = self.cat_var.get()
         self.cat_combo['values'] = ['Все'] + [c[1] for c in cats]
         self.cat_map = {c[1]: c[0] for c in cats}
-        self.cat_combo.current(0)
+        if selected in self.cat_map:
+            self.cat_var.set(selected)
+        else:
+            self.cat_combo.current(0)
 
     def refresh_users(self):
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT user_id, user_name FROM Users')
-        users = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
+        self.user_map = {}
+        self.run_db(get_users, on_done=self.fill_users)
+
+    def fill_users(self, users):
+        selected = self.user_var.get()
         self.user_combo['values'] = ['Все'] + [u[1] for u in users]
         self.user_map = {u[1]: u[0] for u in users}
-        self.user_combo.current(0)
+        if selected in self.user_map:
+            self.user_var.set(selected)
+        else:
+            self.user_combo.current(0)
 
-    def get_report_data(self):
-        report_type = self.report_type_var.get()
-        date_from = self.date_from.get_date()
-        date_to = self.date_to.get_date()
-        category = self.cat_var.get()
-        user = self.user_var.get()
-        sort_option = self.sort_var.get()
-        
-        try:
-            # SQL запрос для получения данных
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Определяем SQL запрос в зависимости от типа отчета
-            if report_type == "По пользователям":
-                # Запрос для отчета по пользователям с объединением имен пользователей через GROUP_CONCAT
-                sql = '''
-                    SELECT e.event_id, e.event_name, c.category_name, e.location, e.event_date, 
-                           e.description, e.favorite, IFNULL(GROUP_CONCAT(DISTINCT u.user_name SEPARATOR ', '), '') as user_names
-                    FROM Events e
-                    LEFT JOIN Categories c ON e.category = c.category_id
-                    LEFT JOIN Favorites f ON e.event_id = f.event_id
-                    LEFT JOIN Users u ON f.user_id = u.user_id
-                '''
-                params = []
-                
-                # Добавляем условия WHERE
-                conditions = []
-                
-                # Условие для конкретного пользователя
-                if user != "Все" and user:
-                    conditions.append("u.user_name = %s")
-                    params.append(user)
-                
-                # Добавляем условие категории
-                if category != "Все" and category:
-                    conditions.append("c.category_name = %s")
-                    params.append(category)
-                
-                # Добавляем условие даты, если указаны даты
-                if date_from and date_to:
-                    conditions.append("(e.event_date BETWEEN %s AND %s OR e.event_date IS NULL)")
-                    params.append(date_from)
-                    params.append(date_to)
-                
-                # Формируем часть WHERE запроса
-                if conditions:
-                    sql += " WHERE " + " AND ".join(conditions)
-                    
-                # Группировка для объединения пользователей
-                sql += " GROUP BY e.event_id, e.event_name, c.category_name, e.location, e.event_date, e.description, e.favorite"
-            else:
-                # Основной запрос для отчетов типа "Все" или "По категориям"
-                # Используем LEFT JOIN с таблицей Favorites и Users, чтобы включить все мероприятия
-                # GROUP_CONCAT объединяет имена пользователей через запятую
-                sql = '''
-                    SELECT e.event_id, e.event_name, c.category_name, e.location, e.event_date, 
-                           e.description, e.favorite, 
-                           IFNULL(GROUP_CONCAT(DISTINCT u.user_name SEPARATOR ', '), '') as user_names
-                    FROM Events e
-                    LEFT JOIN Categories c ON e.category = c.category_id
-                    LEFT JOIN Favorites f ON e.event_id = f.event_id
-                    LEFT JOIN Users u ON f.user_id = u.user_id
-                '''
-                params = []
-                
-                # Добавляем условия WHERE
-                conditions = []
-                
-                # Добавляем условие даты, если указаны даты
-                if date_from and date_to:
-                    conditions.append("(e.event_date BETWEEN %s AND %s OR e.event_date IS NULL)")
-                    params.append(date_from)
-                    params.append(date_to)
-                
-                # Добавляем условие категории для отчетов типа "По категориям" или "Все"
-                if category != "Все" and category:
-                    conditions.append("c.category_name = %s")
-                    params.append(category)
-                
-                # Добавляем условие пользователя для отчета типа "Все"
-                if report_type == "Все" and user != "Все" and user:
-                    conditions.append("(u.user_name = %s OR u.user_name IS NULL)")  # Показываем и мероприятия без избранного
-                    params.append(user)
-                
-                # Формируем часть WHERE запроса
-                if conditions:
-                    sql += " WHERE " + " AND ".join(conditions)
-                    
-                # Группировка для объединения пользователей
-                sql += " GROUP BY e.event_id, e.event_name, c.category_name, e.location, e.event_date, e.description, e.favorite"
-            
-            # Сортировка
-            if sort_option == "Дата (по убыванию)":
-                sql += " ORDER BY IFNULL(e.event_date, '2999-12-31') DESC"
-            elif sort_option == "Дата (по возрастанию)":
-                sql += " ORDER BY IFNULL(e.event_date, '2999-12-31') ASC"
-            elif sort_option == "Название (А-Я)":
-                sql += " ORDER BY e.event_name ASC"
-            elif sort_option == "Название (Я-А)":
-                sql += " ORDER BY e.event_name DESC"
-            
-            # Выполняем запрос с выводом отладочной информации
-            print(f"SQL: {sql}")
-            print(f"Params: {params}")
-            
-            cursor.execute(sql, params)
-            data = cursor.fetchall()
-            
-            print(f"Rows fetched: {len(data)}")
-            if len(data) > 0:
-                print(f"First row: {data[0]}")
-            
-            cursor.close()
-            conn.close()
-            
-            return data
-            
-        except Exception as e:
-            messagebox.showerror("Ошибка запроса", f"Ошибка в запросе: {str(e)}")
-            print(f"Error in get_report_data: {str(e)}")
-            return []
+    def report_params(self):
+        """Параметры отчета из фильтров (читаются в главном потоке)"""
+        return reporting.ReportSpec(self.report_type_var.get(), self.date_from.get_date(), self.date_to.get_date(),
+                                    self.cat_var.get(), self.user_var.get(), self.sort_var.get())
 
     def show_report(self):
+        # предыдущий запрос, если он еще выполняется, больше не нужен
+        self.cancel_report()
+        params = self.report_params()
+        self.status_label.config(text='Формирование отчета...')
+        self.cancel_btn.state(['!disabled'])
+        # Статистика считается GROUP BY в базе, отчет по событиям использует индексы
+        # по дате, категории и пользователю (запросы собираются в db_utils)
+        self.report_task = self.run_db(reporting.fetch_report, params,
+                                       on_done=lambda data: self.fill_report(params, data),
+                                       on_error=self.report_failed)
+
+    def show_table(self, table):
+        """Показывает таблицу отчета (основную или статистики) вместо другой"""
+        for other in (self.table, self.stats_table):
+            if other is not table:
+                other.pack_forget()
+        table.pack(fill='both', expand=True, pady=5, padx=5)
+        self.scrollbar.configure(command=table.yview)
+
+    def fill_statistics(self, params, data):
+        category = params[3]
+        for row in self.stats_table.get_children():
+            self.stats_table.delete(row)
+        self.show_table(self.stats_table)
+        status_text = f'Статистика: {len(data)} показателей'
+        if category != "Все":
+            status_text += f' (Категория: {category})'
+        self.status_label.config(text=status_text)
+        section = None
+        for row in data:
+            # название раздела выводится только в первой строке раздела
+            self.stats_table.insert('', 'end', values=(row.section if row.section != section else '',
+                                                       row.label, row.value))
+            section = row.section
+
+    def cancel_report(self):
+        task = getattr(self, 'report_task', None)
+        if task and not task.done:
+            task.cancel()
+            self.status_label.config(text='Формирование отчета отменено')
+        self.report_task = None
+        self.cancel_btn.state(['disabled'])
+
+    def report_failed(self, e):
+        self.report_task = None
+        self.cancel_btn.state(['disabled'])
+        error_msg = f"Не удалось сформировать отчет: {str(e)}"
+        messagebox.showerror("Ошибка", error_msg)
+        self.status_label.config(text='Ошибка формирования отчета')
+        print(error_msg)
+
+    def fill_report(self, params, data):
+        self.report_task = None
+        self.report_query = params  # параметры для потокового экспорта
+        self.cancel_btn.state(['disabled'])
+        if params[0] == REPORT_STATISTICS:
+            self.report_data = data
+            self.fill_statistics(params, data)
+            return
+        self.show_table(self.table)
         # Очищаем таблицу
         for row in self.table.get_children():
             self.table.delete(row)
         
-        # Получаем данные
         try:
-            data = self.get_report_data()
             self.report_data = data  # Сохраняем для экспорта
             
-            # Получаем тип отчета и выбранные параметры
-            report_type = self.report_type_var.get()
-            user = self.user_var.get()
-            category = self.cat_var.get()
+            # Тип отчета и параметры, с которыми он был запрошен
+            report_type, _, _, category, user, _ = params
             
             # Обновляем статус с учетом выбранных фильтров
             status_text = f'Отчет содержит {len(data)} записей'
@@ -1268,11 +1707,8 @@ class ReportsFrame(ThemedFrame):
             
             # Заполняем таблицу
             for row in data:
-                # Преобразуем 'favorite' в текст
                 row_list = list(row)
                 if len(row_list) >= 7:  # Проверяем, что в строке достаточно элементов
-                    row_list[6] = 'Да' if row[6] else 'Нет'
-                    
                     # Если нет пользователя (не в избранном)
                     if len(row_list) >= 8 and (row_list[7] is None or row_list[7] == ''):
                         row_list[7] = "-"
@@ -1290,227 +1726,63 @@ class ReportsFrame(ThemedFrame):
             messagebox.showinfo("Информация", "Нет данных для экспорта. Сначала сформируйте отчет.")
             return
         
-        report_type = self.report_type_var.get()
-        date_from = self.date_from.get_date()
-        date_to = self.date_to.get_date()
-        
-        # Форматируем даты для имени файла
-        date_from_str = date_from.strftime('%Y-%m-%d')
-        date_to_str = date_to.strftime('%Y-%m-%d')
-        
-        # Создаем имя файла
-        default_filename = f"Отчет_{report_type}_{date_from_str}_{date_to_str}"
-        
+        # строки заново читаются курсором и пишутся в файл по мере чтения;
+        # статистика невелика и экспортируется из уже полученных строк
+        spec, total = self.report_query, len(self.report_data)
+        rows = self.report_data if spec.report_type == REPORT_STATISTICS else None
+        default_filename = reporting.default_filename(spec)
         if format_type == 'excel':
             filename = filedialog.asksaveasfilename(
                 defaultextension=".xlsx",
                 filetypes=[("Excel files", "*.xlsx")],
                 initialfile=default_filename
             )
-            
-            if filename:
-                try:
-                    # Создаем DataFrame с данными отчета
-                    columns = ['ID', 'Название', 'Категория', 'Место', 'Дата', 
-                              'Описание', 'Избранное']
-                    
-                    # Добавляем правильное название колонки пользователя в зависимости от типа отчета
-                    if report_type == "По пользователям":
-                        columns.append('Добавил в избранное')
-                    else:
-                        columns.append('Пользователь')
-                    
-                    # Преобразуем данные (favorite в текст)
-                    processed_data = []
-                    for row in self.report_data:
-                        row_list = list(row)
-                        row_list[6] = 'Да' if row[6] else 'Нет'
-                        if row_list[7] is None:
-                            row_list[7] = "-"
-                        processed_data.append(row_list)
-                    
-                    df = pd.DataFrame(processed_data, columns=columns)
-                    
-                    # Экспортируем в Excel
-                    df.to_excel(filename, index=False)
-                    messagebox.showinfo("Успех", f"Отчет успешно экспортирован в {filename}")
-                    
-                except Exception as e:
-                    messagebox.showerror("Ошибка", f"Не удалось экспортировать отчет: {str(e)}")
-        
+            progress = lambda n: self.show_export_progress(f'Экспорт: {n} из {total} записей')
+            fmt = 'xlsx'
         elif format_type == 'pdf':
             filename = filedialog.asksaveasfilename(
                 defaultextension=".pdf",
                 filetypes=[("PDF files", "*.pdf")],
                 initialfile=default_filename
             )
-            
-            if filename:
-                try:
-                    # Создаем PDF документ с поддержкой Unicode
-                    doc = SimpleDocTemplate(filename, pagesize=letter, encoding='UTF-8')
-                    styles = getSampleStyleSheet()
-                    
-                    # Модифицируем стили для поддержки кириллицы
-                    title_style = styles['Heading1']
-                    title_style.alignment = TA_CENTER
-                    try:
-                        title_style.fontName = 'Arial-Bold'
-                    except:
-                        pass
-                        
-                    # Создаем параграф-стиль для ячеек таблицы
-                    normal_style = styles['Normal']
-                    try:
-                        normal_style.fontName = 'Arial'
-                    except:
-                        pass
-                    
-                    elements = []
-                    
-                    # Заголовок отчета
-                    title = Paragraph(f"Отчет {report_type} с {date_from_str} по {date_to_str}", title_style)
-                    elements.append(title)
-                    
-                    # Добавляем пустую строку между заголовком и таблицей
-                    elements.append(Paragraph("<br/><br/>", normal_style))
-                    
-                    # Данные для таблицы
-                    columns = ['ID', 'Название', 'Категория', 'Место', 'Дата', 
-                              'Описание', 'Избранное']
-                    
-                    # Добавляем правильное название колонки пользователя в зависимости от типа отчета
-                    if report_type == "По пользователям":
-                        columns.append('Добавил в избранное')
-                    else:
-                        columns.append('Пользователь')
-                    
-                    # Преобразуем данные (favorite в текст)
-                    processed_data = []
-                    for row in self.report_data:
-                        row_list = list(row)
-                        # Преобразуем все значения в строки для правильного отображения в PDF
-                        for i in range(len(row_list)):
-                            if row_list[i] is None:
-                                row_list[i] = "-"
-                            elif i == 6:  # Столбец "Избранное"
-                                row_list[i] = 'Да' if row_list[i] else 'Нет'
-                            else:
-                                # Преобразуем все остальные значения в строки
-                                row_list[i] = str(row_list[i])
-                        processed_data.append(row_list)
-                    
-                    # Создаем таблицу для PDF с корректными размерами
-                    col_widths = [1*cm, 3*cm, 3*cm, 3*cm, 2*cm, 4*cm, 2*cm, 3*cm]  # Задаем ширину столбцов
-                    data = [columns] + processed_data
-                    table = Table(data, colWidths=col_widths)
-                    
-                    # Стилизуем таблицу с кириллическими шрифтами
-                    style = TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.blue),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Arial-Bold'),
-                        ('FONTNAME', (0, 1), (-1, -1), 'Arial'),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                    ])
-                    
-                    # Добавляем зебру (чередование цветов строк)
-                    for i in range(1, len(data)):
-                        if i % 2 == 0:
-                            bc = colors.lightgrey
-                        else:
-                            bc = colors.white
-                        style.add('BACKGROUND', (0, i), (-1, i), bc)
-                    
-                    table.setStyle(style)
-                    elements.append(table)
-                    
-                    # Строим PDF
-                    doc.build(elements)
-                    messagebox.showinfo("Успех", f"Отчет успешно экспортирован в {filename}")
-                    
-                except Exception as e:
-                    messagebox.showerror("Ошибка", f"Не удалось экспортировать отчет: {str(e)}")
+            progress = lambda pages: self.show_export_progress(f'Экспорт: {pages} стр. ({total} записей)')
+            fmt = 'pdf'
+        else:
+            return
+        write = lambda: reporting.export_report(spec, filename, fmt, progress=progress, rows=rows)
+
+        if filename:
+            # файл пишется в фоне, сообщения показываются в главном потоке
+            self.run_db(write,
+                        on_done=lambda _: messagebox.showinfo("Успех", f"Отчет успешно экспортирован в {filename}"),
+                        on_error=lambda e: messagebox.showerror("Ошибка", f"Не удалось экспортировать отчет: {str(e)}"))
+
+    def show_export_progress(self, text):
+        """Показывает ход экспорта (вызывается из фонового потока)"""
+        self.master.db.call_in_ui(
+            lambda: self.winfo_exists() and self.status_label.config(text=text))
 
     def __check_data(self):
         """Проверяет наличие данных и предлагает создать тестовые данные"""
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM Events")
-            count = cursor.fetchone()[0]
-            cursor.close()
-            conn.close()
-            
-            if count == 0:
-                if messagebox.askyesno("Информация", "В базе данных нет мероприятий. Создать тестовые данные для отчета?"):
-                    # Убедимся, что все необходимые атрибуты инициализированы
-                    if not hasattr(self, 'cat_combo') or self.cat_combo is None:
-                        # Если self.cat_combo отсутствует, значит нужно сначала продолжить инициализацию фрейма
-                        messagebox.showinfo("Информация", "Пожалуйста, дождитесь полной инициализации интерфейса перед созданием тестовых данных.")
-                        return
-                    
-                    self.create_sample_data()
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка при проверке данных: {str(e)}")
+        self.run_db(count_events, on_done=self.__offer_sample_data,
+                    on_error=lambda e: messagebox.showerror("Ошибка", f"Ошибка при проверке данных: {str(e)}"))
+
+    def __offer_sample_data(self, count):
+        if count == 0:
+            if messagebox.askyesno("Информация", "В базе данных нет мероприятий. Создать тестовые данные для отчета?"):
+                self.create_sample_data()
 
     def create_sample_data(self):
         """Создает простые тестовые данные для отчетов"""
-        try:
-            # Дополнительная проверка перед началом создания данных
-            if not hasattr(self, 'cat_combo') or not hasattr(self, 'cat_map'):
-                messagebox.showinfo("Информация", "Интерфейс еще не полностью инициализирован. Пожалуйста, попробуйте позже.")
-                return
-                
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Проверяем наличие хотя бы одной категории
-            cursor.execute("SELECT category_id FROM Categories LIMIT 1")
-            cat_result = cursor.fetchone()
-            
-            if not cat_result:
-                # Если категорий нет, создаем одну
-                cursor.execute("INSERT INTO Categories (category_name, description) VALUES ('Тестовая категория', 'Тестовое описание')")
-                conn.commit()
-                cursor.execute("SELECT LAST_INSERT_ID()")
-                cat_id = cursor.fetchone()[0]
-            else:
-                cat_id = cat_result[0]
-            
-            # Добавляем тестовые события на сегодня и ближайшие дни
-            today = datetime.datetime.now().date()
-            
-            # Простые тестовые события
-            test_events = [
-                ("Тестовое событие 1", cat_id, today, "Тестовое место", "Описание события 1", "", 1),
-                ("Тестовое событие 2", cat_id, today + datetime.timedelta(days=1), "Место 2", "Описание события 2", "", 0),
-                ("Тестовое событие 3", cat_id, today + datetime.timedelta(days=2), "Место 3", "Описание события 3", "", 1)
-            ]
-            
-            for event in test_events:
-                cursor.execute("""
-                    INSERT INTO Events (event_name, category, event_date, location, description, note, favorite)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, event)
-                conn.commit()
-            
-            cursor.close()
-            conn.close()
-            
+        def created(_):
             # Обновляем списки в интерфейсе
-            try:
-                self.refresh_categories()
-                messagebox.showinfo("Успех", "Тестовые данные успешно добавлены")
-            except Exception as e:
-                messagebox.showinfo("Информация", "Тестовые данные добавлены, но не удалось обновить интерфейс. Пожалуйста, обновите приложение.")
-                print(f"Ошибка при обновлении интерфейса после добавления тестовых данных: {str(e)}")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось создать тестовые данные: {str(e)}")
+            self.refresh_categories()
+            messagebox.showinfo("Успех", "Тестовые данные успешно добавлены")
+
+        self.run_db(create_sample_events, write=True, on_done=created,
+                    on_error=lambda e: messagebox.showerror("Ошибка", f"Не удалось создать тестовые данные: {str(e)}"))
 
 if __name__ == '__main__':
     app = EventDesignApp()
-    app.mainloop() 
\ No newline at end of file
+    app.mainloop()
+    close_all_connections()
@@ -0,0 +1,167 @@
+"""Хеширование и проверка паролей.
+
+Хеш хранится в колонке Users.password вместе со схемой, солью и параметрами
+стоимости, например 'scrypt$16384$8$1$<соль>$<хеш>' или
+'pbkdf2_sha256$600000$<соль>$<хеш>'. Старые хеши SHA-256 без соли (64
+шестнадцатеричных символа) по-прежнему проверяются, а needs_rehash сообщает,
+что их нужно пересчитать по текущим настройкам db_config.
+
+Хеши считаются в ограниченном пуле потоков (hashlib отпускает GIL), поэтому
+одновременные входы ждут в очереди, а не делят процессор и память между
+десятками вычислений scrypt.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import db_config
+
+SCRYPT = 'scrypt'
+PBKDF2 = 'pbkdf2_sha256'
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# Кэш успешных проверок: повторный вход с тем же паролем в течение
+# VERIFY_CACHE_TTL секунд не пересчитывает хеш. Хранится HMAC пароля на
+# случайном ключе процесса, а не сам пароль.
+VERIFY_CACHE_SIZE = 256
+VERIFY_CACHE_TTL = 300
+
+_verified = OrderedDict()  # сохраненный хеш -> (HMAC пароля, время проверки)
+_verified_lock = threading.Lock()
+_cache_key = os.urandom(32)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def _scrypt(password, salt, n, r, p):
+    # памяти нужно 128 * r * n байт; запас на случай больших n
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * (n + p + 2), dklen=HASH_BYTES)
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, HASH_BYTES)
+
+
+def current_scheme():
+    """Схема и параметры из db_config; scrypt заменяется на PBKDF2, если OpenSSL его не поддерживает"""
+    scheme = db_config.PASSWORD_SCHEME
+    if scheme == SCRYPT and hasattr(hashlib, 'scrypt'):
+        params = db_config.SCRYPT_PARAMS
+        return SCRYPT, (params['n'], params['r'], params['p'])
+    if scheme not in (SCRYPT, PBKDF2):
+        raise ValueError(f'Неизвестная схема хеширования паролей: {scheme}')
+    return PBKDF2, (db_config.PBKDF2_ITERATIONS,)
+
+
+def _compute_hash(password, scheme, params, salt=None):
+    salt = os.urandom(SALT_BYTES) if salt is None else salt
+    digest = _scrypt(password, salt, *params) if scheme == SCRYPT else _pbkdf2(password, salt, *params)
+    return '$'.join([scheme, *map(str, params), _b64(salt), _b64(digest)])
+
+
+def _parse(stored):
+    """(схема, параметры, соль, хеш) или None для старого хеша SHA-256 и нераспознанных строк"""
+    parts = stored.split('$')
+    try:
+        if parts[0] == SCRYPT and len(parts) == 6:
+            return SCRYPT, tuple(int(v) for v in parts[1:4]), base64.b64decode(parts[4]), base64.b64decode(parts[5])
+        if parts[0] == PBKDF2 and len(parts) == 4:
+            return PBKDF2, (int(parts[1]),), base64.b64decode(parts[2]), base64.b64decode(parts[3])
+    except ValueError:
+        pass
+    return None
+
+
+def _verify(password, stored):
+    parsed = _parse(stored)
+    if parsed is None:
+        # старый формат: SHA-256 без соли
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy.encode(), stored.encode())
+    scheme, params, salt, digest = parsed
+    if scheme == SCRYPT and not hasattr(hashlib, 'scrypt'):
+        return False
+    computed = _scrypt(password, salt, *params) if scheme == SCRYPT else _pbkdf2(password, salt, *params)
+    return hmac.compare_digest(computed, digest)
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(db_config.PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+        return _pool
+
+
+def shutdown():
+    """Останавливает пул (например, чтобы пересоздать его с другим числом потоков)"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def hash_password(password):
+    """Хеш пароля со случайной солью по текущим настройкам (считается в пуле)"""
+    scheme, params = current_scheme()
+    return _executor().submit(_compute_hash, password, scheme, params).result()
+
+
+def needs_rehash(stored):
+    """True, если хеш записан не текущей схемой или с другими параметрами"""
+    parsed = _parse(stored)
+    return parsed is None or parsed[:2] != current_scheme()
+
+
+def _password_mac(password):
+    return hmac.new(_cache_key, password.encode(), hashlib.sha256).digest()
+
+
+def verify_password(password, stored):
+    """Проверяет пароль по сохраненному хешу за постоянное время сравнения"""
+    mac = _password_mac(password)
+    now = time.monotonic()
+    with _verified_lock:
+        entry = _verified.get(stored)
+        if entry is not None and now - entry[1] < VERIFY_CACHE_TTL and hmac.compare_digest(entry[0], mac):
+            _verified.move_to_end(stored)
+            return True
+    ok = _executor().submit(_verify, password, stored).result()
+    if ok:
+        remember_verified(password, stored)
+    return ok
+
+
+def remember_verified(password, stored):
+    """Запоминает, что пароль подходит к хешу (например, к только что пересчитанному)"""
+    with _verified_lock:
+        _verified[stored] = (_password_mac(password), time.monotonic())
+        _verified.move_to_end(stored)
+        while len(_verified) > VERIFY_CACHE_SIZE:
+            _verified.popitem(last=False)
+
+
+_dummy_hash = None
+
+
+def verify_unknown_user(password):
+    """Проверка пароля несуществующего пользователя: столько же времени, сколько
+    настоящая проверка, чтобы по времени ответа нельзя было узнать, есть ли логин"""
+    global _dummy_hash
+    if _dummy_hash is None or needs_rehash(_dummy_hash):
+        _dummy_hash = hash_password('')
+    _executor().submit(_verify, password, _dummy_hash).result()
+    return False
@@ -0,0 +1,179 @@
+"""Формирование и экспорт отчетов без интерфейса.
+
+Модуль не зависит от Tk: его используют экран отчетов и ночные выгрузки на
+серверах без дисплея. Запуск из командной строки:
+
+    python -m reporting --type user --user Иван --from 2024-01-01 --to 2024-12-31 -o отчет.pdf
+    python -m reporting --type statistics --category Свадьба --format csv
+
+Без -o (или с -o -) отчет пишется в stdout, по умолчанию в CSV.
+"""
+import argparse
+import csv
+import datetime
+import os
+import sys
+from collections import namedtuple
+
+from db_utils import (
+    init_db, cached_report, iter_report, get_statistics,
+    REPORT_ALL, REPORT_BY_CATEGORY, REPORT_BY_USER, REPORT_STATISTICS,
+)
+from exporters import export_excel, export_pdf, report_columns, format_report_row
+
+# Параметры отчета в том же порядке, что и фильтры на экране отчетов
+ReportSpec = namedtuple('ReportSpec', 'report_type date_from date_to category user sort',
+                        defaults=(None, None, None, None, None))
+
+# Короткие имена типов отчета и сортировок для командной строки
+REPORT_TYPES = {
+    'all': REPORT_ALL,
+    'category': REPORT_BY_CATEGORY,
+    'user': REPORT_BY_USER,
+    'statistics': REPORT_STATISTICS,
+}
+SORTS = {
+    'date-desc': 'Дата (по убыванию)',
+    'date-asc': 'Дата (по возрастанию)',
+    'name-asc': 'Название (А-Я)',
+    'name-desc': 'Название (Я-А)',
+}
+
+# Форматы выгрузки и расширения файлов
+FORMATS = {'xlsx': '.xlsx', 'pdf': '.pdf', 'csv': '.csv'}
+
+
+def fetch_report(spec):
+    """Все строки отчета списком (для показа на экране); повторные запросы с теми же
+    фильтрами берутся из кэша db_utils.cached_report, пока данные не менялись"""
+    return cached_report(*spec)
+
+
+def report_rows(spec):
+    """Строки отчета по мере чтения курсора; статистика невелика и считается целиком"""
+    if spec.report_type == REPORT_STATISTICS:
+        return iter(get_statistics(spec.date_from, spec.date_to, spec.category))
+    return iter_report(*spec)
+
+
+def row_format(spec):
+    """Преобразование строки отчета в значения ячеек файла"""
+    return tuple if spec.report_type == REPORT_STATISTICS else format_report_row
+
+
+def _date_str(value):
+    return value.strftime('%Y-%m-%d') if hasattr(value, 'strftime') else str(value)
+
+
+def report_title(spec):
+    """Заголовок отчета в PDF"""
+    if spec.date_from and spec.date_to:
+        return f'Отчет {spec.report_type} с {_date_str(spec.date_from)} по {_date_str(spec.date_to)}'
+    return f'Отчет {spec.report_type} за все время'
+
+
+def default_filename(spec):
+    """Имя файла отчета без расширения"""
+    if spec.date_from and spec.date_to:
+        return f'Отчет_{spec.report_type}_{_date_str(spec.date_from)}_{_date_str(spec.date_to)}'
+    return f'Отчет_{spec.report_type}'
+
+
+def export_csv(out, rows, columns, progress=None, progress_every=1000, row_format=format_report_row):
+    """Записывает строки отчета в CSV в открытый текстовый файл out. Возвращает число строк"""
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row_format(row))
+        count += 1
+        if progress and count % progress_every == 0:
+            progress(count)
+    if progress:
+        progress(count)
+    return count
+
+
+def output_format(filename, fmt=None):
+    """Формат выгрузки: явно заданный или по расширению файла (по умолчанию CSV)"""
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f'Неподдерживаемый формат отчета: {fmt}')
+        return fmt
+    ext = os.path.splitext(filename or '')[1].lower()
+    for name, format_ext in FORMATS.items():
+        if ext == format_ext:
+            return name
+    if filename and filename != '-':
+        raise ValueError(f'Неподдерживаемый формат файла: {ext}')
+    return 'csv'
+
+
+def export_report(spec, filename, fmt=None, progress=None, rows=None):
+    """Формирует отчет и записывает его в файл filename ('-' — в stdout).
+
+    rows — уже полученные строки отчета (иначе они читаются курсором по мере записи).
+    progress(n) получает число записанных строк (для PDF — число страниц).
+    Возвращает число строк или PdfResult для PDF.
+    """
+    fmt = output_format(filename, fmt)
+    rows = report_rows(spec) if rows is None else iter(rows)
+    columns = report_columns(spec.report_type)
+    to_stdout = filename in (None, '-')
+    if fmt == 'csv':
+        if to_stdout:
+            return export_csv(sys.stdout, rows, columns, progress, row_format=row_format(spec))
+        with open(filename, 'w', newline='', encoding='utf-8-sig') as out:
+            return export_csv(out, rows, columns, progress, row_format=row_format(spec))
+    target = sys.stdout.buffer if to_stdout else filename
+    if fmt == 'xlsx':
+        return export_excel(target, rows, columns, progress, row_format=row_format(spec))
+    return export_pdf(target, rows, columns, report_title(spec), progress=progress,
+                      row_format=row_format(spec))
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'дата должна быть в формате ГГГГ-ММ-ДД: {value}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m reporting', description='Формирование отчетов по событиям')
+    parser.add_argument('--type', dest='report_type', choices=sorted(REPORT_TYPES), default='all',
+                        help='тип отчета')
+    parser.add_argument('--from', dest='date_from', type=_date, help='начало периода, ГГГГ-ММ-ДД')
+    parser.add_argument('--to', dest='date_to', type=_date, help='конец периода, ГГГГ-ММ-ДД')
+    parser.add_argument('--category', help='название категории')
+    parser.add_argument('--user', help='имя пользователя')
+    parser.add_argument('--sort', choices=sorted(SORTS), help='сортировка строк')
+    parser.add_argument('--format', choices=sorted(FORMATS), help='формат (по умолчанию — по расширению файла)')
+    parser.add_argument('-o', '--output', default='-', help='файл отчета или - для stdout')
+    args = parser.parse_args(argv)
+
+    if bool(args.date_from) != bool(args.date_to):
+        parser.error('период задается парой --from и --to')
+    if args.date_from and args.date_from > args.date_to:
+        parser.error('начало периода позже конца')
+    try:
+        fmt = output_format(args.output, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.output == '-' and fmt != 'csv' and sys.stdout.isatty():
+        parser.error(f'формат {fmt} нельзя выводить в терминал, укажите файл в -o')
+
+    spec = ReportSpec(REPORT_TYPES[args.report_type], args.date_from, args.date_to,
+                      args.category, args.user, SORTS.get(args.sort))
+    init_db()
+    unit = 'стр.' if fmt == 'pdf' else 'строк'
+    result = export_report(spec, args.output, fmt,
+                           progress=lambda n: print(f'Записано: {n} {unit}', file=sys.stderr))
+    count = result.rows if fmt == 'pdf' else result
+    if args.output != '-':
+        print(f'Отчет записан в {args.output}: {count} строк', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
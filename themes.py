@@ -0,0 +1,134 @@
+"""Темы оформления интерфейса.
+
+Стили ttk обеих тем создаются один раз при запуске под именами с префиксом
+темы ('dark.Rounded.TButton', 'light.Treeview', ...). Переключение темы не
+пересоздает стили и не обходит дерево виджетов: виджеты экрана регистрируются
+один раз после его создания, а при смене темы им назначаются имена стилей
+новой темы и цвета из ее палитры.
+"""
+import time
+import tkinter as tk
+from collections import namedtuple
+from tkinter import ttk
+
+# Цвета темы
+Palette = namedtuple('Palette', 'bg fg btn_bg btn_fg btn_active entry_bg entry_fg combo_bg combo_fg')
+
+THEMES = {
+    'dark': Palette(bg='#232323', fg='white', btn_bg='#3399ff', btn_fg='white', btn_active='#4da3ff',
+                    entry_bg='#232323', entry_fg='white', combo_bg='#3399ff', combo_fg='white'),
+    'light': Palette(bg='white', fg='black', btn_bg='#3399ff', btn_fg='black', btn_active='#4da3ff',
+                     entry_bg='white', entry_fg='black', combo_bg='white', combo_fg='black'),
+}
+
+# Стили ttk, которые настраиваются для каждой темы (имена, с которыми создаются виджеты)
+THEMED_STYLES = ('TButton', 'Rounded.TButton', 'TEntry', 'Treeview', 'CustomCombobox.TCombobox')
+
+
+class ThemeEngine:
+    """Стили тем и реестр виджетов, которые меняют оформление вместе с темой"""
+
+    def __init__(self, root, theme='dark'):
+        self.root = root
+        self.theme = theme
+        self.style = ttk.Style(root)
+        self.style.theme_use('default')
+        # время последнего переключения темы в миллисекундах
+        self.last_switch_ms = None
+        # зарегистрированные виджеты по владельцу (экрану): списки фонов,
+        # подписей (фон и цвет текста) и виджетов ttk с базовым именем стиля
+        self._owners = {}
+        self._create_styles()
+
+    @property
+    def palette(self):
+        return THEMES[self.theme]
+
+    def style_name(self, base, theme=None):
+        """Имя стиля base в теме theme (по умолчанию — в текущей)"""
+        return f'{theme or self.theme}.{base}'
+
+    def _create_styles(self):
+        style = self.style
+        style.element_create('RoundedFrame', 'from', 'default')
+        # макет наследуют стили 'dark.Rounded.TButton' и 'light.Rounded.TButton'
+        style.layout('Rounded.TButton', [
+            ('Button.focus', {'children': [
+                ('Button.border', {'border': '2', 'sticky': 'nswe', 'children': [
+                    ('Button.padding', {'sticky': 'nswe', 'children': [
+                        ('Button.label', {'sticky': 'nswe'})
+                    ]})
+                ]})
+            ]}),
+        ])
+        for theme, p in THEMES.items():
+            name = lambda base: self.style_name(base, theme)
+            style.configure(name('TButton'), background=p.btn_bg, foreground=p.btn_fg, font=('Arial', 12), padding=6)
+            style.configure(name('Rounded.TButton'), background=p.btn_bg, foreground=p.btn_fg,
+                            font=('Arial', 12, 'bold'), padding=6, borderwidth=2, relief='raised',
+                            bordercolor=p.btn_bg)
+            style.map(name('Rounded.TButton'), background=[('active', p.btn_active), ('pressed', p.btn_active)],
+                      relief=[('pressed', 'raised')])
+            style.configure(name('TEntry'), fieldbackground=p.entry_bg, foreground=p.entry_fg, borderwidth=1,
+                            relief='solid', padding=8)
+            style.configure(name('Treeview'), background=p.bg, fieldbackground=p.bg, foreground=p.fg)
+            style.configure(name('Treeview.Heading'), background=p.btn_bg, foreground=p.btn_fg,
+                            font=('Arial', 11, 'bold'))
+            style.configure(name('CustomCombobox.TCombobox'), fieldbackground=p.combo_bg, background=p.combo_bg,
+                            foreground=p.combo_fg, selectbackground=p.combo_bg, selectforeground=p.combo_fg,
+                            bordercolor=p.btn_bg, lightcolor=p.btn_bg, darkcolor=p.btn_bg)
+            style.map(name('CustomCombobox.TCombobox'), fieldbackground=[('readonly', p.combo_bg)],
+                      foreground=[('readonly', p.combo_fg)])
+
+    def _base_style(self, widget):
+        """Базовое имя стиля виджета ttk без префикса темы или None, если стиль не из THEMED_STYLES"""
+        name = str(widget.cget('style')) or widget.winfo_class()
+        for theme in THEMES:
+            if name.startswith(theme + '.'):
+                name = name[len(theme) + 1:]
+                break
+        return name if name in THEMED_STYLES else None
+
+    def register(self, owner):
+        """Один раз регистрирует owner и его дочерние виджеты и применяет к ним текущую тему.
+
+        Подписи и фреймы, чьи цвета совпадают с цветами текущей темы, меняют их
+        вместе с темой; собственные цвета (например, у ссылок) сохраняются.
+        """
+        p = self.palette
+        backgrounds, labels, styled = [], [], []
+        stack = [owner]
+        while stack:
+            widget = stack.pop()
+            stack.extend(widget.winfo_children())
+            if isinstance(widget, ttk.Widget):
+                base = self._base_style(widget)
+                if base:
+                    styled.append((widget, base))
+            elif isinstance(widget, tk.Label):
+                if widget.cget('bg') == p.bg:
+                    (labels if widget.cget('fg') == p.fg else backgrounds).append(widget)
+            elif isinstance(widget, (tk.Frame, tk.Toplevel)) and widget.cget('bg') == p.bg:
+                backgrounds.append(widget)
+        self._owners[owner] = (backgrounds, labels, styled)
+        for widget, base in styled:
+            widget.configure(style=self.style_name(base))
+
+    def unregister(self, owner):
+        self._owners.pop(owner, None)
+
+    def set_theme(self, theme):
+        """Переключает тему: имена стилей и цвета зарегистрированных виджетов. Возвращает время в мс"""
+        start = time.perf_counter()
+        self.theme = theme
+        p = self.palette
+        self.root.configure(bg=p.bg)
+        for backgrounds, labels, styled in self._owners.values():
+            for widget in backgrounds:
+                widget.configure(bg=p.bg)
+            for widget in labels:
+                widget.configure(bg=p.bg, fg=p.fg)
+            for widget, base in styled:
+                widget.configure(style=self.style_name(base))
+        self.last_switch_ms = (time.perf_counter() - start) * 1000
+        return self.last_switch_ms